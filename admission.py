@@ -0,0 +1,271 @@
+"""
+Admission control for upstream API calls
+Bounds in-flight requests per upstream, queues a limited number of waiters
+and sheds load with a friendly message instead of piling up timeouts.
+A circuit breaker per upstream fails fast while the upstream is down.
+"""
+
+import asyncio
+import contextvars
+import os
+import time
+import logging
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Deque, Dict, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+BUSY_MESSAGE = "\n⏳ I'm helping a lot of people right now. Please try again in a few seconds!\n"
+
+# Absolute (monotonic) deadline of the request currently being handled
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("request_deadline", default=None)
+
+
+class OverloadedError(Exception):
+    """Raised when an upstream queue is full or the request deadline has passed"""
+
+
+@contextmanager
+def request_deadline(seconds: float):
+    """
+    Set the deadline for everything awaited inside this block
+    Nested deadlines can only shorten the outer one
+    """
+    deadline = time.monotonic() + seconds
+    outer = _deadline.get()
+    if outer is not None:
+        deadline = min(deadline, outer)
+    token = _deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_time(default: float) -> float:
+    """
+    Timeout for an upstream call: the smaller of `default` and the time left
+    before the request deadline
+    """
+    deadline = _deadline.get()
+    if deadline is None:
+        return default
+    left = deadline - time.monotonic()
+    if left <= 0:
+        raise OverloadedError("Request deadline exceeded")
+    return min(default, left)
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive upstream failures (transport
+    errors, timeouts, 5xx, 429). After `reset_after` seconds one trial call
+    is let through; its outcome closes or re-opens the circuit.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name: str, failure_threshold: int, reset_after: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.times_opened = 0
+        self.short_circuited = 0
+        self._opened_at = 0.0
+        self._trial_at: Optional[float] = None
+
+    def allow(self) -> bool:
+        """Whether a call may go upstream now"""
+        if self.state == self.CLOSED:
+            return True
+        now = time.monotonic()
+        if self.state == self.OPEN and now - self._opened_at >= self.reset_after:
+            self.state = self.HALF_OPEN
+            self._trial_at = None
+        # One trial at a time; a trial that never reported back is retried
+        if self.state == self.HALF_OPEN and (self._trial_at is None or now - self._trial_at >= self.reset_after):
+            self._trial_at = now
+            return True
+        self.short_circuited += 1
+        return False
+
+    def record_success(self):
+        if self.state != self.CLOSED:
+            logger.info(f"✅ {self.name}: circuit closed")
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN or (
+            self.state == self.CLOSED and self.consecutive_failures >= self.failure_threshold
+        ):
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+            self.times_opened += 1
+            logger.warning(f"⛔ {self.name}: circuit open after {self.consecutive_failures} failures")
+
+    def stats(self) -> Dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "times_opened": self.times_opened,
+            "short_circuited": self.short_circuited
+        }
+
+
+class ConcurrencyGovernor:
+    """Bounded in-flight limit plus bounded FIFO wait queue for one upstream"""
+
+    def __init__(self, name: str, max_in_flight: int, max_queue: int, max_wait: float,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.breaker = breaker or CircuitBreaker(name, failure_threshold=5, reset_after=30.0)
+
+        self._in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._wait_total = 0.0
+        self._max_depth_seen = 0
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self):
+        """Take a slot, waiting in the queue if needed. Raises OverloadedError when shedding."""
+        if not self.breaker.allow():
+            raise OverloadedError(f"{self.name} circuit is open")
+
+        if self._in_flight < self.max_in_flight and not self._waiters:
+            self._in_flight += 1
+            self.admitted += 1
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            logger.warning(f"🚦 {self.name}: queue full ({self.max_queue}), shedding request")
+            raise OverloadedError(f"{self.name} is overloaded")
+
+        try:
+            timeout = remaining_time(self.max_wait)
+        except OverloadedError:
+            self.timed_out += 1
+            raise
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        self._max_depth_seen = max(self._max_depth_seen, len(self._waiters))
+        started = time.monotonic()
+
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            logger.warning(f"🚦 {self.name}: waited {timeout:.1f}s for a slot, giving up")
+            raise OverloadedError(f"{self.name} wait timed out")
+        except asyncio.CancelledError:
+            # The slot may have been handed to us right before cancellation
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+        finally:
+            if not future.done() or future.cancelled():
+                try:
+                    self._waiters.remove(future)
+                except ValueError:
+                    pass
+            self._wait_total += time.monotonic() - started
+
+        self.admitted += 1
+
+    def release(self):
+        """Hand the slot to the next live waiter, or free it"""
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+        self._in_flight -= 1
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one in-flight slot for the duration of the block"""
+        await self.acquire()
+        try:
+            yield
+        except httpx.TransportError:
+            self.breaker.record_failure()
+            raise
+        finally:
+            self.release()
+
+    def record_status(self, status_code: int):
+        """Feed an upstream HTTP status into the circuit breaker"""
+        if status_code >= 500 or status_code == 429:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    def stats(self) -> Dict:
+        """Queue depth and admission counters"""
+        waited = self.admitted + self.timed_out
+        return {
+            "in_flight": self._in_flight,
+            "max_in_flight": self.max_in_flight,
+            "queue_depth": len(self._waiters),
+            "max_queue": self.max_queue,
+            "max_queue_depth_seen": self._max_depth_seen,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "avg_wait_ms": round(self._wait_total / waited * 1000, 2) if waited else 0.0,
+            "circuit": self.breaker.stats()
+        }
+
+
+_governors: Dict[str, ConcurrencyGovernor] = {}
+
+
+def get_governor(upstream: str) -> ConcurrencyGovernor:
+    """
+    Shared governor for an upstream, configured from the environment:
+    <UPSTREAM>_MAX_IN_FLIGHT, <UPSTREAM>_MAX_QUEUE, <UPSTREAM>_MAX_WAIT,
+    <UPSTREAM>_CIRCUIT_FAILURES, <UPSTREAM>_CIRCUIT_RESET
+    """
+    governor = _governors.get(upstream)
+    if governor is None:
+        prefix = upstream.upper()
+        governor = ConcurrencyGovernor(
+            upstream,
+            max_in_flight=int(os.getenv(f"{prefix}_MAX_IN_FLIGHT", "8")),
+            max_queue=int(os.getenv(f"{prefix}_MAX_QUEUE", "32")),
+            max_wait=float(os.getenv(f"{prefix}_MAX_WAIT", "10")),
+            breaker=CircuitBreaker(
+                upstream,
+                failure_threshold=int(os.getenv(f"{prefix}_CIRCUIT_FAILURES", "5")),
+                reset_after=float(os.getenv(f"{prefix}_CIRCUIT_RESET", "30"))
+            )
+        )
+        _governors[upstream] = governor
+    return governor
+
+
+def snapshot() -> Dict:
+    """Stats for every upstream governor"""
+    return {name: governor.stats() for name, governor in _governors.items()}
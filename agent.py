@@ -1,25 +1,34 @@
 import asyncio
 import os
 import json
+import time
 import logging
-from typing import Dict, AsyncIterator
-from dotenv import load_dotenv
+from contextlib import aclosing
+from functools import cached_property
+from typing import Callable, Dict, AsyncIterator
 
 from llm_client import OpenRouterClient
 from tools.nutrition import NutritionTools
+from tools.food_log import FoodLogAnalyzer, is_food_log, format_food_log_for_llm, logged_foods
+from food_diary import FoodDiary, is_diary_question, mentions_eating
 from tools.exercise import ExerciseTools
-from memory import UserMemory
-
-load_dotenv()
-
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('logs/agent.log'),
-        logging.StreamHandler()
-    ]
-)
+from tools.meal_planner import MealPlanner, format_meal_plan_for_llm
+from tools import context_encoder
+from tools.context_encoder import TOOL_DATA_RULES, nutrition_table, food_log_table, meal_plan_table, workout_table
+from memory import UserMemory, infer_profile_updates
+from progress import summarize_progress
+from intent_matcher import get_matcher
+from task_graph import TaskGraph
+from cache_warmer import CacheWarmer
+from cancellation import track_request
+import health
+import usage
+import scheduler
+from admission import request_deadline, OverloadedError, BUSY_MESSAGE
+from config import load_config, setup_logging
+
+load_config()
+setup_logging()
 logger = logging.getLogger(__name__)
 
 class FitnessCoachAgent:
@@ -27,10 +36,15 @@ class FitnessCoachAgent:
     
     def __init__(self):
         self.name = os.getenv("AGENT_NAME", "Fitness Coach")
-        self.llm = OpenRouterClient()
-        self.nutrition = NutritionTools()
-        self.exercise = ExerciseTools()
-        self.memory = UserMemory()
+        self.request_deadline = float(os.getenv("REQUEST_DEADLINE", "90"))
+        self.ready = False
+        self.warm_up_ms = None
+        self._cache_warm_task = None
+        self._compactor_task = None
+        self._usage_task = None
+        # Recorded traffic (JSONL) for cache warming and replay. Off unless set:
+        # it holds full message text and is never rotated
+        self.request_log = os.getenv("REQUEST_LOG") or None
         
         self.system_prompt = """You are an expert fitness and nutrition coach named {name}.
 
@@ -41,11 +55,6 @@ Your capabilities:
 - Track user progress over time and adjust recommendations
 - Motivate and encourage users on their fitness journey
 
-CRITICAL INSTRUCTION FOR NUTRITION QUERIES:
-When you receive nutrition data from the API tools, you MUST use those EXACT numbers in your response.
-DO NOT use your own knowledge or estimates when API data is provided.
-The API data is always accurate and should be presented exactly as given.
-
 Guidelines:
 - Always prioritize safety and proper form
 - Recommend consulting healthcare professionals for medical concerns
@@ -58,144 +67,368 @@ When users ask about:
 - Nutrition: ALWAYS use the exact numbers from API data when provided
 - Progress: Reference their history and celebrate improvements
 
-Be conversational, friendly, and professional.""".format(name=self.name)
+Be conversational, friendly, and professional.""".format(name=self.name) + "\n\n" + TOOL_DATA_RULES
         
         logger.info(f"{self.name} initialized successfully")
     
+    # Heavy components are built on first use (or during warm_up)
+    
+    @cached_property
+    def llm(self) -> OpenRouterClient:
+        return OpenRouterClient(known_food=self.nutrition.is_known_food)
+    
+    @cached_property
+    def nutrition(self) -> NutritionTools:
+        return NutritionTools()
+    
+    @cached_property
+    def food_log(self) -> FoodLogAnalyzer:
+        return FoodLogAnalyzer(self.nutrition)
+    
+    @cached_property
+    def diary(self) -> FoodDiary:
+        return FoodDiary()
+    
+    @cached_property
+    def exercise(self) -> ExerciseTools:
+        return ExerciseTools()
+    
+    @cached_property
+    def meal_planner(self) -> MealPlanner:
+        return MealPlanner()
+    
+    @cached_property
+    def memory(self) -> UserMemory:
+        return UserMemory()
+    
+    @cached_property
+    def matcher(self):
+        return get_matcher()
+    
+    @cached_property
+    def cache_warmer(self) -> CacheWarmer:
+        return CacheWarmer(self.llm, self.nutrition, self.matcher, self.memory)
+    
+    async def warm_up(self):
+        """Build every component, load caches and pre-open upstream connections"""
+        started = time.perf_counter()
+        for component in ("matcher", "memory", "exercise", "meal_planner", "diary", "food_log"):
+            getattr(self, component)
+        await self.nutrition.load_fuzzy_names()
+        await asyncio.gather(self.llm.warm_up(), self.nutrition.warm_up())
+        self.warm_up_ms = round((time.perf_counter() - started) * 1000, 1)
+        self.ready = True
+        logger.info(f"🔥 {self.name} warmed up in {self.warm_up_ms} ms")
+        
+        # Caches fill from past traffic in the background, paced under rate limits
+        if self.cache_warmer.top_n > 0 and self._cache_warm_task is None:
+            interval = float(os.getenv("CACHE_WARM_INTERVAL", "0"))
+            self._cache_warm_task = asyncio.create_task(self.cache_warmer.run_periodically(interval))
+        
+        if self._compactor_task is None:
+            interval = float(os.getenv("USER_COMPACT_INTERVAL", "21600"))
+            self._compactor_task = asyncio.create_task(self.memory.run_compactor(interval))
+        
+        if self._usage_task is None:
+            await usage.ledger.load_today_async()
+            self._usage_task = asyncio.create_task(usage.ledger.run_flusher())
+    
+    async def shutdown(self):
+        """Finish queued background work, stop periodic tasks and flush usage"""
+        await scheduler.scheduler.drain()
+        for task in (self._cache_warm_task, self._compactor_task, self._usage_task):
+            if task is not None:
+                task.cancel()
+        self._cache_warm_task = self._compactor_task = self._usage_task = None
+        await usage.ledger.flush_async()
+    
+    def cache_stats(self) -> Dict:
+        """Hit rates of the caches built so far"""
+        caches = {}
+        if "nutrition" in self.__dict__:
+            caches["nutrition"] = health.cache_stats(self.nutrition.cache_hits, self.nutrition.cache_misses)
+        if "llm" in self.__dict__:
+            caches["extraction"] = health.cache_stats(self.llm.extraction_hits, self.llm.extraction_misses)
+            caches["extraction"]["parsed_locally"] = self.llm.parsed_locally
+        if "meal_planner" in self.__dict__:
+            caches["meal_plan"] = health.cache_stats(self.meal_planner.cache_hits, self.meal_planner.cache_misses)
+        return caches
+    
+    def health_report(self) -> Dict:
+        """Rolling health report (cheap enough to poll every second)"""
+        return health.report(self.ready, self.cache_stats())
+    
+    def _record_request(self, user_id: str, message: str):
+        """Append the request to the request log"""
+        try:
+            with open(self.request_log, 'a') as f:
+                f.write(json.dumps({"timestamp": time.time(), "user_id": user_id, "message": message}) + "\n")
+        except OSError as e:
+            logger.warning(f"Could not record request: {e}")
+    
+    async def _diary_summary(self, user_id: str) -> str:
+        return await asyncio.to_thread(self.diary.summary_for_prompt, user_id)
+    
+    async def _workout_plan(self, user_context: Dict, focus: str = None) -> Dict:
+        """Build a workout plan from the user's level and preferred duration"""
+        level = user_context.get("fitness_level", "beginner")
+        duration = user_context.get("preferences", {}).get("workout_duration", 30)
+        return self.exercise.create_workout_plan(level, duration, focus)
+    
+    async def _meal_plan(self, user_context: Dict, message: str) -> Dict:
+        """Solve a day of meals for the requested targets and the user's restrictions"""
+        return self.meal_planner.plan_for(message, user_context)
+    
+    def _format_nutrition_for_llm(self, foods: list) -> str:
+        """Format nutrition data clearly for the LLM"""
+        nutrition_text = "===== NUTRITION DATA FROM NUTRITIONIX API =====\n"
+        nutrition_text += "YOU MUST USE THESE EXACT NUMBERS IN YOUR RESPONSE.\n"
+        nutrition_text += "DO NOT ESTIMATE OR USE YOUR OWN KNOWLEDGE.\n\n"
+        
+        for food in foods:
+            nutrition_text += f"Food: {food['name']}\n"
+            nutrition_text += f"Serving Size: {food['serving']}\n"
+            nutrition_text += f"Calories: {food['calories']} kcal\n"
+            nutrition_text += f"Protein: {food['protein']}g\n"
+            nutrition_text += f"Carbohydrates: {food['carbs']}g\n"
+            nutrition_text += f"Fat: {food['fat']}g\n"
+            if food.get('fiber', 0) > 0:
+                nutrition_text += f"Fiber: {food['fiber']}g\n"
+            if food.get('sugar', 0) > 0:
+                nutrition_text += f"Sugar: {food['sugar']}g\n"
+            nutrition_text += "\n"
+        
+        nutrition_text += "===== END OF API DATA =====\n"
+        nutrition_text += "Present these numbers EXACTLY as shown above in your response to the user.\n"
+        return nutrition_text
+    
     async def process_message(self, user_id: str, message: str) -> AsyncIterator[str]:
         """Process user messages with comprehensive error handling"""
+        # The request runs in its own task, so its deadline, progress and usage
+        # scope are set and reset in that task's context and never span a yield
+        # to the caller. Closing this generator (client gone) cancels the task,
+        # which cancels pending tools and the LLM stream.
+        chunks: asyncio.Queue = asyncio.Queue()
+        task = asyncio.create_task(self._respond(user_id, message, chunks.put_nowait))
+        # None marks the end, queued after every chunk the task emitted
+        task.add_done_callback(lambda _: chunks.put_nowait(None))
         try:
-            logger.info(f"Processing message from user {user_id}: {message[:50]}...")
-            
-            user_context = await self.memory.get_user_context(user_id)
-            
-            message_lower = message.lower()
-            tool_results = []
-            
-            # Nutrition detection
-            if any(word in message_lower for word in [
-                "calories", "nutrition", "food", "meal", "eat",
-                "diet", "protein", "carbs", "fat", "macro"
-            ]):
-                try:
+            while (chunk := await chunks.get()) is not None:
+                yield chunk
+            task.result()
+        finally:
+            if not task.done():
+                task.cancel()
+                await asyncio.wait({task})
+
+    async def _respond(self, user_id: str, message: str, emit: Callable[[str], None]):
+        """Answer one message, passing each chunk of the reply to emit"""
+        started = time.perf_counter()
+        with request_deadline(self.request_deadline), track_request(), usage.usage_scope(user_id) as spent:
+            try:
+                logger.info(f"Processing message from user {user_id}: {message[:50]}...")
+                if self.request_log:
+                    scheduler.submit("record_request", self._record_request, user_id, message,
+                                     priority=scheduler.LOW, retries=0)
+                usage.check_budget(user_id)
+
+                signals = self.matcher.scan(message)
+                tool_results = []
+                eaten_foods = []
+                has_compound = False
+
+                # Tools run as a dependency graph: the user context and workout plan
+                # don't wait for the nutrition lookups, and each tool has its own timeout
+                graph = TaskGraph()
+                graph.add("context", lambda _: self.memory.get_user_context(user_id), timeout=5.0)
+
+                # Questions about logged intake are answered from the food diary
+                if is_diary_question(message):
+                    usage.set_intent("diary")
+                    graph.add("diary", lambda _: self._diary_summary(user_id), timeout=2.0)
+
+                # Whole day of meals: batch analysis, no compound-query tip
+                elif is_food_log(message):
+                    logger.info(f"🔍 Food log detected: {message[:50]}...")
+                    usage.set_intent("food_log")
+                    graph.add("food_log", lambda _: self.food_log.analyze_day(message), timeout=30.0)
+
+                # Nutrition detection (meal plan requests get a solved plan instead)
+                elif signals.has("nutrition_terms") and not signals.has("diet_plan_intent"):
                     logger.info(f"🔍 Nutrition query detected: {message}")
-                    
-                    # Check for compound queries (multiple foods)
-                    has_compound = False
-                    compound_indicators = [" and ", " with ", ", ", " plus "]
-                    for indicator in compound_indicators:
-                        if indicator in message_lower:
-                            has_compound = True
-                            break
-                    
+                    usage.set_intent("nutrition")
+                    self.cache_warmer.observe(message)
+
                     # If compound query detected, show helpful tip first
+                    has_compound = signals.has("compound")
                     if has_compound:
-                        yield "\n💡 **Tip:** For the most accurate nutrition data, I recommend asking about each food separately. However, I'll do my best with your combined query!\n\n"
-                    
-                    # Extract just the food items from the question using LLM
-                    food_query = await self.llm.extract_food_query(message)
-                    logger.info(f"🍽️ Using food query: '{food_query}'")
-                    
-                    nutrition_data = await self.nutrition.analyze_food(food_query)
+                        emit("\n💡 **Tip:** For the most accurate nutrition data, I recommend asking about each food separately. However, I'll do my best with your combined query!\n\n")
+
+                    # Extract just the food items from the question using LLM, then look them up
+                    graph.add("food_query", lambda _: self.llm.extract_food_query(message), timeout=20.0)
+                    graph.add("nutrition", lambda r: self.nutrition.analyze_food(r["food_query"]),
+                              deps=["food_query"], timeout=15.0)
+
+                # Meal plans are solved locally; the LLM only presents them
+                if signals.has("diet_plan_intent"):
+                    usage.set_intent("diet_plan")
+                    graph.add("meal_plan", lambda r: self._meal_plan(r["context"], message),
+                              deps=["context"], timeout=2.0)
+
+                # Workout detection
+                if signals.has("workout_terms"):
+                    if spent.intent == "general":
+                        usage.set_intent("workout")
+                    graph.add("workout", lambda r: self._workout_plan(r["context"], signals.first("muscle")),
+                              deps=["context"], timeout=2.0)
+
+                await graph.run()
+                for name, timing in graph.timings.items():
+                    if timing["status"] != "skipped":
+                        health.observe(f"tool.{name}", timing["duration_ms"] / 1000, timing["status"] == "ok")
+                for error in graph.errors.values():
+                    if isinstance(error, OverloadedError):
+                        raise error
+                timings = graph.summary()
+                logger.info(f"⏱️ Tools: {timings}")
+
+                if "context" not in graph.results:
+                    raise graph.errors["context"]
+                user_context = graph.results["context"]
+
+                if "diary" in graph.results:
+                    # Already a dense summary; sent the same way in both encodings
+                    tool_results.append((graph.results["diary"], graph.results["diary"]))
+                    logger.info(f"✅ Added food diary summary to context")
+
+                food_log = graph.results.get("food_log")
+                if food_log is not None:
+                    if food_log.get("success"):
+                        eaten_foods = logged_foods(food_log)
+                        scheduler.submit("diary_append", self.diary.append, user_id, eaten_foods,
+                                         timestamp=time.time(), priority=scheduler.HIGH)
+                        tool_results.append((format_food_log_for_llm(food_log), food_log_table(food_log)))
+                        logger.info(f"✅ Added food log to context")
+                    else:
+                        logger.warning(f"⚠️ Food log analysis failed: {food_log.get('error')}")
+
+                if "food_query" in graph.results:
+                    logger.info(f"🍽️ Using food query: '{graph.results['food_query']}'")
+                    nutrition_data = graph.results.get("nutrition") or {"error": "Nutrition lookup failed"}
                     logger.info(f"📊 Nutrition API response: {nutrition_data}")
-                    
+
                     if nutrition_data.get("success"):
                         foods = nutrition_data.get("foods", [])
-                        
-                        # Format nutrition data clearly for the LLM
-                        nutrition_text = "===== NUTRITION DATA FROM NUTRITIONIX API =====\n"
-                        nutrition_text += "YOU MUST USE THESE EXACT NUMBERS IN YOUR RESPONSE.\n"
-                        nutrition_text += "DO NOT ESTIMATE OR USE YOUR OWN KNOWLEDGE.\n\n"
-                        
-                        for food in foods:
-                            nutrition_text += f"Food: {food['name']}\n"
-                            nutrition_text += f"Serving Size: {food['serving']}\n"
-                            nutrition_text += f"Calories: {food['calories']} kcal\n"
-                            nutrition_text += f"Protein: {food['protein']}g\n"
-                            nutrition_text += f"Carbohydrates: {food['carbs']}g\n"
-                            nutrition_text += f"Fat: {food['fat']}g\n"
-                            if food.get('fiber', 0) > 0:
-                                nutrition_text += f"Fiber: {food['fiber']}g\n"
-                            if food.get('sugar', 0) > 0:
-                                nutrition_text += f"Sugar: {food['sugar']}g\n"
-                            nutrition_text += "\n"
-                        
-                        nutrition_text += "===== END OF API DATA =====\n"
-                        nutrition_text += "Present these numbers EXACTLY as shown above in your response to the user.\n"
-                        
-                        tool_results.append(nutrition_text)
+                        if mentions_eating(message):
+                            eaten_foods = foods
+                            scheduler.submit("diary_append", self.diary.append, user_id, foods,
+                                             timestamp=time.time(), priority=scheduler.HIGH)
+                        tool_results.append((self._format_nutrition_for_llm(foods), nutrition_table(foods)))
                         logger.info(f"✅ Added nutrition data to context")
                     else:
                         logger.warning(f"⚠️ Nutrition API returned error: {nutrition_data.get('error')}")
                         if has_compound:
-                            yield "\n⚠️ I had trouble getting accurate data for multiple foods at once. Try asking about each food separately for better results!\n\n"
-                        
-                except Exception as e:
-                    logger.error(f"❌ Nutrition API error: {str(e)}", exc_info=True)
-            
-            # Workout detection
-            if any(word in message_lower for word in [
-                "workout", "exercise", "training", "gym",
-                "routine", "plan", "muscle", "strength"
-            ]):
-                try:
-                    level = user_context.get("fitness_level", "beginner")
-                    duration = user_context.get("preferences", {}).get("workout_duration", 30)
-                    
-                    focus = None
-                    for muscle in ["chest", "legs", "back", "arms", "core", "shoulders", "abs", "cardio"]:
-                        if muscle in message_lower:
-                            focus = muscle
-                            break
-                    
-                    workout_plan = self.exercise.create_workout_plan(level, duration, focus)
-                    tool_results.append(
-                        f"===== WORKOUT PLAN FROM EXERCISE DATABASE =====\n{json.dumps(workout_plan, indent=2)}\n===== END OF WORKOUT DATA ====="
-                    )
-                except Exception as e:
-                    logger.error(f"Exercise generation error: {str(e)}")
-            
-            # Build messages for LLM
-            messages = [{"role": "system", "content": self.system_prompt}]
-            
-            # User context
-            context_summary = f"""User Profile:
+                            emit("\n⚠️ I had trouble getting accurate data for multiple foods at once. Try asking about each food separately for better results!\n\n")
+
+                meal_plan = graph.results.get("meal_plan")
+                if meal_plan is not None:
+                    if meal_plan.get("success"):
+                        tool_results.append((format_meal_plan_for_llm(meal_plan), meal_plan_table(meal_plan)))
+                        logger.info(f"✅ Added meal plan to context ({meal_plan['solve_ms']} ms)")
+                    else:
+                        logger.warning(f"⚠️ Meal plan failed: {meal_plan.get('error')}")
+
+                workout_plan = graph.results.get("workout")
+                if workout_plan is not None:
+                    tool_results.append((
+                        f"===== WORKOUT PLAN FROM EXERCISE DATABASE =====\n{json.dumps(workout_plan, indent=2)}\n===== END OF WORKOUT DATA =====",
+                        workout_table(workout_plan)
+                    ))
+
+                # Build messages for LLM
+                messages = [{"role": "system", "content": self.system_prompt}]
+
+                # User context
+                context_summary = f"""User Profile:
 - Fitness Level: {user_context.get('fitness_level', 'Not set')}
 - Goals: {', '.join(user_context.get('goals', [])) or 'Not set'}
 - Restrictions: {', '.join(user_context.get('restrictions', [])) or 'None'}
-- Interactions: {len(user_context.get('history', []))}"""
-            
-            messages.append({"role": "system", "content": context_summary})
-            
-            # Tool results - add as USER message for stronger emphasis
-            if tool_results:
-                tool_message = "\n\n".join(tool_results)
-                messages.append({"role": "user", "content": f"[SYSTEM DATA - USE THESE EXACT NUMBERS]\n\n{tool_message}"})
-            
-            # Recent history
-            for interaction in user_context.get("history", [])[-3:]:
-                messages.append({"role": "user", "content": interaction["query"]})
-                messages.append({"role": "assistant", "content": interaction["response"]})
-            
-            # Current message
-            messages.append({"role": "user", "content": message})
-            
-            # Stream response
-            full_response = ""
-            async for chunk in self.llm.stream_completion(messages):
-                full_response += chunk
-                yield chunk
-            
-            # Save interaction
-            await self.memory.save_interaction(
-                user_id=user_id,
-                query=message,
-                response=full_response,
-                metadata={"tools_used": len(tool_results) > 0}
-            )
-            
-            logger.info(f"Successfully processed message for user {user_id}")
-            
-        except Exception as e:
-            logger.error(f"Error processing message: {str(e)}", exc_info=True)
-            yield "\n[I'm experiencing technical difficulties. Please try again in a moment.]\n"
+- Interactions: {len(user_context.get('history', []))}
+- Progress: {summarize_progress(user_context.get('progress'))}"""
+
+                messages.append({"role": "system", "content": context_summary})
+
+                # Tool results - add as USER message for stronger emphasis (compact tables
+                # unless this user is in the verbose A/B arm; the rules are in the system prompt)
+                if tool_results:
+                    encoding, tool_message, tokens_saved = context_encoder.encode(tool_results, user_id)
+                    messages.append({"role": "user", "content": tool_message})
+                    logger.info(f"🗜️ Tool data: {encoding} encoding, {tokens_saved} tokens saved")
+
+                # Recent history
+                for interaction in user_context.get("history", [])[-3:]:
+                    messages.append({"role": "user", "content": interaction["query"]})
+                    messages.append({"role": "assistant", "content": interaction["response"]})
+
+                # Current message
+                messages.append({"role": "user", "content": message})
+
+                # Stream response
+                full_response = ""
+                stream_started = time.perf_counter()
+                with health.timed("llm.stream"):
+                    async with aclosing(self.llm.stream_completion(messages)) as stream:
+                        async for chunk in stream:
+                            if not full_response:
+                                health.observe("llm.first_chunk", time.perf_counter() - stream_started)
+                            full_response += chunk
+                            emit(chunk)
+
+                if tool_results:
+                    ungrounded = context_encoder.stats.record_answer(encoding, full_response, tool_message)
+                    if ungrounded:
+                        logger.warning(f"🔢 Answer states numbers not in the {encoding} tool data: {ungrounded}")
+
+                # The reply is complete: saves and profile updates run off the request path
+                scheduler.submit(
+                    "save_interaction", self.memory.save_interaction,
+                    user_id=user_id,
+                    query=message,
+                    response=full_response,
+                    priority=scheduler.HIGH,
+                    metadata={
+                        "tools_used": len(tool_results) > 0,
+                        "tool_timings_ms": timings["tool_timings_ms"],
+                        "critical_path": timings["critical_path"],
+                        "nutrition": {
+                            key: round(sum(food.get(key, 0) for food in eaten_foods), 1)
+                            for key in ("calories", "protein", "carbs", "fat")
+                        } if eaten_foods else None,
+                        "tool_data": {"encoding": encoding, "tokens_saved": tokens_saved} if tool_results else None,
+                        "usage": {
+                            "intent": spent.intent,
+                            "prompt_tokens": spent.prompt_tokens,
+                            "completion_tokens": spent.completion_tokens,
+                            "cost": round(spent.cost, 6)
+                        }
+                    }
+                )
+                profile_updates = infer_profile_updates(message, user_context)
+                if profile_updates:
+                    logger.info(f"📝 Profile update for {user_id}: {profile_updates}")
+                    scheduler.submit("update_profile", self.memory.update_user_profile, user_id, profile_updates)
+
+                logger.info(f"Successfully processed message for user {user_id}")
+                health.observe("request", time.perf_counter() - started)
+
+            except usage.BudgetExceededError as e:
+                logger.warning(f"💸 Budget exhausted: {e}")
+                emit(usage.BUDGET_MESSAGE)
+            except OverloadedError as e:
+                logger.warning(f"🚦 Shedding request for user {user_id}: {e}")
+                health.observe("request", time.perf_counter() - started, ok=False)
+                emit(BUSY_MESSAGE)
+            except Exception as e:
+                logger.error(f"Error processing message: {str(e)}", exc_info=True)
+                health.observe("request", time.perf_counter() - started, ok=False)
+                emit("\n[I'm experiencing technical difficulties. Please try again in a moment.]\n")
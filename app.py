@@ -1,11 +1,11 @@
+import asyncio
 import logging
 import os
 import json
-import re
-from dotenv import load_dotenv
+import time
+from functools import cached_property
 from sentient_agent_framework import (
     AbstractAgent,
-    DefaultServer,
     Session,
     Query,
     ResponseHandler
@@ -13,7 +13,25 @@ from sentient_agent_framework import (
 import httpx
 from collections import defaultdict
 
-load_dotenv()
+from tools.nutrition import NutritionTools
+from tools.meal_planner import MealPlanner, format_meal_plan_for_llm
+from tools import context_encoder
+from tools.context_encoder import TOOL_DATA_RULES, nutrition_table, food_log_table, meal_plan_table
+from tools.food_log import FoodLogAnalyzer, is_food_log, format_food_log_for_llm, logged_foods
+from food_diary import FoodDiary, is_diary_question, mentions_eating
+from intent_matcher import get_matcher
+from llm_client import OpenRouterClient
+from cache_warmer import CacheWarmer
+from memory import UserMemory
+from admission import get_governor, remaining_time, request_deadline, OverloadedError, BUSY_MESSAGE
+from config import load_config
+from cancellation import current_progress, estimate_tokens, tracker
+from streaming_server import CancellableServer
+import health
+import scheduler
+import usage
+
+load_config()
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
@@ -37,23 +55,113 @@ class FitnessCoachAgent(AbstractAgent):
         
         self.user_conversations = defaultdict(list)
         
+        # Admission control: bounded in-flight calls and wait queues per upstream
+        self.openrouter_governor = get_governor("openrouter")
+        self.request_deadline = float(os.getenv("REQUEST_DEADLINE", "90"))
+        
+        # Heavy components are built on first use or during warm_up
+        self.ready = False
+        self.warm_up_ms = None
+        self._cache_warm_task = None
+        self._usage_task = None
+        
         self.system_prompt = """You are an expert fitness and nutrition coach.
 
-CRITICAL RULES FOR NUTRITION QUERIES:
-1. When you receive nutrition data from the API (marked with "NUTRITION DATA FROM NUTRITIONIX API"), you MUST use those EXACT numbers.
-2. NEVER estimate or calculate calories yourself - ONLY use API data provided.
-3. If no API data is provided, ask for more specific information.
-4. DO NOT say things like "1 large egg: approximately 70 calories" - Only use API numbers.
+DO NOT say things like "1 large egg: approximately 70 calories" - only use numbers from tool data.
 
 For workout and diet plans:
 - Ask clarifying questions about goals, fitness level, equipment, dietary restrictions
 - Provide detailed, structured plans with specific exercises, sets, reps
 - For diet plans, include meal suggestions with general portions (but NOT specific calorie counts unless using API data)
 - Be interactive, personal, and motivating
-- Remember previous conversations and reference them"""
+- Remember previous conversations and reference them
+
+""" + TOOL_DATA_RULES
         
         logger.info(f"✅ Initialized {name} with {self.model}")
     
+    @cached_property
+    def matcher(self):
+        """Single-pass keyword matcher (intent_keywords.json)"""
+        return get_matcher()
+    
+    @cached_property
+    def nutrition(self) -> NutritionTools:
+        return NutritionTools()
+    
+    @cached_property
+    def food_log(self) -> FoodLogAnalyzer:
+        """Batch analysis for whole-day food logs"""
+        return FoodLogAnalyzer(self.nutrition)
+    
+    @cached_property
+    def diary(self) -> FoodDiary:
+        return FoodDiary()
+    
+    @cached_property
+    def meal_planner(self) -> MealPlanner:
+        """Macro-target meal plans, cached per target profile"""
+        return MealPlanner()
+    
+    @cached_property
+    def memory(self) -> UserMemory:
+        """Stored profiles (goals, restrictions) shared with agent.py"""
+        return UserMemory()
+    
+    @cached_property
+    def llm(self) -> OpenRouterClient:
+        """Food query extraction, with the same LRU cache as agent.py"""
+        return OpenRouterClient(known_food=self.nutrition.is_known_food)
+    
+    @cached_property
+    def cache_warmer(self) -> CacheWarmer:
+        return CacheWarmer(self.llm, self.nutrition, self.matcher, self.memory)
+    
+    @cached_property
+    def http(self) -> httpx.AsyncClient:
+        """Shared connection pool for OpenRouter classification and answers"""
+        return httpx.AsyncClient(timeout=120.0, event_hooks=health.upstream_hooks())
+    
+    def cache_stats(self) -> dict:
+        """Hit rates of the caches built so far"""
+        caches = {}
+        if "nutrition" in self.__dict__:
+            caches["nutrition"] = health.cache_stats(self.nutrition.cache_hits, self.nutrition.cache_misses)
+        if "llm" in self.__dict__:
+            caches["extraction"] = health.cache_stats(self.llm.extraction_hits, self.llm.extraction_misses)
+        return caches
+    
+    async def warm_up(self):
+        """Build components, load caches and pre-open upstream connections"""
+        started = time.perf_counter()
+        for component in ("matcher", "memory", "llm", "food_log", "diary", "meal_planner"):
+            getattr(self, component)
+        await self.nutrition.load_fuzzy_names()
+        
+        async def touch(url: str, headers: dict):
+            try:
+                await self.http.get(url, headers=headers, timeout=10.0)
+            except Exception as e:
+                logger.warning(f"Warm-up request to {url} failed: {e}")
+        
+        await asyncio.gather(
+            touch("https://openrouter.ai/api/v1/models", {"Authorization": f"Bearer {self.openrouter_api_key}"}),
+            self.llm.warm_up(),
+            self.nutrition.warm_up()
+        )
+        if self._usage_task is None:
+            await usage.ledger.load_today_async()
+            self._usage_task = asyncio.create_task(usage.ledger.run_flusher())
+        
+        self.warm_up_ms = round((time.perf_counter() - started) * 1000, 1)
+        self.ready = True
+        logger.info(f"🔥 {self.name} warmed up in {self.warm_up_ms} ms")
+        
+        # Caches fill from past traffic in the background, paced under rate limits
+        if self.cache_warmer.top_n > 0 and self._cache_warm_task is None:
+            interval = float(os.getenv("CACHE_WARM_INTERVAL", "0"))
+            self._cache_warm_task = asyncio.create_task(self.cache_warmer.run_periodically(interval))
+    
     async def assist(self, session: Session, query: Query, response_handler: ResponseHandler):
         """Main method with AI-powered intent classification."""
         user_message = query.prompt
@@ -62,87 +170,158 @@ For workout and diet plans:
         logger.info(f"📩 Query from {user_id}: {user_message}")
         
         stream = response_handler.create_text_stream("response")
+        started = time.perf_counter()
         
-        try:
-            message_lower = user_message.lower()
+        with request_deadline(self.request_deadline), usage.usage_scope(user_id, "unclassified"):
+            try:
+                usage.check_budget(user_id)
+                
+                # One scan for every keyword signal
+                signals = self.matcher.scan(user_message)
             
-            # AI-powered intent classification
-            intent = await self._classify_intent(user_message)
-            logger.info(f"🎯 Intent: {intent}")
+                # AI-powered intent classification
+                intent = await self._classify_intent(user_message, signals)
+                usage.set_intent(intent)
+                logger.info(f"🎯 Intent: {intent}")
             
-            if intent == 'nutrition':
-                # Check for compound queries
-                has_compound = any(indicator in message_lower for indicator in [" and ", " with ", ", ", " plus "])
+                if intent == 'nutrition':
+                    # Check for compound queries
+                    has_compound = signals.has('compound')
                 
-                if has_compound:
-                    tip = "\n💡 **Tip:** For the most accurate nutrition data, I recommend asking about each food separately. However, I'll do my best with your combined query!\n\n"
-                    await stream.emit_chunk(tip)
+                    if has_compound:
+                        tip = "\n💡 **Tip:** For the most accurate nutrition data, I recommend asking about each food separately. However, I'll do my best with your combined query!\n\n"
+                        await stream.emit_chunk(tip)
                 
-                # Extract food query and get nutrition data
-                food_query = await self._extract_food_query(user_message)
-                logger.info(f"🍽️ Using food query: '{food_query}'")
+                    # Extract food query and get nutrition data (both cached and pre-warmed)
+                    self.cache_warmer.observe(user_message)
+                    food_query = await self.llm.extract_food_query(user_message)
+                    logger.info(f"🍽️ Using food query: '{food_query}'")
                 
-                nutrition_data = await self._get_nutrition_data_multiple(food_query)
+                    nutrition_data = await self._get_nutrition_data_multiple(food_query)
                 
-                if nutrition_data:
-                    nutrition_context = self._format_nutrition_for_llm(nutrition_data)
+                    if nutrition_data:
+                        if mentions_eating(user_message):
+                            scheduler.submit("diary_append", self.diary.append, user_id, nutrition_data['foods'],
+                                             timestamp=time.time(), priority=scheduler.HIGH)
+                        tool_data = (self._format_nutrition_for_llm(nutrition_data),
+                                     nutrition_table(self._nutrition_rows(nutrition_data)))
+                        response_text = await self._get_llm_with_context(
+                            user_message, user_id, [tool_data], 'nutrition'
+                        )
+                    else:
+                        response_text = "❌ Sorry, couldn't find nutrition info. Try '2 eggs' or '100g chicken'."
+            
+                elif intent == 'diary':
+                    # Questions about logged intake are answered from the diary, no upstream lookups
+                    summary = await asyncio.to_thread(self.diary.summary_for_prompt, user_id)
                     response_text = await self._get_llm_with_context(
-                        user_message, user_id, nutrition_context, 'nutrition'
+                        user_message, user_id, [(summary, summary)], 'diary'
                     )
-                else:
-                    response_text = "❌ Sorry, couldn't find nutrition info. Try '2 eggs' or '100g chicken'."
-            
-            elif intent == 'workout':
-                response_text = await self._get_llm_response(user_message, user_id, 'workout')
             
-            elif intent == 'diet_plan':
-                response_text = await self._get_llm_response(user_message, user_id, 'diet_plan')
+                elif intent == 'food_log':
+                    # Whole day of meals: one batch analysis instead of one combined query
+                    food_log = await self.food_log.analyze_day(user_message)
+                
+                    if food_log.get("success"):
+                        scheduler.submit("diary_append", self.diary.append, user_id, logged_foods(food_log),
+                                         timestamp=time.time(), priority=scheduler.HIGH)
+                        response_text = await self._get_llm_with_context(
+                            user_message, user_id,
+                            [(format_food_log_for_llm(food_log), food_log_table(food_log))], 'food_log'
+                        )
+                    else:
+                        response_text = "❌ Sorry, couldn't find nutrition info for those meals. Try 'breakfast: 2 eggs; lunch: 100g chicken'."
             
-            else:
-                response_text = await self._get_llm_response(user_message, user_id, 'general')
+                elif intent == 'workout':
+                    response_text = await self._get_llm_response(user_message, user_id, 'workout')
             
-            # Save to conversation memory
-            self.user_conversations[user_id].append({"role": "user", "content": user_message})
-            self.user_conversations[user_id].append({"role": "assistant", "content": response_text})
+                elif intent == 'diet_plan':
+                    # Portions are solved locally for the stored goals and restrictions;
+                    # the LLM only presents the plan
+                    profile = await self.memory.get_user_context(user_id)
+                    meal_plan = self.meal_planner.plan_for(user_message, profile)
+                    if meal_plan.get("success"):
+                        response_text = await self._get_llm_with_context(
+                            user_message, user_id,
+                            [(format_meal_plan_for_llm(meal_plan), meal_plan_table(meal_plan))], 'diet_plan'
+                        )
+                    else:
+                        response_text = await self._get_llm_response(user_message, user_id, 'diet_plan')
             
-            # Keep only last 10 messages
-            if len(self.user_conversations[user_id]) > 10:
-                self.user_conversations[user_id] = self.user_conversations[user_id][-10:]
+                else:
+                    response_text = await self._get_llm_response(user_message, user_id, 'general')
             
-            logger.info(f"💾 Memory: {len(self.user_conversations[user_id])} messages for {user_id}")
+                await stream.emit_chunk(response_text)
+                logger.info("✅ Response emitted")
+                health.observe("request", time.perf_counter() - started)
             
-            await stream.emit_chunk(response_text)
-            logger.info("✅ Response emitted")
+                # Save to conversation memory once the reply is out
+                scheduler.submit("remember", self._remember, user_id, user_message, response_text,
+                                 priority=scheduler.HIGH)
             
-        except Exception as e:
-            logger.error(f"❌ Error: {str(e)}", exc_info=True)
-            await stream.emit_chunk(f"❌ Error: {str(e)}")
+            except usage.BudgetExceededError as e:
+                logger.warning(f"💸 Budget exhausted: {e}")
+                await stream.emit_chunk(usage.BUDGET_MESSAGE)
+            except OverloadedError as e:
+                logger.warning(f"🚦 Shedding request from {user_id}: {e}")
+                health.observe("request", time.perf_counter() - started, ok=False)
+                await stream.emit_chunk(BUSY_MESSAGE)
+            except Exception as e:
+                logger.error(f"❌ Error: {str(e)}", exc_info=True)
+                health.observe("request", time.perf_counter() - started, ok=False)
+                await stream.emit_chunk(f"❌ Error: {str(e)}")
         
         try:
-            await stream.complete()
+            await response_handler.complete()
             logger.info("✅ Stream completed")
         except Exception as e:
             logger.error(f"❌ Stream completion error: {str(e)}")
     
-    async def _classify_intent(self, message: str) -> str:
+    async def _remember(self, user_id: str, user_message: str, response_text: str):
+        """Append the exchange to conversation memory, keeping the last 10 messages"""
+        conversation = self.user_conversations[user_id]
+        conversation.append({"role": "user", "content": user_message})
+        conversation.append({"role": "assistant", "content": response_text})
+        if len(conversation) > 10:
+            self.user_conversations[user_id] = conversation[-10:]
+        logger.info(f"💾 Memory: {len(self.user_conversations[user_id])} messages for {user_id}")
+    
+    async def shutdown(self):
+        """Finish queued background work, stop periodic tasks and flush usage"""
+        await scheduler.scheduler.drain()
+        for task in (self._cache_warm_task, self._usage_task):
+            if task is not None:
+                task.cancel()
+        self._cache_warm_task = self._usage_task = None
+        await usage.ledger.flush_async()
+    
+    async def _classify_intent(self, message: str, signals=None) -> str:
         """Use AI to classify intent - smart and scalable."""
-        message_lower = message.lower()
+        signals = signals or self.matcher.scan(message)
+        
+        # Fast path: Questions about what the user already logged
+        if is_diary_question(message):
+            return 'diary'
+        
+        # Fast path: A labeled day of meals ("breakfast: ...; lunch: ...")
+        if is_food_log(message):
+            return 'food_log'
         
         # Fast path: Obvious workout queries
-        if any(kw in message_lower for kw in ['workout', 'exercise', 'training', 'routine', 'gym']):
+        if signals.has('workout_intent'):
             return 'workout'
         
         # Fast path: Diet/meal plan queries (NOT specific nutrition data)
-        if any(phrase in message_lower for phrase in ['diet plan', 'meal plan', 'give me a plan', 'lose weight plan', 'gain weight plan']):
+        if signals.has('diet_plan_intent'):
             return 'diet_plan'
         
         # Fast path: Obvious nutrition queries
-        if any(kw in message_lower for kw in ['calories', 'calorie', 'colories', 'nutrition', 'macros']):
+        if signals.has('nutrition_intent'):
             # Use AI to determine if it's specific nutrition data or general advice
             return await self._ai_classify_nutrition(message)
         
         # Check for number + potential food query pattern
-        if re.search(r'\d+', message):
+        if signals.numbers:
             return await self._ai_classify_nutrition(message)
         
         return 'general'
@@ -179,104 +358,55 @@ Question: {message}
 Answer:"""
             }],
             "temperature": 0.1,
-            "max_tokens": 5
+            "max_tokens": 5,
+            "usage": {"include": True}
         }
         
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(url, json=payload, headers=headers, timeout=10.0)
+            async with self.openrouter_governor.slot():
+                response = await self.http.post(url, json=payload, headers=headers, timeout=remaining_time(10.0))
                 if response.status_code == 200:
                     result = response.json()
                     if 'choices' in result:
                         answer = result['choices'][0]['message']['content'].strip().lower()
+                        usage.record("classify_intent", result.get('usage'), (estimate_tokens(json.dumps(payload)), 1))
                         if 'yes' in answer:
                             logger.info(f"🤖 AI: Specific nutrition query")
                             return 'nutrition'
                         else:
                             logger.info(f"🤖 AI: General nutrition advice")
                             return 'diet_plan'
+        except OverloadedError:
+            raise
         except Exception as e:
             logger.error(f"❌ AI classification error: {str(e)}")
         
         return 'general'
     
-    async def _extract_food_query(self, user_message: str) -> str:
-        """Extract food items using LLM."""
-        url = "https://openrouter.ai/api/v1/chat/completions"
-        headers = {
-            "Authorization": f"Bearer {self.openrouter_api_key}",
-            "Content-Type": "application/json"
-        }
-        
-        payload = {
-            "model": self.model,
-            "messages": [{
-                "role": "user",
-                "content": f"""Extract ONLY the food items and quantities. Keep all foods mentioned.
-
-Examples:
-"How many calories in 3 eggs?" → "3 eggs"
-"What's in 3 large eggs with 2 slices of whole wheat toast?" → "3 large eggs and 2 slices whole wheat toast"
-"Calories in 100g chicken and rice?" → "100g chicken and rice"
-
-Question: {user_message}
-Answer (food items only):"""
-            }],
-            "temperature": 0.1,
-            "max_tokens": 100
-        }
-        
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(url, json=payload, headers=headers, timeout=30.0)
-                if response.status_code == 200:
-                    result = response.json()
-                    if 'choices' in result:
-                        extracted = result['choices'][0]['message']['content'].strip()
-                        return extracted
-        except Exception as e:
-            logger.error(f"❌ Extraction error: {str(e)}")
-        
-        return user_message
-    
     async def _get_nutrition_data_multiple(self, query: str) -> dict:
-        """Query Nutritionix API - handles multiple foods."""
-        url = "https://trackapi.nutritionix.com/v2/natural/nutrients"
-        headers = {
-            "x-app-id": self.nutritionix_app_id,
-            "x-app-key": self.nutritionix_api_key,
-            "Content-Type": "application/json"
+        """Nutrition for one or more foods via NutritionTools (cache, local database, Nutritionix)."""
+        result = await self.nutrition.analyze_food(query)
+        if not result.get("success"):
+            logger.info(f"📡 No nutrition data for '{query}': {result.get('error')}")
+            return None
+        logger.info(f"✅ Got {len(result['foods'])} food items")
+        return {"foods": [self._from_nutrition_food(food) for food in result["foods"]], "success": True}
+    
+    @staticmethod
+    def _from_nutrition_food(food: dict) -> dict:
+        """Convert a NutritionTools food to the Nutritionix-shaped dict used here."""
+        return {
+            "food_name": food['name'],
+            "serving_qty": food.get('serving_qty', 1),
+            "serving_unit": food.get('serving_unit', ''),
+            "serving_weight_grams": food.get('serving_weight_grams') or 0,
+            "calories": food['calories'],
+            "protein": food['protein'],
+            "carbs": food['carbs'],
+            "fat": food['fat'],
+            "fiber": food['fiber'],
+            "sugar": food['sugar']
         }
-        
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(url, json={"query": query}, headers=headers, timeout=15.0)
-                
-                logger.info(f"📡 Nutritionix status: {response.status_code}")
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    if result.get('foods'):
-                        foods_data = []
-                        for food in result['foods']:
-                            foods_data.append({
-                                "food_name": food.get('food_name', 'Unknown'),
-                                "serving_qty": food.get('serving_qty', 0),
-                                "serving_unit": food.get('serving_unit', ''),
-                                "serving_weight_grams": food.get('serving_weight_grams', 0),
-                                "calories": food.get('nf_calories', 0),
-                                "protein": food.get('nf_protein', 0),
-                                "carbs": food.get('nf_total_carbohydrate', 0),
-                                "fat": food.get('nf_total_fat', 0),
-                                "fiber": food.get('nf_dietary_fiber', 0),
-                                "sugar": food.get('nf_sugars', 0)
-                            })
-                        logger.info(f"✅ Got {len(foods_data)} food items")
-                        return {"foods": foods_data, "success": True}
-        except Exception as e:
-            logger.error(f"❌ Nutritionix error: {str(e)}")
-        
-        return None
     
     def _format_nutrition_for_llm(self, nutrition_data: dict) -> str:
         """Format nutrition data for LLM context."""
@@ -310,8 +440,37 @@ Answer (food items only):"""
         
         return context
     
-    async def _get_llm_with_context(self, message: str, user_id: str, nutrition_context: str, context_type: str) -> str:
-        """Get LLM response with nutrition data context."""
+    def _nutrition_rows(self, nutrition_data: dict) -> list:
+        """Nutritionix foods as context_encoder table rows"""
+        return [{
+            "name": food['food_name'],
+            "serving": f"{food['serving_qty']} {food['serving_unit']} ({food['serving_weight_grams']:.0f}g)",
+            **{key: food[key] for key in ("calories", "protein", "carbs", "fat", "fiber", "sugar")}
+        } for food in nutrition_data.get('foods', [])]
+    
+    async def _final_completion(self, url: str, payload: dict, headers: dict) -> str:
+        """Call for the final answer, tracked so abandoned requests can be accounted for"""
+        progress = current_progress()
+        progress.llm_started = True
+        async with self.openrouter_governor.slot():
+            response = await self.http.post(url, json=payload, headers=headers, timeout=remaining_time(60.0))
+            
+            if response.status_code == 200:
+                result = response.json()
+                if 'choices' in result:
+                    content = result['choices'][0]['message']['content']
+                    progress.llm_finished = True
+                    tracker.record_completion(
+                        result.get('usage', {}).get('completion_tokens') or estimate_tokens(content)
+                    )
+                    usage.record("answer", result.get('usage'),
+                                 (estimate_tokens(json.dumps(payload)), estimate_tokens(content)))
+                    return content
+            else:
+                return f"❌ AI error (status: {response.status_code})"
+    
+    async def _get_llm_with_context(self, message: str, user_id: str, tool_data: list, context_type: str) -> str:
+        """Get LLM response with tool data context ((verbose, compact) block pairs)."""
         url = "https://openrouter.ai/api/v1/chat/completions"
         headers = {
             "Authorization": f"Bearer {self.openrouter_api_key}",
@@ -324,8 +483,11 @@ Answer (food items only):"""
             recent_conv = self.user_conversations[user_id][-4:]
             messages.extend(recent_conv)
         
-        if nutrition_context:
-            messages.append({"role": "user", "content": f"[SYSTEM DATA - USE EXACT NUMBERS]\n\n{nutrition_context}"})
+        tool_data = [pair for pair in tool_data if pair[0]]
+        if tool_data:
+            encoding, data_message, tokens_saved = context_encoder.encode(tool_data, user_id)
+            messages.append({"role": "user", "content": data_message})
+            logger.info(f"🗜️ Tool data: {encoding} encoding, {tokens_saved} tokens saved")
         
         messages.append({"role": "user", "content": message})
         
@@ -333,19 +495,19 @@ Answer (food items only):"""
             "model": self.model,
             "messages": messages,
             "temperature": 0.3,
-            "max_tokens": 600
+            "max_tokens": 600,
+            "usage": {"include": True}
         }
         
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(url, json=payload, headers=headers, timeout=60.0)
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    if 'choices' in result:
-                        return result['choices'][0]['message']['content']
-                else:
-                    return f"❌ AI error (status: {response.status_code})"
+            answer = await self._final_completion(url, payload, headers)
+            if tool_data and answer:
+                ungrounded = context_encoder.stats.record_answer(encoding, answer, data_message)
+                if ungrounded:
+                    logger.warning(f"🔢 Answer states numbers not in the {encoding} tool data: {ungrounded}")
+            return answer
+        except OverloadedError:
+            raise
         except Exception as e:
             logger.error(f"❌ LLM error: {str(e)}")
             return f"❌ Error: {str(e)}"
@@ -376,19 +538,14 @@ Answer (food items only):"""
             "model": self.model,
             "messages": messages,
             "temperature": 0.8,
-            "max_tokens": 700
+            "max_tokens": 700,
+            "usage": {"include": True}
         }
         
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(url, json=payload, headers=headers, timeout=60.0)
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    if 'choices' in result:
-                        return result['choices'][0]['message']['content']
-                else:
-                    return f"❌ AI error (status: {response.status_code})"
+            return await self._final_completion(url, payload, headers)
+        except OverloadedError:
+            raise
         except Exception as e:
             logger.error(f"❌ LLM error: {str(e)}")
             return f"❌ Error: {str(e)}"
@@ -396,8 +553,35 @@ Answer (food items only):"""
 
 if __name__ == "__main__":
     try:
+        from fastapi.responses import JSONResponse
+        
         agent = FitnessCoachAgent(name="Fitness Coach AI")
-        server = DefaultServer(agent)
+        server = CancellableServer(agent)
+        
+        # Warm up before taking traffic; /ready stays 503 until it finishes
+        server._app.add_event_handler("startup", agent.warm_up)
+        # Queued history saves finish before the process exits
+        server._app.add_event_handler("shutdown", agent.shutdown)
+        
+        @server._app.get("/ready")
+        async def ready():
+            status = {"ready": agent.ready, "warm_up_ms": agent.warm_up_ms}
+            return JSONResponse(status, status_code=200 if agent.ready else 503)
+        
+        @server._app.get("/usage")
+        async def usage_report():
+            # Token usage since startup by intent → call site, intent, site and heaviest users
+            return JSONResponse(usage.ledger.report())
+        
+        @server._app.get("/health")
+        async def health_report():
+            # Degraded still takes traffic; unhealthy (OpenRouter circuit open, not warm) does not
+            # A probe only reads state: components not built yet are left out
+            report = health.report(agent.ready, agent.cache_stats())
+            report["cache_warm"] = agent.cache_warmer.stats() if "cache_warmer" in agent.__dict__ else None
+            report["background"] = scheduler.snapshot()
+            report["prompt_encoding"] = context_encoder.snapshot()
+            return JSONResponse(report, status_code=503 if report["status"] == "unhealthy" else 200)
         
         logger.info("🚀 Starting Fitness Coach with AI-powered classification...")
         server.run()
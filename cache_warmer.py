@@ -0,0 +1,239 @@
+"""
+Cache pre-warming from past traffic
+Mines user histories and request logs for the most frequent food questions
+and fills the extraction and nutrition caches before live traffic arrives,
+paced so warming never eats the upstream rate-limit budget
+"""
+
+import asyncio
+import itertools
+import json
+import os
+import re
+import time
+import logging
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from admission import OverloadedError
+from food_diary import is_diary_question
+from tools.food_log import is_food_log
+
+logger = logging.getLogger(__name__)
+
+_LOG_QUERY = re.compile(r"Query from [^:]+: (.+)$")
+_LOG_FIELDS = ("query", "prompt", "message")
+
+
+def iter_history_queries(memory) -> Iterator[str]:
+    """User messages stored in UserMemory histories (every tier and format)"""
+    for context in memory.iter_contexts():
+        for interaction in context.get("history", []):
+            query = interaction.get("query")
+            if query:
+                yield query
+
+
+def _query_from_record(record) -> Optional[str]:
+    for field in _LOG_FIELDS:
+        value = record.get(field) if isinstance(record, dict) else None
+        if isinstance(value, dict):
+            value = _query_from_record(value)
+        if isinstance(value, str) and value.strip():
+            return value
+    return None
+
+
+def iter_log_queries(paths: Iterable[str]) -> Iterator[str]:
+    """
+    User messages from request logs: JSONL records with a query/prompt/message
+    field, or the "Query from <user>: <message>" lines of agent.log
+    """
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        with open(path, 'r', errors='replace') as f:
+            for line in f:
+                line = line.strip()
+                if line.startswith("{"):
+                    try:
+                        query = _query_from_record(json.loads(line))
+                    except ValueError:
+                        query = None
+                else:
+                    match = _LOG_QUERY.search(line)
+                    query = match.group(1) if match else None
+                if query:
+                    yield query
+
+
+def classify(message: str, signals) -> str:
+    """Intent label following FitnessCoachAgent's tool routing"""
+    if is_diary_question(message):
+        return "diary"
+    if is_food_log(message):
+        return "food_log"
+    if signals.has("nutrition_terms"):
+        return "nutrition"
+    if signals.has("workout_terms"):
+        return "workout"
+    return "general"
+
+
+class CacheWarmer:
+    """Pre-populates OpenRouterClient and NutritionTools caches from past food questions"""
+
+    def __init__(
+        self,
+        llm,
+        nutrition,
+        matcher,
+        memory,
+        log_paths: Optional[List[str]] = None,
+        top_n: Optional[int] = None,
+        rate: Optional[float] = None
+    ):
+        self.llm = llm
+        self.nutrition = nutrition
+        self.matcher = matcher
+        self.memory = memory
+        self.log_paths = log_paths if log_paths is not None else [
+            path for path in os.getenv("CACHE_WARM_LOGS", "logs/agent.log,logs/requests.jsonl").split(",") if path
+        ]
+        self.top_n = top_n if top_n is not None else int(os.getenv("CACHE_WARM_TOP_N", "50"))
+        # Upstream calls per second spent on warming, well under the live limits
+        self.rate = rate if rate is not None else float(os.getenv("CACHE_WARM_RATE", "1.0"))
+
+        self.warmed: set = set()
+        self.live_total = 0
+        self.live_covered = 0
+        self.last_report: Dict = {}
+
+    def mine(self) -> Dict:
+        """
+        Count intents and food questions across histories and logs
+        Reads and decompresses every stored history: blocking, so warm() runs
+        it in a thread.
+        """
+        intents: Counter = Counter()
+        food_queries: Counter = Counter()
+        examples: Dict[str, str] = {}
+        messages = itertools.chain(iter_history_queries(self.memory), iter_log_queries(self.log_paths))
+        for message in messages:
+            intent = classify(message, self.matcher.scan(message))
+            intents[intent] += 1
+            if intent == "nutrition":
+                key = self.llm.normalize_message(message)
+                food_queries[key] += 1
+                examples.setdefault(key, message)
+        return {"intents": intents, "food_queries": food_queries, "examples": examples}
+
+    def plan(self, mined: Dict) -> List[str]:
+        """Top-N food questions to warm"""
+        return [key for key, _ in mined["food_queries"].most_common(self.top_n)]
+
+    async def _paced(self, next_at: float) -> float:
+        delay = next_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return max(next_at, time.monotonic()) + 1.0 / self.rate
+
+    async def warm(self) -> Dict:
+        """Mine past traffic and fill both caches; returns a coverage report"""
+        started = time.perf_counter()
+        mined = await asyncio.to_thread(self.mine)
+        keys = self.plan(mined)
+        total = sum(mined["food_queries"].values())
+        covered = sum(mined["food_queries"][key] for key in keys)
+
+        upstream_calls = extracted = analyzed = failed = 0
+        next_at = time.monotonic()
+        for key in keys:
+            message = mined["examples"][key]
+            try:
+                food_query = self.llm.get_cached_extraction(message)
+                if food_query is None:
+                    next_at = await self._paced(next_at)
+                    upstream_calls += 1
+                    food_query = await self.llm.extract_food_query(message)
+                    extracted += 1
+
+                if self.nutrition.get_cached(food_query) is None:
+                    misses = self.nutrition.cache_misses
+                    next_at = await self._paced(next_at)
+                    result = await self.nutrition.analyze_food(food_query)
+                    upstream_calls += self.nutrition.cache_misses - misses
+                    if not result.get("success"):
+                        failed += 1
+                        continue
+                    analyzed += 1
+                self.warmed.add(key)
+            except OverloadedError:
+                logger.warning("🚦 Upstreams busy, stopping cache warm-up early")
+                break
+            except Exception as e:
+                failed += 1
+                logger.warning(f"Cache warm-up failed for '{message}': {e}")
+
+        self.last_report = {
+            "mined_queries": sum(mined["intents"].values()),
+            "intents": dict(mined["intents"].most_common()),
+            "distinct_food_queries": len(mined["food_queries"]),
+            "warmed": len(self.warmed),
+            "extracted": extracted,
+            "analyzed": analyzed,
+            "failed": failed,
+            "upstream_calls": upstream_calls,
+            "historical_coverage": round(covered / total, 3) if total else 0.0,
+            "seconds": round(time.perf_counter() - started, 2)
+        }
+        logger.info(f"🔥 Cache warm-up: {self.last_report}")
+        return self.last_report
+
+    async def run_periodically(self, interval: float):
+        """Warm now, then again every `interval` seconds (0 = once)"""
+        while True:
+            try:
+                await self.warm()
+            except Exception as e:
+                logger.error(f"❌ Cache warm-up failed: {e}")
+            if interval <= 0:
+                return
+            await asyncio.sleep(interval)
+
+    def observe(self, message: str):
+        """Record a live food question, for coverage of the warmed set"""
+        self.live_total += 1
+        if self.llm.normalize_message(message) in self.warmed:
+            self.live_covered += 1
+
+    def stats(self) -> Dict:
+        return {
+            **self.last_report,
+            "live_food_queries": self.live_total,
+            "live_coverage": round(self.live_covered / self.live_total, 3) if self.live_total else None
+        }
+
+
+if __name__ == "__main__":
+    # Dry run (no upstream calls): python cache_warmer.py [data_dir] [log ...]
+    import sys
+    from intent_matcher import get_matcher
+    from llm_client import OpenRouterClient
+    from memory import UserMemory
+
+    class _Offline:
+        normalize_message = staticmethod(OpenRouterClient.normalize_message)
+
+    warmer = CacheWarmer(_Offline(), None, get_matcher(),
+                         UserMemory(sys.argv[1] if len(sys.argv) > 1 else "data"),
+                         log_paths=sys.argv[2:] or None)
+    mined = warmer.mine()
+    keys = warmer.plan(mined)
+    total = sum(mined["food_queries"].values())
+    print(f"Intents: {dict(mined['intents'].most_common())}")
+    print(f"Top {len(keys)} of {len(mined['food_queries'])} distinct food questions:")
+    for key in keys[:20]:
+        print(f"  {mined['food_queries'][key]:>5}  {key}")
+    if total:
+        print(f"Warmed set covers {sum(mined['food_queries'][k] for k in keys) / total:.1%} of past food questions")
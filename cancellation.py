@@ -0,0 +1,112 @@
+"""
+Client-disconnect cancellation accounting
+When the browser goes away the request task is cancelled; the cancellation
+unwinds through tool calls and closes the upstream LLM stream. This module
+keeps track of how far each request got so the tokens we did not pay for
+can be counted.
+"""
+
+import asyncio
+import contextvars
+import logging
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Assumed completion length until real completions have been measured
+DEFAULT_COMPLETION_TOKENS = 400
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token)"""
+    return (len(text) + 3) // 4 if text else 0
+
+
+class RequestProgress:
+    """How far the current request's final LLM answer has got"""
+
+    def __init__(self):
+        self.llm_started = False
+        self.llm_finished = False
+        self.streamed = False
+        self.received_tokens = 0
+
+
+# Progress of the request currently being handled
+_progress: contextvars.ContextVar[Optional[RequestProgress]] = contextvars.ContextVar("request_progress", default=None)
+
+
+class CancellationTracker:
+    """Counts cancelled requests and the completion tokens they did not consume"""
+
+    def __init__(self):
+        self.completed = 0
+        self.completion_tokens = 0
+        self.cancelled_requests = 0
+        self.cancelled_streams = 0
+        self.saved_tokens = 0
+
+    def expected_completion_tokens(self) -> int:
+        if not self.completed:
+            return DEFAULT_COMPLETION_TOKENS
+        return self.completion_tokens // self.completed
+
+    def record_completion(self, tokens: int):
+        """A final answer ran to the end"""
+        self.completed += 1
+        self.completion_tokens += tokens
+
+    def record_cancelled(self, progress: RequestProgress):
+        """
+        A request was abandoned. Tokens are saved when the final answer was
+        never requested, or when its stream was closed part-way; a cancelled
+        non-streaming call may still be billed, so it counts as no saving.
+        """
+        self.cancelled_requests += 1
+        saved = 0
+        if not progress.llm_started:
+            saved = self.expected_completion_tokens()
+        elif progress.streamed and not progress.llm_finished:
+            self.cancelled_streams += 1
+            saved = max(self.expected_completion_tokens() - progress.received_tokens, 0)
+        self.saved_tokens += saved
+        logger.info(f"🛑 Request cancelled by client (≈{saved} completion tokens saved)")
+
+    def stats(self) -> Dict:
+        return {
+            "cancelled_requests": self.cancelled_requests,
+            "cancelled_streams": self.cancelled_streams,
+            "saved_tokens_estimate": self.saved_tokens,
+            "avg_completion_tokens": self.expected_completion_tokens()
+        }
+
+
+tracker = CancellationTracker()
+
+
+def current_progress() -> RequestProgress:
+    """Progress of the current request (a throwaway one outside any request)"""
+    return _progress.get() or RequestProgress()
+
+
+@contextmanager
+def track_request():
+    """
+    Track LLM progress for everything run inside this block and record the
+    request as cancelled if it is torn down before finishing
+    """
+    progress = RequestProgress()
+    token = _progress.set(progress)
+    try:
+        yield progress
+    except (asyncio.CancelledError, GeneratorExit):
+        tracker.record_cancelled(progress)
+        raise
+    finally:
+        _progress.reset(token)
+
+
+def snapshot() -> Dict:
+    """Cancellation counters for health checks"""
+    return tracker.stats()
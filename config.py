@@ -0,0 +1,37 @@
+"""
+One-time process configuration
+Loads .env and sets up logging exactly once, however many modules ask
+"""
+
+import os
+import logging
+from dotenv import load_dotenv
+
+_config_loaded = False
+_logging_configured = False
+
+
+def load_config():
+    """Load .env into the environment (first call only)"""
+    global _config_loaded
+    if not _config_loaded:
+        load_dotenv()
+        _config_loaded = True
+
+
+def setup_logging(log_dir: str = None):
+    """Log to stdout and logs/agent.log, creating the log directory if needed"""
+    global _logging_configured
+    if _logging_configured:
+        return
+    log_dir = log_dir or os.getenv("LOG_DIR", "logs")
+    os.makedirs(log_dir, exist_ok=True)
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(os.path.join(log_dir, 'agent.log')),
+            logging.StreamHandler()
+        ]
+    )
+    _logging_configured = True
@@ -0,0 +1,370 @@
+"""
+Streaming bulk export of user histories
+Walks the sharded user store one user at a time, in key order across the
+hot and cold tiers, and emits one record per history turn as NDJSON or as
+columnar batches (one JSON object of column arrays per batch). Memory use
+does not grow with the number of users: only the current user's context
+and at most one batch are held at a time.
+
+Safe against a live system: user files are replaced atomically, so a file
+is always read whole; the manifest is never touched and cold users are not
+restored. A checkpoint (last exported key and output offset) is written as
+the export goes, and an interrupted run resumes from it:
+
+    python export.py data -o histories.ndjson --since 2026-10-01 --intent nutrition
+"""
+
+import asyncio
+import json
+import os
+import time
+import logging
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from history_codec import load_context_file
+from user_store import ShardedUserStore, SUFFIX
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ("user_id", "user_key", "timestamp", "intent", "query", "response", "tools_used", "calories",
+          "protein", "carbs", "fat", "prompt_tokens", "completion_tokens", "cost")
+STORE, LEGACY = 0, 1
+BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+CHECKPOINT_EVERY = int(os.getenv("EXPORT_CHECKPOINT_EVERY", "200"))
+_encode = json.JSONEncoder(separators=(",", ":")).encode
+
+
+def _subdirs(path: str) -> List[str]:
+    try:
+        return [name for name in os.listdir(path) if len(name) == 2 and os.path.isdir(os.path.join(path, name))]
+    except FileNotFoundError:
+        return []
+
+
+def _user_files(path: str) -> List[str]:
+    try:
+        return [name for name in os.listdir(path) if name.endswith(SUFFIX)]
+    except FileNotFoundError:
+        return []
+
+
+def iter_user_files(store: ShardedUserStore, after: Optional[Tuple[int, str]] = None) -> Iterator[Tuple[Tuple[int, str], List[str]]]:
+    """
+    (cursor, candidate paths) for every stored user in cursor order, skipping
+    everything up to `after`. Sharded users come first, ordered by key with
+    the hot and cold trees merged, so a user moving tier mid-export is seen
+    once; then not-yet-migrated legacy files by name.
+    """
+    phase, last = after or (STORE, "")
+    roots = (store.root, store.cold_root)
+    if phase == STORE:
+        for top in sorted(set(_subdirs(roots[0])) | set(_subdirs(roots[1]))):
+            if top < last[:2]:
+                continue
+            for mid in sorted(set(_subdirs(os.path.join(roots[0], top))) | set(_subdirs(os.path.join(roots[1], top)))):
+                if top + mid < last[:4]:
+                    continue
+                names = set()
+                for root in roots:
+                    names.update(_user_files(os.path.join(root, top, mid)))
+                for name in sorted(names):
+                    key = name[:-len(SUFFIX)]
+                    if key > last:
+                        yield (STORE, key), [os.path.join(root, top, mid, name) for root in roots]
+        last = ""
+    if store.legacy_dir and os.path.isdir(store.legacy_dir):
+        for name in sorted(os.listdir(store.legacy_dir)):
+            if name.startswith("user_") and name.endswith((".mem", ".json")) and name > last:
+                yield (LEGACY, name), [os.path.join(store.legacy_dir, name)]
+
+
+def _read(paths: List[str]) -> Optional[Dict]:
+    # The compactor or a restore may move the file between listing and reading
+    for path in paths:
+        try:
+            return load_context_file(path)
+        except FileNotFoundError:
+            continue
+        except Exception as e:
+            logger.warning(f"Skipping unreadable user file {path}: {e}")
+            return None
+    return None
+
+
+class _IntentLabeler:
+    """Intent from the turn's usage metadata; older turns are classified like the cache warmer does"""
+
+    def __init__(self):
+        self._matcher = None
+
+    def __call__(self, turn: Dict) -> str:
+        intent = ((turn.get("metadata") or {}).get("usage") or {}).get("intent")
+        if intent:
+            return intent
+        from cache_warmer import classify
+        from intent_matcher import get_matcher
+        if self._matcher is None:
+            self._matcher = get_matcher()
+        query = turn.get("query", "")
+        return classify(query, self._matcher.scan(query))
+
+
+def turn_records(cursor: Tuple[int, str], context: Dict, since: Optional[str] = None, until: Optional[str] = None,
+                 intents: Optional[Iterable[str]] = None, include_responses: bool = True,
+                 label=None) -> Iterator[Dict]:
+    """
+    One flat record per history turn passing the filters. `since`/`until` are
+    ISO dates or timestamps (inclusive); responses are only decompressed for
+    turns that are exported.
+    """
+    label = label or _IntentLabeler()
+    intents = set(intents) if intents else None
+    user_key = cursor[1] if cursor[0] == STORE else None
+    for turn in context.get("history", []):
+        timestamp = turn.get("timestamp", "")
+        if since and timestamp < since:
+            continue
+        if until and timestamp[:len(until)] > until:
+            continue
+        intent = label(turn)
+        if intents and intent not in intents:
+            continue
+        metadata = turn.get("metadata") or {}
+        nutrition = metadata.get("nutrition") or {}
+        spent = metadata.get("usage") or {}
+        yield {
+            "user_id": context.get("user_id"),
+            "user_key": user_key,
+            "timestamp": timestamp,
+            "intent": intent,
+            "query": turn.get("query"),
+            "response": turn.get("response") if include_responses else None,
+            "tools_used": metadata.get("tools_used"),
+            "calories": nutrition.get("calories"),
+            "protein": nutrition.get("protein"),
+            "carbs": nutrition.get("carbs"),
+            "fat": nutrition.get("fat"),
+            "prompt_tokens": spent.get("prompt_tokens"),
+            "completion_tokens": spent.get("completion_tokens"),
+            "cost": spent.get("cost")
+        }
+
+
+def iter_users(store: ShardedUserStore, after: Optional[Tuple[int, str]] = None,
+               **filters) -> Iterator[Tuple[Tuple[int, str], List[Dict]]]:
+    """(cursor, records) per user; a cursor is a safe point to resume after"""
+    label = _IntentLabeler()
+    for cursor, paths in iter_user_files(store, after):
+        context = _read(paths)
+        yield cursor, list(turn_records(cursor, context, label=label, **filters)) if context else []
+
+
+def iter_records(store: ShardedUserStore, **filters) -> Iterator[Dict]:
+    """Every exported record, as a flat generator"""
+    for _, records in iter_users(store, **filters):
+        yield from records
+
+
+def columns(records: List[Dict]) -> Dict:
+    """A batch of records as column arrays"""
+    return {"rows": len(records), "columns": {field: [record[field] for record in records] for field in FIELDS}}
+
+
+class Checkpoint:
+    """Resume point of an export: last exported cursor and the output size at that point"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self) -> Optional[Dict]:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def save(self, state: Dict):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def export(store: ShardedUserStore, out_path: str, fmt: str = "ndjson", checkpoint_path: Optional[str] = None,
+           restart: bool = False, batch_size: int = BATCH_SIZE, checkpoint_every: int = CHECKPOINT_EVERY,
+           source: Callable[..., Iterator[Tuple[Tuple[int, str], List[Dict]]]] = None, **filters) -> Dict:
+    """
+    Export to out_path, resuming from the checkpoint when one exists for the
+    same format and filters. Users come from source(store, after=cursor,
+    **filters), iter_users by default. Returns counts for the run.
+    """
+    source = source or iter_users
+    if fmt not in ("ndjson", "columns"):
+        raise ValueError(f"Unknown export format {fmt!r}")
+    checkpoint = Checkpoint(checkpoint_path or f"{out_path}.checkpoint")
+    settings = {"format": fmt, **{key: sorted(value) if key == "intents" and value else value
+                                  for key, value in filters.items()}}
+    state = None if restart else checkpoint.load()
+    if state is not None and state.get("settings") != settings:
+        raise ValueError(f"Checkpoint {checkpoint.path} is for a different export ({state.get('settings')}); "
+                         "pass restart=True to start over")
+
+    if state is not None and os.path.exists(out_path):
+        # Anything written after the last checkpoint is written again
+        out = open(out_path, 'r+b')
+        out.truncate(state["offset"])
+        out.seek(state["offset"])
+        after = tuple(state["after"])
+        logger.info(f"▶️ Resuming export after {state['users']} users, {state['records']} records")
+    else:
+        out = open(out_path, 'wb')
+        state = {"settings": settings, "after": None, "offset": 0, "users": 0, "records": 0}
+        after = None
+
+    started = time.perf_counter()
+    batch: List[Dict] = []
+
+    def write_batch():
+        if batch:
+            out.write(_encode(columns(batch)).encode("utf-8") + b"\n")
+            batch.clear()
+
+    with out:
+        since_checkpoint = 0
+        for cursor, records in source(store, after=after, **filters):
+            if fmt == "ndjson":
+                out.write(b"".join(_encode(record).encode("utf-8") + b"\n"
+                                   for record in records))
+            else:
+                for record in records:
+                    batch.append(record)
+                    if len(batch) >= batch_size:
+                        write_batch()
+            state["users"] += 1
+            state["records"] += len(records)
+            state["after"] = list(cursor)
+            since_checkpoint += 1
+            if since_checkpoint >= checkpoint_every:
+                write_batch()
+                out.flush()
+                state["offset"] = out.tell()
+                checkpoint.save(state)
+                since_checkpoint = 0
+        write_batch()
+
+    checkpoint.clear()
+    elapsed = time.perf_counter() - started
+    logger.info(f"📤 Exported {state['records']} records from {state['users']} users in {elapsed:.1f}s")
+    return {"users": state["users"], "records": state["records"], "seconds": round(elapsed, 2),
+            "bytes": os.path.getsize(out_path)}
+
+
+async def stream_ndjson(store: ShardedUserStore, users_per_step: int = 50, **filters):
+    """
+    NDJSON lines for an HTTP response or other async consumer. File reads run
+    on a worker thread a few users at a time, so the event loop keeps
+    serving requests while the export streams.
+    """
+    users = iter_users(store, **filters)
+
+    def step() -> Optional[str]:
+        lines = []
+        for _ in range(users_per_step):
+            item = next(users, None)
+            if item is None:
+                return "".join(lines) if lines else None
+            lines.extend(_encode(record) + "\n" for record in item[1])
+        return "".join(lines)
+
+    while True:
+        chunk = await asyncio.to_thread(step)
+        if chunk is None:
+            return
+        if chunk:
+            yield chunk
+
+
+def open_store(data_dir: str) -> ShardedUserStore:
+    """The store UserMemory(data_dir) uses"""
+    return ShardedUserStore(
+        os.path.join(data_dir, "users"),
+        cold_root=os.getenv("USER_COLD_DIR") or os.path.join(data_dir, "cold"),
+        legacy_dir=data_dir
+    )
+
+
+if __name__ == "__main__":
+    # Export: python export.py [data_dir] -o histories.ndjson [--since/--until DATE] [--intent NAME ...]
+    # Benchmark: python export.py --bench [users]
+    import argparse
+    import shutil
+    import sys
+    import tempfile
+    import tracemalloc
+
+    parser = argparse.ArgumentParser(description="Stream user histories out of the user store")
+    parser.add_argument("data_dir", nargs="?", default="data")
+    parser.add_argument("-o", "--out", default="histories.ndjson")
+    parser.add_argument("--format", choices=("ndjson", "columns"), default="ndjson")
+    parser.add_argument("--since", help="first date (YYYY-MM-DD or ISO timestamp), inclusive")
+    parser.add_argument("--until", help="last date (YYYY-MM-DD or ISO timestamp), inclusive")
+    parser.add_argument("--intent", action="append", dest="intents", help="only these intents (repeatable)")
+    parser.add_argument("--no-responses", action="store_true", help="leave out response text")
+    parser.add_argument("--checkpoint", help="checkpoint file (default <out>.checkpoint)")
+    parser.add_argument("--restart", action="store_true", help="ignore an existing checkpoint")
+    parser.add_argument("--bench", type=int, nargs="?", const=20_000, metavar="USERS")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    if args.bench:
+        from history_codec import write_context_file
+        from user_store import user_file_key
+
+        root = tempfile.mkdtemp(prefix="export_bench_")
+        store = open_store(root)
+        intents = ("nutrition", "workout", "diet_plan", "general")
+        for i in range(args.bench):
+            path = store.path(user_file_key(f"user-{i}"))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            write_context_file(path, {"user_id": f"user-{i}", "history": [{
+                "timestamp": f"2026-10-{day + 1:02d}T12:00:00", "query": "how many calories in 2 eggs",
+                "response": "Two large eggs have 143 kcal and 12.6 g protein. " * 8,
+                "metadata": {"usage": {"intent": intents[(i + day) % 4], "prompt_tokens": 900,
+                                       "completion_tokens": 120, "cost": 0.0001}}
+            } for day in range(20)]})
+        filters = {"since": "2026-10-05", "until": "2026-10-14", "intents": ["nutrition"]}
+        out, reference = os.path.join(root, "out.ndjson"), os.path.join(root, "reference.ndjson")
+
+        # Interrupt a run half way, then resume it from its checkpoint
+        def interrupted(*a, **kw):
+            for n, item in enumerate(iter_users(*a, **kw)):
+                if n == args.bench // 2:
+                    raise KeyboardInterrupt
+                yield item
+
+        try:
+            export(store, out, source=interrupted, **filters)
+        except KeyboardInterrupt:
+            print(f"interrupted at {Checkpoint(out + '.checkpoint').load()['users']:,} users")
+        export(store, out, **filters)
+
+        tracemalloc.start()
+        stats = export(store, reference, **filters)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        with open(out, 'rb') as a, open(reference, 'rb') as b:
+            identical = a.read() == b.read()
+        print(f"{args.bench:,} users → {stats['records']:,} records, {stats['bytes'] / 1e6:.1f} MB in "
+              f"{stats['seconds']}s ({args.bench / stats['seconds']:,.0f} users/s), peak heap "
+              f"{peak / 1e6:.2f} MB; resumed export identical: {identical}")
+        shutil.rmtree(root)
+        sys.exit(0)
+
+    stats = export(open_store(args.data_dir), args.out, fmt=args.format, checkpoint_path=args.checkpoint,
+                   restart=args.restart, since=args.since, until=args.until, intents=args.intents,
+                   include_responses=not args.no_responses)
+    print(json.dumps(stats))
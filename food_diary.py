@@ -0,0 +1,318 @@
+"""
+Columnar food diary
+Every resolved food item is appended as one row to memory-mapped column
+files, so daily/weekly/monthly rollups are a few vectorized numpy passes.
+Several diaries (app.py and agent.py, or several worker processes) can share
+one directory: appends hold a file lock and re-read the row count first.
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import logging
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+NUTRIENTS = ["calories", "protein", "carbs", "fat", "fiber", "sugar"]
+
+COLUMNS = {
+    "timestamp": np.int64,
+    "user": np.uint64,
+    **{name: np.float32 for name in NUTRIENTS}
+}
+
+PERIODS = ("day", "week", "month")
+
+_EATING_RE = re.compile(r"\b(i|i've|ive|we|we've)\s+(just\s+|already\s+)?(ate|had|eaten|drank|consumed)\b")
+# "What I've eaten today" is a question only when the question word comes
+# first and no food follows the verb: "I had a banana today" is a report
+_DIARY_QUESTION_RE = re.compile(
+    r"\b(did|have)\s+i\s+(eat|eaten|had|have|consume|consumed|drink|drunk)\b"
+    r"|\b(how\s+(many|much)|what|total)\b[^.!?]*?\b(i|i've|ive)\s+(ate|eaten|had|consumed)\b"
+    r"(?!\s+(a|an|some|one|two|three|four|five|half|\d))[^.!?]*?\b(today|this week|this month|so far|yesterday)\b"
+    r"|\bmy\s+(daily|weekly|monthly)\s+(calories|intake|macros|protein)\b"
+)
+
+
+def mentions_eating(message: str) -> bool:
+    """True when the user reports food they actually ate ("I had 2 eggs")"""
+    return bool(_EATING_RE.search(message.lower()))
+
+
+def is_diary_question(message: str) -> bool:
+    """True for questions about logged intake ("how many calories did I eat this week?")"""
+    return bool(_DIARY_QUESTION_RE.search(message.lower()))
+
+
+def period_start(days: np.ndarray, period: str) -> np.ndarray:
+    """First day of the day/week (Monday)/month containing each datetime64[D]"""
+    if period == "week":
+        # 1970-01-01 was a Thursday
+        return days - (days.astype(np.int64) + 3) % 7
+    if period == "month":
+        return days.astype("datetime64[M]").astype("datetime64[D]")
+    return days
+
+
+def user_key(user_id: str) -> int:
+    """Stable 64-bit key for a user id"""
+    return int.from_bytes(hashlib.blake2b(user_id.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class FoodDiary:
+    """Append-only, array-backed store of food entries with vectorized rollups"""
+
+    def __init__(self, storage_dir: str = None, initial_capacity: int = 4096):
+        self.storage_dir = storage_dir or os.getenv("FOOD_DIARY_DIR", os.path.join("data", "diary"))
+        os.makedirs(self.storage_dir, exist_ok=True)
+        self._meta_path = os.path.join(self.storage_dir, "meta.json")
+        self._lock_path = os.path.join(self.storage_dir, "diary.lock")
+        # Threads of this instance; other instances and processes use the file lock
+        self._lock = threading.RLock()
+
+        self.count = 0
+        self.capacity = initial_capacity
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path, 'r') as f:
+                meta = json.load(f)
+            self.count = meta["count"]
+            self.capacity = meta["capacity"]
+
+        self._columns: Dict[str, np.memmap] = {}
+        self._open_columns()
+
+    def _column_path(self, name: str) -> str:
+        return os.path.join(self.storage_dir, f"{name}.col")
+
+    def _open_columns(self):
+        """Map every column file, creating or growing it to the current capacity"""
+        for name, dtype in COLUMNS.items():
+            path = self._column_path(name)
+            size = self.capacity * np.dtype(dtype).itemsize
+            if not os.path.exists(path) or os.path.getsize(path) < size:
+                with open(path, 'ab') as f:
+                    f.truncate(size)
+            self._columns[name] = np.memmap(path, dtype=dtype, mode='r+', shape=(self.capacity,))
+
+    def _grow(self, needed: int):
+        """Double capacity until `needed` rows fit"""
+        capacity = self.capacity
+        while capacity < needed:
+            capacity *= 2
+        self.flush()
+        self._columns.clear()
+        self.capacity = capacity
+        self._open_columns()
+
+    def _save_meta(self):
+        tmp_path = self._meta_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({"count": self.count, "capacity": self.capacity, "columns": list(COLUMNS)}, f)
+        os.replace(tmp_path, self._meta_path)
+
+    def _refresh(self):
+        """Catch up with rows appended by other diaries on the same directory"""
+        if not os.path.exists(self._meta_path):
+            return
+        with open(self._meta_path, 'r') as f:
+            meta = json.load(f)
+        if meta["capacity"] > self.capacity:
+            # Another diary grew the files: map them at the new size
+            self.flush()
+            self._columns.clear()
+            self.capacity = meta["capacity"]
+            self._open_columns()
+        self.count = meta["count"]
+
+    @contextmanager
+    def _writing(self):
+        """Exclusive access to the directory, with the latest row count"""
+        with self._lock, open(self._lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self._refresh()
+                yield
+                self._save_meta()
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def append(self, user_id: str, foods: List[Dict], timestamp: Optional[float] = None):
+        """
+        Record resolved food items (dicts with calories/protein/... keys)
+        Blocking file I/O: run it off the event loop (the agents submit it to
+        the background scheduler).
+        """
+        if not foods:
+            return
+        rows = len(foods)
+        with self._writing():
+            if self.count + rows > self.capacity:
+                self._grow(self.count + rows)
+            start, end = self.count, self.count + rows
+            self._columns["timestamp"][start:end] = int(timestamp if timestamp is not None else time.time())
+            self._columns["user"][start:end] = user_key(user_id)
+            for name in NUTRIENTS:
+                self._columns[name][start:end] = [float(food.get(name) or 0) for food in foods]
+            self.count = end
+        logger.info(f"📒 Diary: recorded {rows} item(s) for {user_id}")
+
+    def append_columns(self, user_keys: np.ndarray, timestamps: np.ndarray, values: Dict[str, np.ndarray]):
+        """Bulk append pre-built columns (imports and benchmarks)"""
+        rows = len(user_keys)
+        with self._writing():
+            if self.count + rows > self.capacity:
+                self._grow(self.count + rows)
+            start, end = self.count, self.count + rows
+            self._columns["timestamp"][start:end] = timestamps
+            self._columns["user"][start:end] = user_keys
+            for name in NUTRIENTS:
+                self._columns[name][start:end] = values.get(name, 0)
+            self.count = end
+
+    def flush(self):
+        for column in self._columns.values():
+            column.flush()
+
+    def _select(self, user_id: str, start: Optional[float], end: Optional[float]) -> np.ndarray:
+        """Row indices for one user within [start, end)"""
+        mask = self._columns["user"][:self.count] == np.uint64(user_key(user_id))
+        if start is not None or end is not None:
+            timestamps = self._columns["timestamp"][:self.count]
+            if start is not None:
+                mask &= timestamps >= int(start)
+            if end is not None:
+                mask &= timestamps < int(end)
+        return np.flatnonzero(mask)
+
+    def rollup(self, user_id: str, period: str = "day", start: Optional[float] = None, end: Optional[float] = None) -> Dict:
+        """
+        Totals per day/week/month for a user
+        Returns {"periods": [...], "entries": [...], "calories": [...], ...}
+        """
+        with self._lock:
+            self._refresh()
+            if period not in PERIODS:
+                raise ValueError(f"Unknown period: {period}")
+
+            rows = self._select(user_id, start, end)
+            if rows.size == 0:
+                return {"periods": [], "entries": [], **{name: [] for name in NUTRIENTS}}
+
+            days = self._columns["timestamp"][rows].astype("datetime64[s]").astype("datetime64[D]")
+            keys, inverse = np.unique(period_start(days, period), return_inverse=True)
+
+            result = {
+                "periods": [str(key) for key in keys],
+                "entries": np.bincount(inverse, minlength=len(keys)).tolist()
+            }
+            for name in NUTRIENTS:
+                totals = np.bincount(inverse, weights=self._columns[name][rows], minlength=len(keys))
+                result[name] = np.round(totals, 1).tolist()
+            return result
+
+    def rolling_average(self, user_id: str, window: int = 7, days: int = 30, now: Optional[float] = None) -> Dict:
+        """
+        Rolling mean of daily totals over the last `days` days (days without
+        entries count as zero)
+        """
+        with self._lock:
+            self._refresh()
+            now = now if now is not None else time.time()
+            end_day = np.datetime64(int(now), "s").astype("datetime64[D]") + 1
+            start_day = end_day - days
+            start = start_day.astype("datetime64[s]").astype(np.int64)
+
+            rows = self._select(user_id, start, int(now) + 1)
+            row_days = self._columns["timestamp"][rows].astype("datetime64[s]").astype("datetime64[D]")
+            day_index = (row_days - start_day).astype(np.int64)
+
+            result = {"days": [str(start_day + i) for i in range(days)]}
+            for name in NUTRIENTS:
+                daily = np.bincount(day_index, weights=self._columns[name][rows], minlength=days)[:days]
+                # Partial windows at the start average over the days available
+                sums = np.convolve(daily, np.ones(window), mode="full")[:days]
+                counts = np.minimum(np.arange(1, days + 1), window)
+                result[name] = np.round(sums / counts, 1).tolist()
+            return result
+
+    def summary_for_prompt(self, user_id: str, now: Optional[float] = None) -> str:
+        """Compact intake summary (today, this week, this month, 7-day average)"""
+        with self._lock:
+            self._refresh()
+            now = now if now is not None else time.time()
+            today = np.datetime64(int(now), "s").astype("datetime64[D]")
+            bounds = {
+                "Today": today,
+                "This week": period_start(today, "week"),
+                "This month": period_start(today, "month")
+            }
+
+            # One pass over the store for this user, then cheap filters on the subset
+            earliest = min(bounds.values()).astype("datetime64[s]").astype(np.int64)
+            rows = self._select(user_id, earliest, int(now) + 1)
+            timestamps = self._columns["timestamp"][rows]
+            values = {name: self._columns[name][rows] for name in NUTRIENTS}
+
+            lines = ["===== FOOD DIARY (LOGGED INTAKE) ====="]
+            for label, start_day in bounds.items():
+                in_range = timestamps >= start_day.astype("datetime64[s]").astype(np.int64)
+                items = int(in_range.sum())
+                if items == 0:
+                    lines.append(f"{label}: nothing logged")
+                    continue
+                totals = {name: float(values[name][in_range].sum()) for name in NUTRIENTS}
+                lines.append(f"{label} (since {start_day}): {totals['calories']:.0f} kcal | "
+                             f"P {totals['protein']:.0f}g | C {totals['carbs']:.0f}g | F {totals['fat']:.0f}g "
+                             f"({items} items)")
+
+            averages = self.rolling_average(user_id, window=7, days=7, now=now)
+            lines.append(f"7-day average: {averages['calories'][-1]:.0f} kcal/day | "
+                         f"P {averages['protein'][-1]:.0f}g | C {averages['carbs'][-1]:.0f}g | F {averages['fat'][-1]:.0f}g")
+            lines.append("===== END OF DIARY DATA =====")
+            return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    # Benchmark: python food_diary.py [rows]
+    import sys
+    import tempfile
+
+    total_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    users = 10_000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        diary = FoodDiary(tmp)
+        rng = np.random.default_rng(0)
+        keys = np.array([user_key(f"user{i}") for i in range(users)], dtype=np.uint64)
+        now = int(time.time())
+
+        started = time.perf_counter()
+        diary.append_columns(
+            keys[rng.integers(0, users, total_rows)],
+            rng.integers(now - 365 * 86400, now, total_rows),
+            {name: rng.uniform(0, 500, total_rows) for name in NUTRIENTS}
+        )
+        diary.append("user0", [{"calories": 100, "protein": 5}], timestamp=now)
+        print(f"Loaded {diary.count:,} rows in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+        reopened = FoodDiary(tmp)
+        for label, call in [
+            ("daily rollup", lambda: reopened.rollup("user0", "day")),
+            ("weekly rollup", lambda: reopened.rollup("user0", "week")),
+            ("monthly rollup", lambda: reopened.rollup("user0", "month")),
+            ("30-day rolling avg", lambda: reopened.rolling_average("user0")),
+            ("prompt summary", lambda: reopened.summary_for_prompt("user0"))
+        ]:
+            runs = 20
+            started = time.perf_counter()
+            for _ in range(runs):
+                call()
+            print(f"{label:>20}: {(time.perf_counter() - started) / runs * 1000:.2f} ms")
@@ -0,0 +1,178 @@
+"""
+Rolling health metrics and degraded-state detection
+Each stage (tools, upstream calls, LLM stream, whole request) records its
+latency and outcome into a bounded rolling window. Health reports combine
+those windows with admission queues, circuit breakers and cache counters;
+the window snapshots are cached for a second so a load balancer can poll freely.
+"""
+
+import asyncio
+import os
+import time
+import logging
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+import admission
+
+logger = logging.getLogger(__name__)
+
+WINDOW_SECONDS = float(os.getenv("HEALTH_WINDOW", "300"))
+MAX_SAMPLES = int(os.getenv("HEALTH_MAX_SAMPLES", "4096"))
+CACHE_SECONDS = float(os.getenv("HEALTH_CACHE_SECONDS", "1.0"))
+
+# Degraded-state thresholds
+MIN_SAMPLES = int(os.getenv("HEALTH_MIN_SAMPLES", "10"))
+ERROR_RATE_LIMIT = float(os.getenv("HEALTH_ERROR_RATE", "0.2"))
+REQUEST_P95_LIMIT_MS = float(os.getenv("HEALTH_REQUEST_P95_MS", "30000"))
+QUEUE_FILL_LIMIT = float(os.getenv("HEALTH_QUEUE_FILL", "0.5"))
+
+# The agent cannot answer at all without these
+CRITICAL_UPSTREAMS = ("openrouter",)
+
+UPSTREAM_HOSTS = {
+    "openrouter.ai": "openrouter",
+    "trackapi.nutritionix.com": "nutritionix"
+}
+
+
+class StageWindow:
+    """Latency and outcome samples of one stage over the last WINDOW_SECONDS"""
+
+    def __init__(self, window: float = WINDOW_SECONDS, max_samples: int = MAX_SAMPLES):
+        self.window = window
+        self._samples: Deque[Tuple[float, float, bool]] = deque(maxlen=max_samples)
+
+    def observe(self, duration_ms: float, ok: bool = True):
+        self._samples.append((time.monotonic(), duration_ms, ok))
+
+    def snapshot(self, now: Optional[float] = None) -> Dict:
+        cutoff = (now or time.monotonic()) - self.window
+        while self._samples and self._samples[0][0] < cutoff:
+            self._samples.popleft()
+        count = len(self._samples)
+        if not count:
+            return {"count": 0, "error_rate": 0.0}
+        durations = np.fromiter((sample[1] for sample in self._samples), dtype=np.float64, count=count)
+        errors = sum(1 for sample in self._samples if not sample[2])
+        p50, p95, p99 = np.percentile(durations, [50, 95, 99])
+        return {
+            "count": count,
+            "error_rate": round(errors / count, 3),
+            "p50_ms": round(float(p50), 1),
+            "p95_ms": round(float(p95), 1),
+            "p99_ms": round(float(p99), 1)
+        }
+
+
+_stages: Dict[str, StageWindow] = {}
+
+
+def observe(stage: str, seconds: float, ok: bool = True):
+    """Record one sample for a stage"""
+    window = _stages.get(stage)
+    if window is None:
+        window = _stages[stage] = StageWindow()
+    window.observe(seconds * 1000, ok)
+
+
+@contextmanager
+def timed(stage: str):
+    """Time the block; exceptions count as errors, cancellations are not recorded"""
+    started = time.perf_counter()
+    try:
+        yield
+    except (asyncio.CancelledError, GeneratorExit):
+        raise
+    except BaseException:
+        observe(stage, time.perf_counter() - started, ok=False)
+        raise
+    observe(stage, time.perf_counter() - started)
+
+
+def upstream_hooks() -> Dict:
+    """
+    httpx event hooks: time every upstream response into the "upstream.<name>"
+    stage and feed its status into that upstream's circuit breaker
+    """
+    async def on_request(request):
+        request.extensions["health_started"] = time.perf_counter()
+
+    async def on_response(response):
+        upstream = UPSTREAM_HOSTS.get(response.request.url.host)
+        if upstream is None:
+            return
+        started = response.request.extensions.get("health_started")
+        ok = response.status_code < 500 and response.status_code != 429
+        if started is not None:
+            observe(f"upstream.{upstream}", time.perf_counter() - started, ok)
+        admission.get_governor(upstream).record_status(response.status_code)
+
+    return {"request": [on_request], "response": [on_response]}
+
+
+def cache_stats(hits: int, misses: int) -> Dict:
+    total = hits + misses
+    return {"hits": hits, "misses": misses, "hit_rate": round(hits / total, 3) if total else None}
+
+
+def evaluate(ready: bool, stages: Dict, upstreams: Dict) -> Tuple[str, List[str]]:
+    """Overall status ("healthy", "degraded", "unhealthy") and the reasons for it"""
+    unhealthy: List[str] = []
+    degraded: List[str] = []
+
+    if not ready:
+        unhealthy.append("warming up")
+
+    for name, stats in upstreams.items():
+        state = stats["circuit"]["state"]
+        if state == "open":
+            (unhealthy if name in CRITICAL_UPSTREAMS else degraded).append(f"{name} circuit open")
+        elif state == "half_open":
+            degraded.append(f"{name} circuit half-open")
+        if stats["max_queue"] and stats["queue_depth"] >= QUEUE_FILL_LIMIT * stats["max_queue"]:
+            degraded.append(f"{name} queue {stats['queue_depth']}/{stats['max_queue']}")
+
+    for name, stats in stages.items():
+        if stats["count"] < MIN_SAMPLES:
+            continue
+        if stats["error_rate"] > ERROR_RATE_LIMIT:
+            degraded.append(f"{name} error rate {stats['error_rate']:.0%}")
+        if name == "request" and stats["p95_ms"] > REQUEST_P95_LIMIT_MS:
+            degraded.append(f"request p95 {stats['p95_ms']:.0f} ms")
+
+    if unhealthy:
+        return "unhealthy", unhealthy + degraded
+    return ("degraded", degraded) if degraded else ("healthy", [])
+
+
+_last_windows: Optional[Tuple[Dict, Dict]] = None
+_last_windows_at = 0.0
+
+
+def report(ready: bool = True, caches: Optional[Dict] = None) -> Dict:
+    """
+    Full health report. The stage and upstream snapshots are recomputed at
+    most once per HEALTH_CACHE_SECONDS; readiness and caches are the
+    caller's own and always current.
+    """
+    global _last_windows, _last_windows_at
+    now = time.monotonic()
+    if _last_windows is None or now - _last_windows_at >= CACHE_SECONDS:
+        stages = {name: window.snapshot(now) for name, window in sorted(_stages.items())}
+        _last_windows = (stages, admission.snapshot())
+        _last_windows_at = now
+
+    stages, upstreams = _last_windows
+    status, reasons = evaluate(ready, stages, upstreams)
+    return {
+        "status": status,
+        "reasons": reasons,
+        "window_seconds": WINDOW_SECONDS,
+        "stages": stages,
+        "upstreams": upstreams,
+        "caches": caches or {}
+    }
@@ -0,0 +1,218 @@
+"""
+Compact on-disk encoding for user memory
+Profile, progress and per-turn metadata are stored as compact JSON; each
+response body is zlib-compressed separately and only decompressed when a
+caller reads it, so building a prompt from the last few turns never touches
+the rest of the history.
+
+File layout:
+    header   "<4sBI"   magic b"UMEM", version, length of the JSON section
+    json     context with history[i]["_r"] = [offset, length] into the blob
+    blob     concatenated zlib-compressed response bodies
+"""
+
+import json
+import os
+import struct
+import zlib
+import logging
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"UMEM"
+VERSION = 1
+HEADER = struct.Struct("<4sBI")
+COMPRESSION_LEVEL = 6
+
+
+class HistoryTurn(dict):
+    """
+    History entry whose response is decompressed on first access
+    Reading the response by key, or walking the whole entry (iteration,
+    items(), dict(turn), json.dumps), decompresses it; len() and `in` do not.
+    """
+
+    __slots__ = ("_blob",)
+
+    def __init__(self, fields: Dict, blob: Optional[bytes] = None):
+        super().__init__(fields)
+        self._blob = blob
+
+    def _load(self):
+        if self._blob is not None:
+            dict.__setitem__(self, "response", zlib.decompress(self._blob).decode("utf-8"))
+            self._blob = None
+
+    def __getitem__(self, key):
+        if key == "response":
+            self._load()
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        if key == "response":
+            self._load()
+        return super().get(key, default)
+
+    def __contains__(self, key) -> bool:
+        return (key == "response" and self._blob is not None) or super().__contains__(key)
+
+    def __len__(self) -> int:
+        return super().__len__() + (self._blob is not None)
+
+    def __iter__(self):
+        self._load()
+        return super().__iter__()
+
+    def keys(self):
+        self._load()
+        return super().keys()
+
+    def items(self):
+        self._load()
+        return super().items()
+
+    def values(self):
+        self._load()
+        return super().values()
+
+    def copy(self) -> Dict:
+        self._load()
+        return dict(super().items())
+
+    def __eq__(self, other) -> bool:
+        self._load()
+        return super().__eq__(other)
+
+    def __ne__(self, other) -> bool:
+        return not self == other
+
+    def __repr__(self) -> str:
+        self._load()
+        return super().__repr__()
+
+    def __setitem__(self, key, value):
+        if key == "response":
+            self._blob = None
+        super().__setitem__(key, value)
+
+    def compressed_response(self) -> bytes:
+        """Compressed response body, without a decompress/recompress round trip"""
+        if self._blob is not None:
+            return self._blob
+        return zlib.compress(super().get("response", "").encode("utf-8"), COMPRESSION_LEVEL)
+
+    def is_decoded(self) -> bool:
+        return self._blob is None
+
+
+def encode_context(context: Dict) -> bytes:
+    """Serialize a user context; untouched responses are copied still compressed"""
+    blobs = []
+    offset = 0
+    history = []
+    for turn in context.get("history", []):
+        if isinstance(turn, HistoryTurn):
+            blob = turn.compressed_response()
+        else:
+            blob = zlib.compress(turn.get("response", "").encode("utf-8"), COMPRESSION_LEVEL)
+        fields = {key: value for key, value in dict.items(turn) if key != "response"}
+        fields["_r"] = [offset, len(blob)]
+        history.append(fields)
+        blobs.append(blob)
+        offset += len(blob)
+
+    meta = json.dumps({**context, "history": history}, separators=(",", ":")).encode("utf-8")
+    return HEADER.pack(MAGIC, VERSION, len(meta)) + meta + b"".join(blobs)
+
+
+def is_compact(data: bytes) -> bool:
+    return data[:len(MAGIC)] == MAGIC
+
+
+def decode_context(data: bytes) -> Dict:
+    """Parse a compact file; response bodies stay compressed until read"""
+    magic, version, meta_len = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"Not a user memory file (magic {magic!r}, version {version})")
+    start = HEADER.size + meta_len
+    context = json.loads(data[HEADER.size:start])
+    history = []
+    for fields in context.get("history", []):
+        offset, length = fields.pop("_r")
+        history.append(HistoryTurn(fields, data[start + offset:start + offset + length]))
+    context["history"] = history
+    return context
+
+
+def load_context_file(path: str) -> Dict:
+    """Read a compact file or a legacy indented-JSON one"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if is_compact(data):
+        return decode_context(data)
+    return json.loads(data)
+
+
+def write_context_file(path: str, context: Dict):
+    """Write atomically, so a crash never leaves a half-written profile"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(encode_context(context))
+    os.replace(tmp_path, path)
+
+
+if __name__ == "__main__":
+    # Benchmark: python history_codec.py
+    import random
+    import time
+
+    random.seed(7)
+    vocabulary = ("protein calories workout squat bench press sets reps rest recovery meal carbs fat "
+                  "chicken rice oats banana progress goal week beginner intermediate cardio stretch "
+                  "hydration sleep muscle strength plan deficit surplus maintenance form tempo").split()
+
+    def response(tokens: int) -> str:
+        lines = []
+        while tokens > 0:
+            words = random.choices(vocabulary, k=12) + [str(random.randint(1, 500))]
+            lines.append(f"- **{words[0].title()}**: " + " ".join(words[1:]) + ".")
+            tokens -= 16
+        return "\n".join(lines)
+
+    context = {
+        "user_id": "bench", "fitness_level": "beginner", "goals": ["lose weight"], "restrictions": [],
+        "preferences": {"workout_duration": 30, "workout_frequency": 3, "equipment": "bodyweight"},
+        "history": [{
+            "timestamp": f"2026-10-{i % 28 + 1:02d}T12:00:00",
+            "query": "Give me a workout plan for chest and arms",
+            "response": response(random.randint(300, 2000)),
+            "metadata": {"tools_used": True, "tool_timings_ms": {"context": 1.2, "workout": 0.4}}
+        } for i in range(50)]
+    }
+
+    legacy = json.dumps(context, indent=2).encode("utf-8")
+    compact = encode_context(context)
+    runs = 200
+
+    started = time.perf_counter()
+    for _ in range(runs):
+        loaded = json.loads(legacy)
+        [turn["response"] for turn in loaded["history"][-3:]]
+    legacy_ms = (time.perf_counter() - started) / runs * 1000
+
+    started = time.perf_counter()
+    for _ in range(runs):
+        loaded = decode_context(compact)
+        [turn["response"] for turn in loaded["history"][-3:]]
+    compact_ms = (time.perf_counter() - started) / runs * 1000
+
+    started = time.perf_counter()
+    for _ in range(runs):
+        encode_context(loaded)
+    save_ms = (time.perf_counter() - started) / runs * 1000
+
+    print(f"legacy indent=2 JSON: {len(legacy):>9,} bytes/user, load + last 3 turns {legacy_ms:.2f} ms")
+    print(f"compact + zlib:       {len(compact):>9,} bytes/user, load + last 3 turns {compact_ms:.2f} ms "
+          f"(re-save {save_ms:.2f} ms)")
+    print(f"→ {len(legacy) / len(compact):.1f}x smaller, {legacy_ms / compact_ms:.1f}x faster to load")
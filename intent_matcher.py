@@ -0,0 +1,172 @@
+"""
+Single-pass intent signal matcher shared by both agents
+All keyword groups from intent_keywords.json are compiled into one regex
+that is scanned over the message once, returning every group hit plus the
+numbers found in the text
+"""
+
+import json
+import os
+import re
+import logging
+from typing import Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_KEYWORDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "intent_keywords.json")
+
+
+def _trie_pattern(words: List[str]) -> str:
+    """
+    Regex equivalent to an alternation of `words`, factored as a trie so the
+    engine follows one branch per character; longer keywords are preferred
+    """
+    trie: Dict = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def render(node: Dict) -> str:
+        branches = [re.escape(char) + render(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # A keyword ends here: the rest is optional (greedy, so longest wins)
+        if "" in node:
+            return "(?:" + body + ")?" if len(branches) > 1 or len(body) > 1 else body + "?"
+        return body
+
+    return render(trie)
+
+
+class IntentSignals:
+    """Everything one scan found in a message"""
+
+    def __init__(self, matcher: "IntentMatcher"):
+        self._matcher = matcher
+        self.groups: Dict[str, Set[str]] = {}
+        self.numbers: List[float] = []
+
+    def has(self, group: str) -> bool:
+        return group in self.groups
+
+    def first(self, group: str) -> Optional[str]:
+        """Highest-priority keyword of a group found (config order)"""
+        found = self.groups.get(group)
+        if not found:
+            return None
+        for keyword in self._matcher.keywords[group]:
+            if keyword in found:
+                return keyword
+        return None
+
+    def __repr__(self) -> str:
+        return f"IntentSignals(groups={self.groups}, numbers={self.numbers})"
+
+
+class IntentMatcher:
+    """
+    Compiled multi-pattern matcher
+    A lookahead over a trie-shaped pattern finds the longest keyword starting
+    at each position; shorter keywords that are prefixes of it are added from
+    a precomputed table, so overlapping hits are never lost.
+    """
+
+    def __init__(self, keywords: Dict[str, List[str]]):
+        self.keywords = {group: [k.lower() for k in words] for group, words in keywords.items()}
+
+        # keyword -> groups it belongs to
+        self._groups: Dict[str, Set[str]] = {}
+        for group, words in self.keywords.items():
+            for word in words:
+                self._groups.setdefault(word, set()).add(group)
+
+        # keyword -> every keyword that is a prefix of it (itself included)
+        all_words = sorted(self._groups, key=len, reverse=True)
+        self._prefixes = {
+            word: [other for other in all_words if word.startswith(other)]
+            for word in all_words
+        }
+
+        self._pattern = re.compile(
+            rf"(?=({_trie_pattern(all_words)})|((?<![\d.])\d+(?:\.\d+)?))"
+        )
+
+    @classmethod
+    def from_file(cls, path: str) -> "IntentMatcher":
+        with open(path, 'r') as f:
+            return cls(json.load(f))
+
+    def scan(self, message: str) -> IntentSignals:
+        """Scan the message once and return all intent signals"""
+        signals = IntentSignals(self)
+        groups = signals.groups
+        for keyword, number in self._pattern.findall(message.lower()):
+            if keyword:
+                for word in self._prefixes[keyword]:
+                    for group in self._groups[word]:
+                        groups.setdefault(group, set()).add(word)
+            elif number:
+                signals.numbers.append(float(number))
+        return signals
+
+
+_matcher: Optional[IntentMatcher] = None
+
+
+def get_matcher() -> IntentMatcher:
+    """Shared matcher built from INTENT_KEYWORDS_PATH (default intent_keywords.json)"""
+    global _matcher
+    if _matcher is None:
+        path = os.getenv("INTENT_KEYWORDS_PATH", DEFAULT_KEYWORDS_PATH)
+        _matcher = IntentMatcher.from_file(path)
+        logger.info(f"🔎 Intent matcher compiled from {path}")
+    return _matcher
+
+
+if __name__ == "__main__":
+    # Microbenchmark: python intent_matcher.py
+    import timeit
+
+    matcher = get_matcher()
+    messages = [
+        "How many calories in 3 eggs and 2 slices of toast?",
+        "Create a beginner workout plan for chest and arms",
+        "What should I eat before gym?",
+        "Give me a meal plan to lose weight, I'm 80kg",
+        "hello there, how are you doing today?"
+    ]
+
+    def legacy(message: str):
+        lower = message.lower()
+        # app.py _classify_intent
+        any(kw in lower for kw in matcher.keywords["workout_intent"])
+        any(kw in lower for kw in matcher.keywords["diet_plan_intent"])
+        any(kw in lower for kw in matcher.keywords["nutrition_intent"])
+        re.search(r'\d+', message)
+        any(kw in lower for kw in matcher.keywords["compound"])
+        # agent.py process_message
+        any(kw in lower for kw in matcher.keywords["nutrition_terms"])
+        any(kw in lower for kw in matcher.keywords["workout_terms"])
+        next((m for m in matcher.keywords["muscle"] if m in lower), None)
+        re.findall(r'\d+(?:\.\d+)?', message)
+
+    for message in messages:
+        print(f"{message!r}\n  → {matcher.scan(message)}")
+
+    runs = 20000
+    for label, func in [("single-pass matcher", matcher.scan), ("legacy keyword scans", legacy)]:
+        seconds = timeit.timeit(lambda: [func(m) for m in messages], number=runs)
+        print(f"{label:>22}: {seconds / (runs * len(messages)) * 1e6:.2f} µs/message")
+
+    # Cost as the vocabulary grows: one scan vs one substring search per keyword
+    for size in (100, 1000):
+        vocabulary = dict(matcher.keywords, foods=[f"food{i}x" for i in range(size)])
+        large = IntentMatcher(vocabulary)
+        words = [w for group in vocabulary.values() for w in group]
+        legacy_large = lambda m: [w for w in words if w in m.lower()]
+        for label, func in [(f"matcher, {size} extra kw", large.scan), (f"legacy, {size} extra kw", legacy_large)]:
+            seconds = timeit.timeit(lambda: [func(m) for m in messages], number=runs // 10)
+            print(f"{label:>22}: {seconds / (runs // 10 * len(messages)) * 1e6:.2f} µs/message")
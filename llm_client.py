@@ -1,16 +1,23 @@
 import httpx
+import json
 import os
 import logging
-from typing import AsyncIterator
-from dotenv import load_dotenv
+from collections import OrderedDict
+from functools import cached_property
+from typing import AsyncIterator, Callable, Optional
+
+from admission import get_governor, remaining_time, OverloadedError
+from cancellation import current_progress, estimate_tokens, tracker
+from health import upstream_hooks
+from tools.food_parser import local_food_query
+import usage
 
-load_dotenv()
 logger = logging.getLogger(__name__)
 
 class OpenRouterClient:
     """Handles all LLM interactions via OpenRouter API"""
     
-    def __init__(self):
+    def __init__(self, known_food: Optional[Callable[[str], bool]] = None):
         self.api_key = os.getenv("OPENROUTER_API_KEY")
         self.base_url = "https://openrouter.ai/api/v1"
         self.model = "mistralai/mistral-small-3.2-24b-instruct:free"
@@ -25,14 +32,70 @@ class OpenRouterClient:
             "Content-Type": "application/json"
         }
         
-        self.client = httpx.AsyncClient(timeout=120.0)
+        self.governor = get_governor("openrouter")
+        
+        # LRU cache of food query extractions keyed by normalized message
+        self.extraction_cache_size = int(os.getenv("EXTRACTION_CACHE_SIZE", "4096"))
+        self._extractions: "OrderedDict[str, str]" = OrderedDict()
+        self.extraction_hits = 0
+        self.extraction_misses = 0
+        # Food queries the local parser resolved without an LLM call; foods it
+        # does not know (known_food, built-in food words by default) go to the LLM
+        self.parsed_locally = 0
+        self.known_food = known_food
         logger.info(f"OpenRouter client initialized with model: {self.model}")
     
+    @cached_property
+    def client(self) -> httpx.AsyncClient:
+        """Shared connection pool, created on first use"""
+        return httpx.AsyncClient(timeout=120.0, event_hooks=upstream_hooks())
+    
+    async def warm_up(self):
+        """Open a pooled connection to OpenRouter ahead of the first request"""
+        try:
+            await self.client.get(f"{self.base_url}/models", headers=self.headers, timeout=10.0)
+        except Exception as e:
+            logger.warning(f"OpenRouter warm-up failed: {e}")
+    
+    @staticmethod
+    def normalize_message(message: str) -> str:
+        """Cache key for a user message: lowercase, single-spaced"""
+        return " ".join(message.lower().split())
+    
+    def get_cached_extraction(self, user_message: str) -> Optional[str]:
+        """Return the cached food query for the message, if any"""
+        key = self.normalize_message(user_message)
+        extracted = self._extractions.get(key)
+        if extracted is not None:
+            self._extractions.move_to_end(key)
+            self.extraction_hits += 1
+        return extracted
+    
+    def store_extraction(self, user_message: str, extracted: str):
+        """Remember a successful extraction for the message"""
+        key = self.normalize_message(user_message)
+        self._extractions[key] = extracted
+        self._extractions.move_to_end(key)
+        while len(self._extractions) > self.extraction_cache_size:
+            self._extractions.popitem(last=False)
+    
     async def extract_food_query(self, user_message: str) -> str:
         """
         Extract just the food items from a user's question
         Example: "How many calories in 3 eggs?" → "3 eggs"
+        The local parser handles most messages; only uncertain ones reach the LLM.
         """
+        parsed = local_food_query(user_message, is_known=self.known_food)
+        if parsed is not None:
+            self.parsed_locally += 1
+            logger.info(f"📝 Parsed food query: '{user_message}' → '{parsed}'")
+            return parsed
+        
+        cached = self.get_cached_extraction(user_message)
+        if cached is not None:
+            return cached
+        self.extraction_misses += 1
+        
         messages = [
             {
                 "role": "system",
@@ -54,43 +117,60 @@ Return ONLY the food items with quantities, nothing else. No questions, no extra
         ]
         
         try:
-            response = await self.client.post(
-                f"{self.base_url}/chat/completions",
-                headers=self.headers,
-                json={
-                    "model": self.model,
-                    "messages": messages,
-                    "temperature": 0.1,
-                    "max_tokens": 50
-                },
-                timeout=15.0
-            )
+            async with self.governor.slot():
+                response = await self.client.post(
+                    f"{self.base_url}/chat/completions",
+                    headers=self.headers,
+                    json={
+                        "model": self.model,
+                        "messages": messages,
+                        "temperature": 0.1,
+                        "max_tokens": 50,
+                        "usage": {"include": True}
+                    },
+                    timeout=remaining_time(15.0)
+                )
             
             if response.status_code == 200:
                 data = response.json()
                 extracted = data["choices"][0]["message"]["content"].strip()
+                usage.record("extract_food_query", data.get("usage"),
+                             (estimate_tokens(json.dumps(messages)), estimate_tokens(extracted)))
                 logger.info(f"📝 Extracted food query: '{user_message}' → '{extracted}'")
+                if extracted:
+                    self.store_extraction(user_message, extracted)
                 return extracted
             else:
                 logger.warning(f"Failed to extract food query (status {response.status_code}), using original")
                 return user_message
                 
+        except OverloadedError:
+            raise
         except Exception as e:
             logger.error(f"Error extracting food query: {e}")
             return user_message
     
-    async def stream_completion(self, messages: list) -> AsyncIterator[str]:
+    async def stream_completion(self, messages: list, site: str = "answer") -> AsyncIterator[str]:
         """
         Stream chat completion responses from OpenRouter
         
         Args:
             messages: List of message dicts with 'role' and 'content'
+            site: Call site the token usage is accounted to
             
         Yields:
             Content chunks as they arrive
+        
+        Closing the generator early (client gone) closes the upstream stream,
+        so OpenRouter stops generating
         """
+        progress = current_progress()
+        progress.llm_started = progress.streamed = True
+        # Usage arrives in the last chunk; a stream closed before it is estimated
+        reported_usage = None
+        billed = False
         try:
-            async with self.client.stream(
+            async with self.governor.slot(), self.client.stream(
                 "POST",
                 f"{self.base_url}/chat/completions",
                 headers=self.headers,
@@ -98,15 +178,19 @@ Return ONLY the food items with quantities, nothing else. No questions, no extra
                     "model": self.model,
                     "messages": messages,
                     "stream": True,
+                    "stream_options": {"include_usage": True},
+                    "usage": {"include": True},
                     "temperature": 0.7,
                     "max_tokens": 2000
-                }
+                },
+                timeout=remaining_time(120.0)
             ) as response:
                 if response.status_code != 200:
                     error_text = await response.aread()
                     logger.error(f"OpenRouter API error {response.status_code}: {error_text}")
                     yield "\n[Sorry, I'm having trouble connecting right now. Please try again.]\n"
                     return
+                billed = True
                 
                 async for line in response.aiter_lines():
                     if line.startswith("data: "):
@@ -116,28 +200,39 @@ Return ONLY the food items with quantities, nothing else. No questions, no extra
                             break
                         
                         try:
-                            import json
                             data = json.loads(data_str)
+                            if data.get("usage"):
+                                reported_usage = data["usage"]
                             
                             if "choices" in data and len(data["choices"]) > 0:
                                 delta = data["choices"][0].get("delta", {})
                                 content = delta.get("content", "")
                                 
                                 if content:
+                                    progress.received_tokens += estimate_tokens(content)
                                     yield content
                         except json.JSONDecodeError:
                             continue
                         except Exception as e:
                             logger.error(f"Error processing chunk: {e}")
                             continue
-                            
+                
+                progress.llm_finished = True
+                tracker.record_completion(progress.received_tokens)
+            
+        except OverloadedError:
+            raise
         except httpx.TimeoutException:
             logger.error("OpenRouter request timeout")
             yield "\n[Request timed out. Please try again with a shorter message.]\n"
         except Exception as e:
             logger.error(f"Streaming error: {str(e)}", exc_info=True)
             yield "\n[An error occurred. Please try again.]\n"
+        finally:
+            if billed:
+                usage.record(site, reported_usage, (estimate_tokens(json.dumps(messages)), progress.received_tokens))
     
     async def close(self):
         """Close the HTTP client"""
-        await self.client.aclose()
+        if "client" in self.__dict__:
+            await self.client.aclose()
@@ -1,32 +1,113 @@
-import json
+import asyncio
 import os
-from typing import Dict, Optional
+import re
+from typing import Dict, Iterator, Optional
 from datetime import datetime
 import logging
 
+from progress import new_progress, update_progress, backfill_progress
+from user_store import ShardedUserStore
+from user_locks import StripedUserLocks
+
 logger = logging.getLogger(__name__)
 
+# First-person statements worth remembering ("I'm vegetarian", "I'm allergic to peanuts")
+_I_AM = r"\bi(?:'m| am)\s+(?:a |an |pretty |fairly |quite |still )?"
+_LEVEL_RE = re.compile(_I_AM + r"(beginner|intermediate|advanced)\b")
+_DIET_RE = re.compile(_I_AM + r"(vegan|vegetarian|pescatarian)\b")
+_INTOLERANT_RE = re.compile(_I_AM + r"(lactose|gluten)[- ]intolerant\b|" + _I_AM + r"(celiac|coeliac)\b")
+# Only known foods and allergens become restrictions: "I can't eat enough protein" is not one
+_ALLERGENS = ("peanut", "tree nut", "nut", "shellfish", "shrimp", "prawn", "crab", "lobster", "fish", "seafood",
+              "egg", "dairy", "milk", "cheese", "lactose", "gluten", "wheat", "soy", "sesame", "mustard", "celery",
+              "lupin", "sulphite", "sulfite", "corn", "meat", "red meat", "beef", "pork", "lamb", "chicken",
+              "poultry", "legume", "bean", "lentil", "mushroom", "nightshade", "tomato", "strawberr(?:y|ie)",
+              "kiwi", "banana", "avocado", "coconut", "oat")
+_ALLERGEN_RE = re.compile(r"(?:any |all )?((?:" + "|".join(_ALLERGENS) + r")s?)(?: anymore| at all)?")
+_AVOID_RE = re.compile(r"\bi(?:'m| am) allergic to ([a-z ,]+?)(?=[.!?;]|$| so | but | because )"
+                       r"|\bi (?:can't|cannot|don't|do not) eat ([a-z ,]+?)(?=[.!?;]|$| so | but | because )")
+_LIST_SPLIT = re.compile(r",|\band\b|\bor\b|\bnor\b")
+# Profile fields that accumulate: updates add to them instead of replacing them
+LIST_FIELDS = ("restrictions", "goals")
+_GOAL_RE = re.compile(r"\b(?:i (?:want|need|'d like|would like|am trying|'m trying|plan) to|my goal is to) "
+                      r"(lose weight|lose fat|build muscle|gain muscle|gain weight|get stronger|get fit|tone up"
+                      r"|run an? [a-z0-9]+(?: marathon)?)")
+
 class UserMemory:
     """Stores user fitness data, preferences, and history"""
     
     def __init__(self, storage_dir: str = "data"):
         self.storage_dir = storage_dir
         os.makedirs(storage_dir, exist_ok=True)
+        # Users live in a hash-prefix tree keyed by hashed id; idle ones move to cold storage
+        self.store = ShardedUserStore(
+            os.path.join(storage_dir, "users"),
+            cold_root=os.getenv("USER_COLD_DIR") or os.path.join(storage_dir, "cold"),
+            legacy_dir=storage_dir
+        )
+        self.idle_days = float(os.getenv("USER_IDLE_DAYS", "30"))
+        # Per-user ordering; file I/O runs on a thread pool
+        self.locks = StripedUserLocks()
     
-    def _get_user_file(self, user_id: str) -> str:
-        """Get file path for user's data"""
-        return os.path.join(self.storage_dir, f"user_{user_id}.json")
+    def _write_user_file(self, user_id: str, context: Dict):
+        """Save in the compact format, migrating any legacy flat file"""
+        self.store.save(user_id, context)
     
-    async def get_user_context(self, user_id: str) -> Dict:
-        """Load user's fitness profile and history"""
-        file_path = self._get_user_file(user_id)
-        
-        if os.path.exists(file_path):
+    def iter_contexts(self) -> Iterator[Dict]:
+        """Every stored user context"""
+        return self.store.iter_contexts()
+    
+    async def compact(self) -> int:
+        """Archive users idle for USER_IDLE_DAYS, each move under that user's lock"""
+        moved = 0
+        while True:
+            keys, cutoff = await asyncio.to_thread(self.store.idle_keys, self.idle_days)
+            if not keys:
+                break
+            for key in keys:
+                moved += await self.locks.run_key(key, self.store.archive, key, cutoff)
+        if moved:
+            logger.info(f"🧊 Archived {moved} idle users (> {self.idle_days:g} days)")
+        return moved
+    
+    async def run_compactor(self, interval: float):
+        """Archive users idle for USER_IDLE_DAYS every `interval` seconds"""
+        while True:
             try:
-                with open(file_path, 'r') as f:
-                    return json.load(f)
+                await self.compact()
             except Exception as e:
-                logger.error(f"Error loading user context: {str(e)}")
+                logger.error(f"User compaction failed: {str(e)}")
+            await asyncio.sleep(interval)
+    
+    async def get_user_context(self, user_id: str) -> Dict:
+        """Load user's fitness profile and history (responses decode lazily)"""
+        return await self.locks.run(user_id, self._load_context, user_id)
+    
+    async def save_interaction(
+        self, 
+        user_id: str, 
+        query: str, 
+        response: str,
+        metadata: Optional[Dict] = None
+    ):
+        """Save conversation and update user profile"""
+        await self.locks.run(user_id, self._append_interaction, user_id, query, response, metadata)
+    
+    async def update_user_profile(self, user_id: str, updates: Dict):
+        """Update user's fitness profile"""
+        await self.locks.run(user_id, self._apply_updates, user_id, updates)
+    
+    # Blocking implementations, run on the I/O pool under the user's lock
+    
+    def _load_context(self, user_id: str) -> Dict:
+        try:
+            context = self.store.load(user_id)
+            if context is not None:
+                if "progress" not in context:
+                    # Profiles saved before progress analytics: build series once
+                    context["progress"] = backfill_progress(context.get("history", []))
+                return context
+        except Exception as e:
+            logger.error(f"Error loading user context: {str(e)}")
         
         return {
             "user_id": user_id,
@@ -39,47 +120,86 @@ class UserMemory:
                 "equipment": "bodyweight"
             },
             "history": [],
+            "progress": new_progress(),
             "created_at": datetime.now().isoformat()
         }
     
-    async def save_interaction(
-        self, 
-        user_id: str, 
-        query: str, 
-        response: str,
-        metadata: Optional[Dict] = None
-    ):
-        """Save conversation and update user profile"""
+    def _append_interaction(self, user_id: str, query: str, response: str, metadata: Optional[Dict]):
         try:
-            context = await self.get_user_context(user_id)
+            context = self._load_context(user_id)
             
+            timestamp = datetime.now().isoformat()
             context["history"].append({
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": timestamp,
                 "query": query,
                 "response": response,
                 "metadata": metadata or {}
             })
             
+            # Progress series are updated incrementally, never recomputed
+            update_progress(context["progress"], query, metadata, timestamp)
+            
             if len(context["history"]) > 50:
                 context["history"] = context["history"][-50:]
             
-            file_path = self._get_user_file(user_id)
-            with open(file_path, 'w') as f:
-                json.dump(context, f, indent=2)
+            self._write_user_file(user_id, context)
                 
         except Exception as e:
             logger.error(f"Error saving interaction: {str(e)}")
+            raise
     
-    async def update_user_profile(self, user_id: str, updates: Dict):
-        """Update user's fitness profile"""
+    def _apply_updates(self, user_id: str, updates: Dict):
         try:
-            context = await self.get_user_context(user_id)
+            # Merged here, under the user's lock, so quick successive updates
+            # ("I'm vegan", then "I'm allergic to peanuts") both survive
+            context = self._load_context(user_id)
+            updates = dict(updates)
+            for field in LIST_FIELDS:
+                if field in updates:
+                    stored = list(context.get(field, []))
+                    updates[field] = stored + [item for item in updates[field] if item not in stored]
             context.update(updates)
             context["updated_at"] = datetime.now().isoformat()
             
-            file_path = self._get_user_file(user_id)
-            with open(file_path, 'w') as f:
-                json.dump(context, f, indent=2)
+            self._write_user_file(user_id, context)
                 
         except Exception as e:
             logger.error(f"Error updating profile: {str(e)}")
+            raise
+
+
+def _avoided_foods(phrase: str):
+    """Known foods in a list like "peanuts, shellfish and eggs"; anything else is dropped"""
+    for item in _LIST_SPLIT.split(phrase):
+        match = _ALLERGEN_RE.fullmatch(item.strip())
+        if match:
+            yield match.group(1)
+
+
+def infer_profile_updates(message: str, context: Dict) -> Dict:
+    """
+    Profile fields the user stated about themselves in this message that are
+    not already stored; empty when nothing new was said. Restrictions and
+    goals are new items only: _apply_updates merges them into the profile.
+    """
+    lower = message.lower().replace("’", "'")
+    updates = {}
+    level = _LEVEL_RE.search(lower)
+    if level and level.group(1) != context.get("fitness_level"):
+        updates["fitness_level"] = level.group(1)
+    
+    restrictions = context.get("restrictions", [])
+    found = [m.group(1) for m in _DIET_RE.finditer(lower)]
+    for m in _INTOLERANT_RE.finditer(lower):
+        found.append("no gluten" if m.group(2) else f"no {m.group(1)}")
+    for m in _AVOID_RE.finditer(lower):
+        found.extend(f"no {food}" for food in _avoided_foods(m.group(1) or m.group(2)))
+    new = [r for r in dict.fromkeys(found) if r not in restrictions]
+    if new:
+        updates["restrictions"] = new
+    
+    goals = context.get("goals", [])
+    new = [g for g in dict.fromkeys(m.group(1) for m in _GOAL_RE.finditer(lower)) if g not in goals]
+    if new:
+        updates["goals"] = new
+    return updates
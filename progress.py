@@ -0,0 +1,129 @@
+"""
+Progress analytics over user history
+Metrics are extracted once per interaction and kept as small per-day time
+series in the user's profile, so the prompt builder gets a trend summary
+without replaying the conversation history
+"""
+
+import re
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Days of per-day series kept in the profile
+RETENTION_DAYS = 180
+
+LB_TO_KG = 0.45359237
+
+_WEIGHT_RE = re.compile(
+    r"\b(?:i\s+weigh|my\s+weight\s+is|weighed\s+in\s+at|i(?:'m|\s+am)\s+(?:now\s+)?(?:at\s+)?)\s*"
+    r"(\d{2,3}(?:\.\d+)?)\s*(kg|kgs|kilos?|lbs?|pounds?)\b"
+)
+_WORKOUT_RE = re.compile(
+    r"\b(?:i|i've|we)\s+(?:just\s+)?(?:did|finished|completed|crushed|had|went\s+for|went\s+to)\s+"
+    r"(?:a|my|an|the|today's|\d+)?\s*(?:\w+\s+)?(?:workout|training|session|run|gym|class|lift|swim|ride)\b"
+    r"|\b(?:i|we)\s+(?:just\s+)?(?:worked\s+out|trained|ran|lifted|swam|cycled)\b"
+)
+
+
+def _day(timestamp: str) -> str:
+    return timestamp[:10]
+
+
+def extract_weight_kg(text: str) -> Optional[float]:
+    """Body weight mentioned by the user ("I weigh 82 kg", "I'm 180 lbs"), in kg"""
+    match = _WEIGHT_RE.search(text.lower())
+    if not match:
+        return None
+    value, unit = float(match.group(1)), match.group(2)
+    kg = value * LB_TO_KG if unit.startswith(("lb", "pound")) else value
+    # Ignore numbers that can't be an adult body weight
+    return round(kg, 1) if 30 <= kg <= 300 else None
+
+
+def mentions_workout(text: str) -> bool:
+    """True when the user reports a completed workout"""
+    return bool(_WORKOUT_RE.search(text.lower()))
+
+
+def new_progress() -> Dict:
+    return {"workouts": {}, "weight": [], "nutrition": {}, "updated_at": None}
+
+
+def _prune(progress: Dict, today: str):
+    cutoff = (datetime.fromisoformat(today) - timedelta(days=RETENTION_DAYS)).date().isoformat()
+    progress["workouts"] = {day: n for day, n in progress["workouts"].items() if day >= cutoff}
+    progress["nutrition"] = {day: totals for day, totals in progress["nutrition"].items() if day >= cutoff}
+    progress["weight"] = [point for point in progress["weight"] if point[0] >= cutoff]
+
+
+def update_progress(progress: Dict, query: str, metadata: Optional[Dict], timestamp: str) -> Dict:
+    """Fold one interaction into the user's progress series (in place)"""
+    day = _day(timestamp)
+
+    if mentions_workout(query):
+        progress["workouts"][day] = progress["workouts"].get(day, 0) + 1
+
+    weight = extract_weight_kg(query)
+    if weight is not None:
+        # One reading per day, latest wins
+        if progress["weight"] and progress["weight"][-1][0] == day:
+            progress["weight"][-1] = [day, weight]
+        else:
+            progress["weight"].append([day, weight])
+
+    nutrition = (metadata or {}).get("nutrition")
+    if nutrition:
+        totals = progress["nutrition"].setdefault(day, {"calories": 0.0, "protein": 0.0, "carbs": 0.0, "fat": 0.0})
+        for key in totals:
+            totals[key] = round(totals[key] + float(nutrition.get(key, 0) or 0), 1)
+
+    progress["updated_at"] = timestamp
+    _prune(progress, day)
+    return progress
+
+
+def backfill_progress(history: List[Dict]) -> Dict:
+    """Build progress series from stored history (profiles created before analytics)"""
+    progress = new_progress()
+    for interaction in history:
+        update_progress(progress, interaction.get("query", ""), interaction.get("metadata"), interaction["timestamp"])
+    return progress
+
+
+def summarize_progress(progress: Optional[Dict], today: Optional[str] = None) -> str:
+    """One-line trend summary for the prompt"""
+    if not progress:
+        return "No progress data yet"
+
+    today_date = datetime.fromisoformat(today or datetime.now().date().isoformat()).date()
+    week_start = (today_date - timedelta(days=6)).isoformat()
+    month_start = (today_date - timedelta(days=29)).isoformat()
+    parts = []
+
+    workouts = progress.get("workouts", {})
+    if workouts:
+        week = sum(n for day, n in workouts.items() if day >= week_start)
+        month = sum(n for day, n in workouts.items() if day >= month_start)
+        parts.append(f"Workouts: {week} in last 7 days, {month} in last 30")
+
+    weights = progress.get("weight", [])
+    if weights:
+        first_day, first = weights[0]
+        last_day, last = weights[-1]
+        if len(weights) > 1:
+            span = (datetime.fromisoformat(last_day) - datetime.fromisoformat(first_day)).days
+            parts.append(f"Weight: {last} kg ({last - first:+.1f} kg over {span} days)")
+        else:
+            parts.append(f"Weight: {last} kg (as of {last_day})")
+
+    nutrition = progress.get("nutrition", {})
+    recent = [totals for day, totals in nutrition.items() if day >= week_start]
+    if recent:
+        avg_calories = sum(t["calories"] for t in recent) / len(recent)
+        avg_protein = sum(t["protein"] for t in recent) / len(recent)
+        parts.append(f"Logged intake: {avg_calories:.0f} kcal, {avg_protein:.0f}g protein per logged day ({len(recent)} days)")
+
+    return " | ".join(parts) if parts else "No progress data yet"
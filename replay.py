@@ -0,0 +1,313 @@
+"""
+Traffic replay load generator
+Replays recorded requests (user_id, message, timestamp) against
+FitnessCoachAgent with OpenRouter and Nutritionix replaced by local,
+deterministic stand-ins, and reports throughput, latency percentiles,
+upstream calls per request and cache effectiveness.
+
+Only agent.py's agent is driven; app.py routes and prompts differently.
+Recorded traffic comes from the agent's request log (REQUEST_LOG, JSONL,
+off unless set) or the "Query from" lines of agent.log:
+
+    python replay.py logs/requests.jsonl --speed max --concurrency 32
+    python replay.py logs/requests.jsonl --speed 10      # 10x faster than recorded
+    python replay.py logs/agent.log --speed original --json
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+import logging
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+import httpx
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_LOG_LINE = re.compile(r"^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}),(\d{3}) .*Query from ([^:]+): (.+)$")
+_FOOD_PREFIX = re.compile(
+    r"^.*?\b(?:calories|nutrition|protein|carbs|macros|fat)\b.*?\b(?:in|of|for)\s+|^(?:i\s+(?:ate|had)|tell me about)\s+"
+)
+
+
+def _timestamp(value) -> Optional[float]:
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value).timestamp()
+        except ValueError:
+            return None
+    return None
+
+
+def load_records(paths: Iterable[str], limit: Optional[int] = None) -> List[Dict]:
+    """Recorded requests as {timestamp, user_id, message}, oldest first"""
+    records = []
+    for path in paths:
+        with open(path, 'r', errors='replace') as f:
+            for line in f:
+                line = line.strip()
+                if line.startswith("{"):
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    query = record.get("query")
+                    message = record.get("message") or record.get("prompt") or (
+                        query.get("prompt") if isinstance(query, dict) else query
+                    )
+                    session = record.get("session") if isinstance(record.get("session"), dict) else {}
+                    user_id = record.get("user_id") or session.get("user_id") or "replay"
+                    timestamp = _timestamp(record.get("timestamp"))
+                else:
+                    match = _LOG_LINE.match(line)
+                    if not match:
+                        continue
+                    timestamp = datetime.strptime(match.group(1), "%Y-%m-%d %H:%M:%S").timestamp() + int(match.group(2)) / 1000
+                    user_id, message = match.group(3), match.group(4)
+                if message:
+                    records.append({"timestamp": timestamp, "user_id": str(user_id), "message": message})
+
+    # Records without a timestamp keep their position, one second apart
+    previous = 0.0
+    for record in records:
+        if record["timestamp"] is None:
+            record["timestamp"] = previous + 1.0
+        previous = record["timestamp"]
+    records.sort(key=lambda record: record["timestamp"])
+    return records[:limit] if limit else records
+
+
+def _seed(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class StandInUpstreams(httpx.AsyncBaseTransport):
+    """
+    Deterministic OpenRouter and Nutritionix stand-ins
+    Same request → same response and latency, so runs are comparable
+    """
+
+    def __init__(self, llm_latency: float = 0.25, token_latency: float = 0.004, nutrition_latency: float = 0.08,
+                 max_tokens: int = 200):
+        self.llm_latency = llm_latency
+        self.token_latency = token_latency
+        self.nutrition_latency = nutrition_latency
+        self.max_tokens = max_tokens
+        self.calls: Counter = Counter()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        if "nutritionix" in host:
+            self.calls["nutritionix"] += 1
+            return await self._nutrients(request)
+        if "openrouter" in host:
+            self.calls["openrouter"] += 1
+            if request.method == "GET":
+                return httpx.Response(200, json={"data": []})
+            body = json.loads(request.content)
+            if body.get("stream"):
+                return self._stream(body)
+            return await self._completion(body)
+        return httpx.Response(404)
+
+    async def _completion(self, body: Dict) -> httpx.Response:
+        message = body["messages"][-1]["content"].strip().rstrip("?.!")
+        await asyncio.sleep(self.llm_latency)
+        if body.get("max_tokens", 0) <= 5:
+            content = "nutrition"
+        else:
+            content = _FOOD_PREFIX.sub("", message.lower(), count=1)
+        usage = {"prompt_tokens": sum(len(m["content"]) for m in body["messages"]) // 4,
+                 "completion_tokens": max(1, len(content) // 4)}
+        return httpx.Response(200, json={"choices": [{"message": {"content": content}}], "usage": usage})
+
+    def _stream(self, body: Dict) -> httpx.Response:
+        prompt = body["messages"][-1]["content"]
+        tokens = 40 + _seed(prompt) % max(1, self.max_tokens - 40)
+
+        async def events():
+            await asyncio.sleep(self.llm_latency)
+            for i in range(tokens):
+                await asyncio.sleep(self.token_latency)
+                chunk = {"choices": [{"delta": {"content": f"tok{i} "}}]}
+                yield f"data: {json.dumps(chunk)}\n\n".encode("utf-8")
+            if body.get("stream_options", {}).get("include_usage"):
+                usage = {"prompt_tokens": sum(len(m["content"]) for m in body["messages"]) // 4,
+                         "completion_tokens": tokens * 2}
+                yield f"data: {json.dumps({'choices': [], 'usage': usage})}\n\n".encode("utf-8")
+            yield b"data: [DONE]\n\n"
+
+        return httpx.Response(200, headers={"content-type": "text/event-stream"}, stream=_AsyncBytes(events()))
+
+    async def _nutrients(self, request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(self.nutrition_latency)
+        query = json.loads(request.content).get("query", "")
+        items = [item.strip() for item in re.split(r",|\band\b|\n", query) if item.strip()]
+        if not items:
+            return httpx.Response(404, json={"message": "We couldn't match any of your foods"})
+        foods = []
+        for item in items:
+            seed = _seed(item)
+            foods.append({
+                "food_name": item, "serving_qty": 1, "serving_unit": "serving",
+                "nf_calories": 50 + seed % 400, "nf_protein": seed % 40, "nf_total_carbohydrate": (seed >> 8) % 60,
+                "nf_total_fat": (seed >> 16) % 30, "nf_dietary_fiber": (seed >> 24) % 8, "nf_sugars": (seed >> 32) % 20
+            })
+        return httpx.Response(200, json={"foods": foods})
+
+
+class _AsyncBytes(httpx.AsyncByteStream):
+    def __init__(self, iterator):
+        self._iterator = iterator
+
+    async def __aiter__(self):
+        async for chunk in self._iterator:
+            yield chunk
+
+    async def aclose(self):
+        await self._iterator.aclose()
+
+
+def build_agent(upstreams: StandInUpstreams, storage_dir: str):
+    """FitnessCoachAgent wired to the stand-ins, with throwaway storage"""
+    for name in ("OPENROUTER_API_KEY", "NUTRITIONIX_APP_ID", "NUTRITIONIX_API_KEY"):
+        os.environ.setdefault(name, "replay")
+    os.environ["FOOD_DIARY_DIR"] = os.path.join(storage_dir, "diary")
+
+    from agent import FitnessCoachAgent
+    from memory import UserMemory
+
+    agent = FitnessCoachAgent()
+    agent.request_log = None
+    agent.__dict__["memory"] = UserMemory(storage_dir)
+    agent.llm.__dict__["client"] = httpx.AsyncClient(transport=upstreams)
+    agent.nutrition.__dict__["client"] = httpx.AsyncClient(transport=upstreams)
+    return agent
+
+
+async def replay(agent, records: List[Dict], speed: Optional[float], concurrency: int) -> List[Dict]:
+    """
+    Run every record through agent.process_message
+    speed=None replays as fast as `concurrency` allows; otherwise requests
+    start at their recorded offsets divided by `speed` (1.0 = original pace)
+    """
+    from admission import BUSY_MESSAGE
+
+    semaphore = asyncio.Semaphore(concurrency)
+    started = time.perf_counter()
+    origin = records[0]["timestamp"] if records else 0.0
+
+    async def run(record: Dict) -> Dict:
+        if speed is not None:
+            await asyncio.sleep(max(0.0, (record["timestamp"] - origin) / speed - (time.perf_counter() - started)))
+        async with semaphore:
+            begin = time.perf_counter()
+            first_chunk = None
+            status = "ok"
+            async for chunk in agent.process_message(record["user_id"], record["message"]):
+                if first_chunk is None:
+                    first_chunk = time.perf_counter() - begin
+                if chunk == BUSY_MESSAGE:
+                    status = "shed"
+                elif "technical difficulties" in chunk:
+                    status = "error"
+            return {"latency": time.perf_counter() - begin, "first_chunk": first_chunk or 0.0, "status": status}
+
+    return await asyncio.gather(*(run(record) for record in records))
+
+
+def report(results: List[Dict], records: List[Dict], seconds: float, agent, upstreams: StandInUpstreams) -> Dict:
+    from cache_warmer import classify
+    import scheduler
+    import usage
+
+    def percentiles(values) -> Dict:
+        if not values:
+            return {}
+        p50, p95, p99 = np.percentile(np.array(values) * 1000, [50, 95, 99])
+        return {"p50_ms": round(float(p50), 1), "p95_ms": round(float(p95), 1), "p99_ms": round(float(p99), 1)}
+
+    def hit_rate(hits: int, misses: int) -> Optional[float]:
+        return round(hits / (hits + misses), 3) if hits + misses else None
+
+    count = len(results)
+    nutrition, llm = agent.nutrition, agent.llm
+    return {
+        "requests": count,
+        "seconds": round(seconds, 2),
+        "throughput_rps": round(count / seconds, 2) if seconds else None,
+        "status": dict(Counter(result["status"] for result in results)),
+        "intents": dict(Counter(classify(r["message"], agent.matcher.scan(r["message"])) for r in records)),
+        "latency": percentiles([result["latency"] for result in results]),
+        "first_chunk": percentiles([result["first_chunk"] for result in results]),
+        "upstream_calls": dict(upstreams.calls),
+        "upstream_calls_per_request": {
+            name: round(calls / count, 3) for name, calls in upstreams.calls.items()
+        } if count else {},
+        "cache": {
+            "nutrition_hit_rate": hit_rate(nutrition.cache_hits, nutrition.cache_misses),
+            "nutrition_hits": nutrition.cache_hits,
+            "extraction_hit_rate": hit_rate(llm.extraction_hits, llm.extraction_misses),
+            "extraction_hits": llm.extraction_hits
+        },
+        "token_usage": {key: value for key, value in usage.ledger.report().items() if key in ("totals", "by_path")},
+        "background": scheduler.snapshot()
+    }
+
+
+async def main(args):
+    import scheduler
+
+    records = load_records(args.logs, args.limit)
+    if not records:
+        raise SystemExit("No recorded requests found")
+    speed = None if args.speed == "max" else 1.0 if args.speed == "original" else float(args.speed)
+
+    upstreams = StandInUpstreams(args.llm_latency, args.token_latency, args.nutrition_latency, args.tokens)
+    storage_dir = tempfile.mkdtemp(prefix="replay_")
+    try:
+        agent = build_agent(upstreams, storage_dir)
+        logging.getLogger().setLevel(logging.WARNING)
+        started = time.perf_counter()
+        results = await replay(agent, records, speed, args.concurrency)
+        summary = report(results, records, time.perf_counter() - started, agent, upstreams)
+        # History saves queued by the last requests land before storage is removed
+        await scheduler.scheduler.drain()
+    finally:
+        shutil.rmtree(storage_dir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+    print(f"Replayed {summary['requests']} requests in {summary['seconds']}s "
+          f"→ {summary['throughput_rps']} req/s  {summary['status']}")
+    print(f"Intent mix:        {summary['intents']}")
+    print(f"Latency:           {summary['latency']}")
+    print(f"First chunk:       {summary['first_chunk']}")
+    print(f"Upstream calls:    {summary['upstream_calls']}  per request {summary['upstream_calls_per_request']}")
+    print(f"Caches:            {summary['cache']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recorded traffic against local upstream stand-ins")
+    parser.add_argument("logs", nargs="+", help="request logs (JSONL) or agent.log files")
+    parser.add_argument("--speed", default="max", help="'original', 'max' or a speed-up factor (default max)")
+    parser.add_argument("--concurrency", type=int, default=16, help="max requests in flight")
+    parser.add_argument("--limit", type=int, help="replay only the first N requests")
+    parser.add_argument("--llm-latency", type=float, default=0.25, help="stand-in LLM time to first token (s)")
+    parser.add_argument("--token-latency", type=float, default=0.004, help="stand-in time per streamed token (s)")
+    parser.add_argument("--nutrition-latency", type=float, default=0.08, help="stand-in Nutritionix latency (s)")
+    parser.add_argument("--tokens", type=int, default=200, help="max streamed tokens per answer")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,253 @@
+"""
+Bounded background scheduler for off-path work
+Work the reply does not depend on (history saves, profile updates, logs)
+is queued here instead of running before the response completes. A fixed
+pool of workers takes jobs by priority, failed jobs are retried with
+backoff, and drain() finishes queued work on shutdown. When the queue is
+full the lowest-priority job is shed, never a higher-priority one.
+"""
+
+import asyncio
+import heapq
+import itertools
+import os
+import time
+import logging
+from typing import Callable, Dict, List, Optional
+
+import health
+
+logger = logging.getLogger(__name__)
+
+HIGH, NORMAL, LOW = 0, 1, 2
+PRIORITY_NAMES = {HIGH: "high", NORMAL: "normal", LOW: "low"}
+
+
+class Job:
+    """One unit of background work"""
+
+    __slots__ = ("name", "func", "args", "kwargs", "priority", "retries", "attempt", "enqueued_at")
+
+    def __init__(self, name: str, func: Callable, args: tuple, kwargs: dict, priority: int, retries: int):
+        self.name = name
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.retries = retries
+        self.attempt = 0
+        self.enqueued_at = time.monotonic()
+
+    async def run(self):
+        if asyncio.iscoroutinefunction(self.func):
+            await self.func(*self.args, **self.kwargs)
+        else:
+            await asyncio.to_thread(self.func, *self.args, **self.kwargs)
+
+
+class BackgroundScheduler:
+    """Priority queue of background jobs served by a fixed pool of worker tasks"""
+
+    def __init__(self, workers: int = None, max_queue: int = None, retry_delay: float = None):
+        self.workers = workers or int(os.getenv("BACKGROUND_WORKERS", "4"))
+        self.max_queue = max_queue or int(os.getenv("BACKGROUND_QUEUE", "1000"))
+        self.retry_delay = retry_delay if retry_delay is not None else float(os.getenv("BACKGROUND_RETRY_DELAY", "0.5"))
+        self._heap: List = []
+        self._sequence = itertools.count()
+        self._ready: Optional[asyncio.Condition] = None
+        self._tasks: List[asyncio.Task] = []
+        self._retrying: set = set()
+        self._notifying: set = set()
+        self.running = 0
+        self.closed = False
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+        self.dropped = 0
+
+    def _start(self):
+        if self._tasks:
+            return
+        self._ready = asyncio.Condition()
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+
+    def submit(self, name: str, func: Callable, *args, priority: int = NORMAL, retries: int = 2, **kwargs) -> bool:
+        """
+        Queue func(*args, **kwargs) (a coroutine function, or a blocking
+        function run in a thread). Returns False if the job was shed.
+        """
+        if self.closed:
+            logger.warning(f"🗑️ Background job {name} rejected: scheduler is draining")
+            self.dropped += 1
+            return False
+        self._start()
+        self.submitted += 1
+        return self._push(Job(name, func, args, kwargs, priority, retries))
+
+    def _push(self, job: Job) -> bool:
+        if len(self._heap) >= self.max_queue:
+            lowest = max(self._heap)
+            if lowest[0] <= job.priority:
+                self.dropped += 1
+                logger.warning(f"🗑️ Background queue full, dropped {job.name}")
+                return False
+            # Shed the newest of the lowest-priority jobs to make room
+            self._heap.remove(lowest)
+            heapq.heapify(self._heap)
+            self.dropped += 1
+            logger.warning(f"🗑️ Background queue full, shed {lowest[2].name} for {job.name}")
+        heapq.heappush(self._heap, (job.priority, next(self._sequence), job))
+        # Held until done, so the loop cannot collect the wake-up before it runs
+        task = asyncio.create_task(self._notify())
+        self._notifying.add(task)
+        task.add_done_callback(self._notifying.discard)
+        return True
+
+    async def _notify(self):
+        async with self._ready:
+            self._ready.notify()
+
+    async def _worker(self, index: int):
+        while True:
+            async with self._ready:
+                await self._ready.wait_for(lambda: self._heap)
+                _, _, job = heapq.heappop(self._heap)
+                self.running += 1
+            lag = time.monotonic() - job.enqueued_at
+            health.observe("background.lag", lag)
+            try:
+                with health.timed(f"background.{job.name}"):
+                    await job.run()
+                self.completed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._retry_or_fail(job, e)
+            finally:
+                self.running -= 1
+                if not self._heap and not self.running:
+                    async with self._ready:
+                        self._ready.notify_all()
+
+    def _retry_or_fail(self, job: Job, error: Exception):
+        if job.attempt < job.retries:
+            job.attempt += 1
+            self.retried += 1
+            delay = self.retry_delay * 2 ** (job.attempt - 1)
+            logger.warning(f"🔁 Background job {job.name} failed ({error}); retry {job.attempt} in {delay:.1f}s")
+            task = asyncio.create_task(self._requeue(job, delay))
+            self._retrying.add(task)
+            task.add_done_callback(self._retrying.discard)
+        else:
+            self.failed += 1
+            logger.error(f"❌ Background job {job.name} failed after {job.attempt + 1} attempts: {error}")
+
+    async def _requeue(self, job: Job, delay: float):
+        await asyncio.sleep(delay)
+        job.enqueued_at = time.monotonic()
+        self._push(job)
+
+    async def drain(self, timeout: float = None) -> bool:
+        """
+        Stop accepting jobs, finish queued and retrying ones, then stop the
+        workers. Returns False if work was still pending at the timeout.
+        """
+        timeout = timeout if timeout is not None else float(os.getenv("BACKGROUND_DRAIN_TIMEOUT", "10"))
+        self.closed = True
+        drained = True
+        if self._tasks:
+            async def idle():
+                while True:
+                    async with self._ready:
+                        await self._ready.wait_for(lambda: not self._heap and not self.running)
+                    if not self._retrying:
+                        return
+                    await asyncio.gather(*self._retrying, return_exceptions=True)
+            try:
+                await asyncio.wait_for(idle(), timeout)
+            except asyncio.TimeoutError:
+                drained = False
+                logger.warning(f"⏱️ Background drain timed out with {len(self._heap)} jobs queued")
+            for task in self._tasks:
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+            self._tasks = []
+        logger.info(f"🧹 Background scheduler drained ({self.completed} done, {self.failed} failed)")
+        return drained
+
+    def stats(self) -> Dict:
+        now = time.monotonic()
+        depth = {name: 0 for name in PRIORITY_NAMES.values()}
+        oldest = 0.0
+        for priority, _, job in self._heap:
+            depth[PRIORITY_NAMES.get(priority, str(priority))] += 1
+            oldest = max(oldest, now - job.enqueued_at)
+        return {
+            "queue_depth": len(self._heap),
+            "queue_by_priority": depth,
+            "max_queue": self.max_queue,
+            "oldest_queued_ms": round(oldest * 1000, 1),
+            "running": self.running,
+            "workers": self.workers,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "retried": self.retried,
+            "dropped": self.dropped,
+            "draining": self.closed
+        }
+
+
+scheduler = BackgroundScheduler()
+
+
+def submit(name: str, func: Callable, *args, priority: int = NORMAL, retries: int = 2, **kwargs) -> bool:
+    """Queue a job on the shared scheduler"""
+    return scheduler.submit(name, func, *args, priority=priority, retries=retries, **kwargs)
+
+
+def snapshot() -> Dict:
+    return scheduler.stats()
+
+
+if __name__ == "__main__":
+    # Simulated requests whose reply is followed by a slow save: inline vs scheduled
+    async def demo(requests: int = 200, save_ms: float = 20.0):
+        async def save():
+            await asyncio.sleep(save_ms / 1000)
+
+        async def request(background: Optional[BackgroundScheduler]) -> float:
+            started = time.perf_counter()
+            await asyncio.sleep(0.005)  # streaming the reply
+            if background is None:
+                await save()
+            else:
+                background.submit("save", save, priority=HIGH)
+            return time.perf_counter() - started
+
+        for label, background in (("inline", None), ("scheduled", BackgroundScheduler(workers=4, max_queue=1000))):
+            started = time.perf_counter()
+            latencies = sorted(await asyncio.gather(*(request(background) for _ in range(requests))))
+            if background is not None:
+                stats = background.stats()
+                await background.drain()
+                stats["completed"] = background.completed
+            else:
+                stats = {}
+            print(f"{label:>9}: p50 {latencies[requests // 2] * 1000:.1f} ms, p99 "
+                  f"{latencies[int(requests * 0.99)] * 1000:.1f} ms, all done in "
+                  f"{(time.perf_counter() - started) * 1000:.0f} ms "
+                  f"{ {k: stats[k] for k in ('queue_depth', 'completed', 'dropped')} if stats else ''}")
+
+        # A full queue sheds low-priority work to admit high-priority saves
+        background = BackgroundScheduler(workers=1, max_queue=10)
+        for i in range(10):
+            background.submit("log", save, priority=LOW)
+        admitted = sum(background.submit("save", save, priority=HIGH) for _ in range(5))
+        print(f"full queue: {admitted}/5 high-priority admitted, {background.stats()['queue_by_priority']}, "
+              f"{background.dropped} low shed")
+        await background.drain()
+
+    logging.basicConfig(level=logging.ERROR)
+    asyncio.run(demo())
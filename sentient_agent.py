@@ -3,24 +3,25 @@ Fitness Coach Agent - Built with Sentient Agent Framework
 Compatible with Sentient Platform standards
 """
 
+import asyncio
 import os
 import json
 import logging
-from typing import Dict, AsyncIterator
-from dotenv import load_dotenv
+from contextlib import aclosing
+from functools import cached_property
+from typing import Dict, List, AsyncIterator
 
 from agent import FitnessCoachAgent
+from tools import context_encoder
+from config import load_config, setup_logging
+import cancellation
+import export
+import health
+import scheduler
+import usage
 
-load_dotenv()
-
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('logs/agent.log'),
-        logging.StreamHandler()
-    ]
-)
+load_config()
+setup_logging()
 logger = logging.getLogger(__name__)
 
 class SentientFitnessAgent:
@@ -49,10 +50,42 @@ class SentientFitnessAgent:
     }
     
     def __init__(self):
-        """Initialize the Sentient-compatible agent"""
-        self.agent = FitnessCoachAgent()
+        """Initialize the Sentient-compatible agent (components load lazily)"""
+        self._warm_up_task = None
         logger.info(f"✅ {self.AGENT_INFO['name']} initialized with Sentient Framework")
     
+    @cached_property
+    def agent(self) -> FitnessCoachAgent:
+        return FitnessCoachAgent()
+    
+    async def warm_up(self):
+        """
+        Load everything and start the periodic tasks (compactor, cache warmer,
+        usage flusher). Call at startup; otherwise the first message runs it.
+        Concurrent callers share one warm-up, and a failed one is retried.
+        """
+        await asyncio.shield(self._start_warm_up())
+    
+    def _start_warm_up(self) -> asyncio.Task:
+        if self._warm_up_task is None or (self._warm_up_task.done() and not self.agent.ready):
+            self._warm_up_task = asyncio.create_task(self.agent.warm_up())
+        return self._warm_up_task
+    
+    async def shutdown(self):
+        """Drain background work before the process exits"""
+        if "agent" in self.__dict__:
+            await self.agent.shutdown()
+    
+    def readiness(self) -> Dict:
+        """
+        Readiness probe: ready only after warm_up has completed
+        """
+        ready = "agent" in self.__dict__ and self.agent.ready
+        return {
+            "ready": ready,
+            "warm_up_ms": self.agent.warm_up_ms if ready else None
+        }
+    
     async def process_message(self, user_id: str, message: str, context: Dict = None) -> AsyncIterator[str]:
         """
         Process user messages (Sentient standard interface)
@@ -65,17 +98,35 @@ class SentientFitnessAgent:
         Yields:
             Response chunks for streaming
         """
+        if not self.readiness()["ready"]:
+            try:
+                await self.warm_up()
+            except Exception as e:
+                logger.error(f"❌ Warm-up failed, serving without it: {str(e)}")
+        
         try:
             logger.info(f"📨 Processing message from user: {user_id}")
             
             # Use existing agent logic
-            async for chunk in self.agent.process_message(user_id, message):
-                yield chunk
+            async with aclosing(self.agent.process_message(user_id, message)) as chunks:
+                async for chunk in chunks:
+                    yield chunk
                 
         except Exception as e:
             logger.error(f"❌ Error processing message: {str(e)}", exc_info=True)
             yield f"\n[Agent error: {str(e)}]\n"
     
+    async def export_histories(self, since: str = None, until: str = None, intents: List[str] = None,
+                               include_responses: bool = True) -> AsyncIterator[str]:
+        """
+        Stream every user's history as NDJSON lines, optionally filtered by
+        date range (inclusive ISO dates) and intent. Reads run off the event
+        loop, so requests keep being served while the export streams.
+        """
+        async for lines in export.stream_ndjson(self.agent.memory.store, since=since, until=until,
+                                                intents=intents, include_responses=include_responses):
+            yield lines
+    
     def get_info(self) -> Dict:
         """
         Return agent information (Sentient standard)
@@ -85,13 +136,47 @@ class SentientFitnessAgent:
     def health_check(self) -> Dict:
         """
         Health check endpoint (Sentient standard)
+        Status is "healthy", "degraded" or "unhealthy", from rolling windows of
+        stage latencies and errors, upstream circuits and queue depth
         """
+        # A probe only reads state: warm-up is started by startup or the first
+        # message, and components that have not been built yet are reported as None
+        agent = self.__dict__.get("agent")
+        report = agent.health_report() if agent is not None else health.report(ready=False)
+        built = agent.__dict__ if agent is not None else {}
         return {
-            "status": "healthy",
+            "status": report["status"],
+            "reasons": report["reasons"],
             "agent": self.AGENT_INFO['name'],
             "version": self.AGENT_INFO['version'],
-            "framework": "Sentient Agent Framework"
+            "framework": "Sentient Agent Framework",
+            **self.readiness(),
+            "stages": report["stages"],
+            "upstreams": report["upstreams"],
+            "caches": report["caches"],
+            "cancellation": cancellation.snapshot(),
+            "cache_warm": built["cache_warmer"].stats() if "cache_warmer" in built else None,
+            "user_store": built["memory"].store.stats() if "memory" in built else None,
+            "user_locks": built["memory"].locks.stats() if "memory" in built else None,
+            "usage": usage.snapshot(),
+            "background": scheduler.snapshot(),
+            "prompt_encoding": context_encoder.snapshot()
         }
 
-# Export singleton instance
-sentient_fitness_agent = SentientFitnessAgent()
+_instance = None
+
+
+def get_agent() -> SentientFitnessAgent:
+    """Shared instance, created on first use"""
+    global _instance
+    if _instance is None:
+        _instance = SentientFitnessAgent()
+    return _instance
+
+
+def __getattr__(name: str):
+    # Export singleton instance (lazily, so importing this module stays cheap)
+    if name == "sentient_fitness_agent":
+        return get_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
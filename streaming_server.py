@@ -0,0 +1,81 @@
+"""
+SSE server that stops working for clients that have left
+DefaultServer runs the agent in a detached task that keeps going after the
+browser tab closes. This server keeps a handle on that task, watches the
+connection and cancels it on disconnect, which aborts pending tool calls
+and closes the upstream LLM connection.
+"""
+
+import asyncio
+import os
+import logging
+
+from fastapi import Request as HTTPRequest
+from fastapi.responses import StreamingResponse
+from sentient_agent_framework import DefaultServer
+from sentient_agent_framework.implementation.default_hook import DefaultHook
+from sentient_agent_framework.implementation.default_response_handler import DefaultResponseHandler
+from sentient_agent_framework.implementation.default_session import DefaultSession
+from sentient_agent_framework.interface.events import DoneEvent
+from sentient_agent_framework.interface.identity import Identity
+from sentient_agent_framework.interface.request import Request
+
+from cancellation import track_request
+
+logger = logging.getLogger(__name__)
+
+
+class CancellableServer(DefaultServer):
+    """DefaultServer whose /assist cancels the agent when the client disconnects"""
+
+    def __init__(self, agent, poll_interval: float = None):
+        self.poll_interval = poll_interval or float(os.getenv("DISCONNECT_POLL_INTERVAL", "0.5"))
+        super().__init__(agent)
+
+    async def _assist(self, session, query, response_handler):
+        with track_request():
+            await self._agent.assist(session, query, response_handler)
+        # The agent may only complete its text stream; make sure DoneEvent goes out
+        await response_handler.complete()
+
+    async def _wait_for_disconnect(self, http_request: HTTPRequest):
+        while not await http_request.is_disconnected():
+            await asyncio.sleep(self.poll_interval)
+
+    async def _stream_agent_output(self, request: Request, http_request: HTTPRequest):
+        """Yield agent output as SSE events until done or the client leaves"""
+        session = DefaultSession(request.session)
+        identity = Identity(id=session.processor_id, name=self._agent.name)
+        response_queue = asyncio.Queue()
+        response_handler = DefaultResponseHandler(identity, DefaultHook(response_queue))
+
+        task = asyncio.create_task(self._assist(session, request.query, response_handler))
+        disconnected = asyncio.create_task(self._wait_for_disconnect(http_request))
+        next_event = None
+        try:
+            while True:
+                next_event = asyncio.ensure_future(response_queue.get())
+                await asyncio.wait({next_event, task, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+                if disconnected.done():
+                    logger.info("🔌 Client disconnected, cancelling request")
+                    break
+                if not next_event.done():
+                    # The agent finished (or failed) without anything left to send
+                    if task.exception() is not None:
+                        logger.error(f"❌ Agent task failed: {task.exception()}")
+                    break
+                event = next_event.result()
+                yield f"event: {event.event_name}\n"
+                yield f"data: {event.model_dump_json()}\n\n"
+                if type(event) == DoneEvent:
+                    break
+        finally:
+            # Runs on normal completion, on disconnect, and when Starlette
+            # closes the generator because a send failed
+            for pending in (next_event, disconnected, task):
+                if pending is not None and not pending.done():
+                    pending.cancel()
+
+    async def assist_endpoint(self, request: Request, http_request: HTTPRequest):
+        """Endpoint that streams agent output to client as SSE events."""
+        return StreamingResponse(self._stream_agent_output(request, http_request), media_type="text/event-stream")
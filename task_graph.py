@@ -0,0 +1,113 @@
+"""
+Small async task graph for tool execution
+Tasks declare their dependencies and run as soon as those finish, each
+under its own timeout. Per-task timings are kept so the critical path of a
+request can be read off the logs.
+"""
+
+import asyncio
+import time
+import logging
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class TaskGraph:
+    """Runs named async tasks concurrently, respecting declared dependencies"""
+
+    def __init__(self):
+        self._specs: Dict[str, Dict] = {}
+        self.results: Dict[str, Any] = {}
+        self.errors: Dict[str, BaseException] = {}
+        self.timings: Dict[str, Dict] = {}
+        self._started = 0.0
+
+    def add(
+        self,
+        name: str,
+        func: Callable[[Dict[str, Any]], Awaitable[Any]],
+        deps: Iterable[str] = (),
+        timeout: Optional[float] = None
+    ):
+        """
+        Register a task. `func` receives a dict of its dependencies' results.
+        A task whose dependency failed is skipped.
+        """
+        deps = list(deps)
+        for dep in deps:
+            if dep not in self._specs:
+                raise ValueError(f"Task '{name}' depends on unknown task '{dep}'")
+        self._specs[name] = {"func": func, "deps": deps, "timeout": timeout}
+        return self
+
+    async def _run_task(self, name: str, tasks: Dict[str, asyncio.Task]):
+        spec = self._specs[name]
+        if spec["deps"]:
+            await asyncio.gather(*(tasks[dep] for dep in spec["deps"]), return_exceptions=True)
+
+        failed = [dep for dep in spec["deps"] if dep not in self.results]
+        if failed:
+            self.timings[name] = {"status": "skipped", "deps": spec["deps"], "start_ms": None, "duration_ms": 0.0}
+            return
+
+        started = time.perf_counter()
+        status = "ok"
+        try:
+            inputs = {dep: self.results[dep] for dep in spec["deps"]}
+            self.results[name] = await asyncio.wait_for(spec["func"](inputs), spec["timeout"])
+        except asyncio.TimeoutError as e:
+            status = "timeout"
+            self.errors[name] = e
+            logger.warning(f"⏱️ Tool '{name}' timed out after {spec['timeout']}s")
+        except Exception as e:
+            status = "error"
+            self.errors[name] = e
+            logger.error(f"❌ Tool '{name}' failed: {str(e)}")
+        finally:
+            self.timings[name] = {
+                "status": status,
+                "deps": spec["deps"],
+                "start_ms": round((started - self._started) * 1000, 1),
+                "duration_ms": round((time.perf_counter() - started) * 1000, 1)
+            }
+
+    async def run(self) -> Dict[str, Any]:
+        """Run every task; returns results of the ones that succeeded"""
+        self._started = time.perf_counter()
+        tasks: Dict[str, asyncio.Task] = {}
+        for name in self._specs:
+            tasks[name] = asyncio.ensure_future(self._run_task(name, tasks))
+        try:
+            await asyncio.gather(*tasks.values())
+        finally:
+            for task in tasks.values():
+                task.cancel()
+        return self.results
+
+    def finish_ms(self, name: str) -> float:
+        timing = self.timings.get(name, {})
+        if timing.get("start_ms") is None:
+            return 0.0
+        return timing["start_ms"] + timing["duration_ms"]
+
+    def critical_path(self) -> List[str]:
+        """Chain of tasks that determined when the last one finished"""
+        if not self.timings:
+            return []
+        path = [max(self.timings, key=self.finish_ms)]
+        while True:
+            deps = self.timings[path[-1]]["deps"]
+            if not deps:
+                break
+            path.append(max(deps, key=self.finish_ms))
+        return list(reversed(path))
+
+    def summary(self) -> Dict:
+        """Timings plus critical path, compact enough to log or store"""
+        return {
+            "tool_timings_ms": {name: timing["duration_ms"] for name, timing in self.timings.items()},
+            "tool_status": {name: timing["status"] for name, timing in self.timings.items() if timing["status"] != "ok"},
+            "critical_path": self.critical_path(),
+            "total_ms": round(max((self.finish_ms(name) for name in self.timings), default=0.0), 1)
+        }
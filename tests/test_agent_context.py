@@ -0,0 +1,48 @@
+import asyncio
+
+import pytest
+
+import admission
+import cancellation
+import usage
+from replay import StandInUpstreams, build_agent
+
+
+@pytest.fixture
+def agent(tmp_path, monkeypatch):
+    monkeypatch.setenv("FOOD_DIARY_DIR", str(tmp_path / "diary"))
+    monkeypatch.setenv("LOG_DIR", str(tmp_path / "logs"))
+    return build_agent(StandInUpstreams(llm_latency=0.01, token_latency=0.0, nutrition_latency=0.0), str(tmp_path))
+
+
+def request_vars():
+    return usage._scope.get(), admission._deadline.get(), cancellation._progress.get()
+
+
+def test_request_vars_stay_out_of_the_consumer(agent):
+    async def first_chunk():
+        chunks = agent.process_message("u1", "what should I eat for breakfast?")
+        await chunks.__anext__()
+        seen = request_vars()
+        await chunks.aclose()
+        return seen
+
+    assert asyncio.run(first_chunk()) == (None, None, None)
+
+
+def test_close_from_another_task(agent):
+    async def close_elsewhere():
+        chunks = agent.process_message("u1", "what should I eat for breakfast?")
+        await chunks.__anext__()
+        await asyncio.create_task(chunks.aclose())
+
+    cancelled = cancellation.tracker.cancelled_requests
+    asyncio.run(close_elsewhere())
+    assert cancellation.tracker.cancelled_requests == cancelled + 1
+
+
+def test_full_reply_is_forwarded(agent):
+    async def reply():
+        return "".join([chunk async for chunk in agent.process_message("u1", "what should I eat for breakfast?")])
+
+    assert asyncio.run(reply())
@@ -0,0 +1,90 @@
+import json
+import os
+
+import pytest
+
+from export import Checkpoint, export, iter_users, open_store
+from history_codec import write_context_file
+from user_store import COLD, HOT, user_file_key
+
+
+def write_user(store, user_id, tier=HOT, days=3, query="how many calories in 2 eggs"):
+    path = store.path(user_file_key(user_id), tier)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    write_context_file(path, {"user_id": user_id, "history": [{
+        "timestamp": f"2026-10-{day + 1:02d}T12:00:00", "query": query, "response": f"{user_id} day {day}",
+        "metadata": {"usage": {"intent": "nutrition"}}
+    } for day in range(days)]})
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = open_store(str(tmp_path / "data"))
+    for i in range(12):
+        write_user(store, f"user-{i}", tier=COLD if i % 3 == 0 else HOT)
+    return store
+
+
+def interrupted_after(users):
+    def source(*args, **kwargs):
+        for n, item in enumerate(iter_users(*args, **kwargs)):
+            if n == users:
+                raise KeyboardInterrupt
+            yield item
+    return source
+
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("fmt", ["ndjson", "columns"])
+def test_resume_after_partial_write_matches_a_clean_run(store, tmp_path, fmt):
+    out, reference = str(tmp_path / "out"), str(tmp_path / "reference")
+    with pytest.raises(KeyboardInterrupt):
+        export(store, out, fmt=fmt, batch_size=2, checkpoint_every=3, source=interrupted_after(7))
+    state = Checkpoint(out + ".checkpoint").load()
+    assert state["users"] == 6
+    # Output past the checkpoint (the 7th user) is truncated on resume
+    with open(out, 'ab') as f:
+        f.write(b'{"partial":')
+
+    resumed = export(store, out, fmt=fmt, batch_size=2, checkpoint_every=3)
+    export(store, reference, fmt=fmt, batch_size=2, checkpoint_every=3)
+    assert read(out) == read(reference)
+    assert resumed["users"] == 12 and resumed["records"] == 36
+    assert Checkpoint(out + ".checkpoint").load() is None
+
+
+def test_hot_and_cold_users_come_out_once_in_key_order(store, tmp_path):
+    # A stale cold copy left next to the hot file: the hot one wins
+    write_user(store, "user-1", tier=COLD, days=1, query="old")
+    out = str(tmp_path / "out.ndjson")
+    export(store, out)
+    with open(out) as f:
+        records = [json.loads(line) for line in f]
+
+    keys = [record["user_key"] for record in records]
+    assert keys == sorted(keys)
+    assert len({record["user_id"] for record in records}) == 12
+    assert [record["query"] for record in records if record["user_id"] == "user-1"] == ["how many calories in 2 eggs"] * 3
+
+
+def test_columns_format_batches_every_record(store, tmp_path):
+    out = str(tmp_path / "out.columns")
+    export(store, out, fmt="columns", batch_size=5, intents=["nutrition"], since="2026-10-02")
+    with open(out) as f:
+        batches = [json.loads(line) for line in f]
+
+    assert [batch["rows"] for batch in batches] == [5, 5, 5, 5, 4]
+    assert all(len(column) == batch["rows"] for batch in batches for column in batch["columns"].values())
+    assert min(ts for batch in batches for ts in batch["columns"]["timestamp"]) >= "2026-10-02"
+
+
+def test_checkpoint_for_other_filters_is_refused(store, tmp_path):
+    out = str(tmp_path / "out")
+    with pytest.raises(KeyboardInterrupt):
+        export(store, out, checkpoint_every=2, source=interrupted_after(3))
+    with pytest.raises(ValueError):
+        export(store, out, intents=["workout"])
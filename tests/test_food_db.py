@@ -0,0 +1,25 @@
+from tools.food_db import FoodDatabase, build_database
+
+
+def database(tmp_path):
+    csv_path = tmp_path / "foods.csv"
+    csv_path.write_text(
+        "name,calories,protein,carbs,fat,serving_g\n"
+        "egg,143,12.6,0.7,9.5,50\n"
+        "chicken breast,165,31,0,3.6,\n"
+    )
+    build_database(str(csv_path), str(tmp_path / "foods.fdb"))
+    return FoodDatabase(str(tmp_path / "foods.fdb"))
+
+
+def test_counts_use_the_serving_weight(tmp_path):
+    result = database(tmp_path).analyze("3 eggs")
+    assert result["foods"][0]["serving_weight_grams"] == 150
+    assert result["foods"][0]["calories"] == 214.5
+
+
+def test_counts_without_a_serving_weight_are_not_answered(tmp_path):
+    db = database(tmp_path)
+    assert db.analyze("2 chicken breast") is None
+    assert db.analyze("chicken breast") is None
+    assert db.analyze("200g chicken breast")["foods"][0]["calories"] == 330
@@ -0,0 +1,62 @@
+import multiprocessing
+
+import pytest
+
+from food_diary import FoodDiary, is_diary_question, mentions_eating
+
+
+@pytest.mark.parametrize("message", [
+    "How many calories did I eat this week?",
+    "what have I eaten today",
+    "How much protein have I had so far?",
+    "what I've eaten today",
+    "how many calories I've had today",
+    "total calories I ate yesterday",
+    "show me my daily calories",
+])
+def test_diary_questions(message):
+    assert is_diary_question(message)
+
+
+@pytest.mark.parametrize("message", [
+    "I had a banana today",
+    "I ate 3 eggs today, how many calories is that?",
+    "I've eaten 2 slices of pizza so far",
+    "I had some rice today. What should I eat for dinner?",
+    "how many calories in a banana",
+])
+def test_food_reports_are_not_diary_questions(message):
+    assert not is_diary_question(message)
+
+
+def test_food_reports_still_mention_eating():
+    assert mentions_eating("I ate 3 eggs today, how many calories is that?")
+
+
+def test_two_diaries_on_one_directory_keep_every_row(tmp_path):
+    first, second = FoodDiary(str(tmp_path), initial_capacity=4), FoodDiary(str(tmp_path), initial_capacity=4)
+    for i in range(10):
+        (first if i % 2 else second).append(f"user{i % 2}", [{"calories": 100}], timestamp=86400 * 10)
+
+    assert first.rollup("user0")["entries"] == [5]
+    assert second.rollup("user1")["entries"] == [5]
+    assert FoodDiary(str(tmp_path)).count == 10
+
+
+def _append_many(directory, user_id):
+    diary = FoodDiary(directory, initial_capacity=8)
+    for _ in range(50):
+        diary.append(user_id, [{"calories": 10}], timestamp=86400 * 10)
+
+
+def test_processes_sharing_a_directory_keep_every_row(tmp_path):
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_append_many, args=(str(tmp_path), f"user{i}")) for i in range(3)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    diary = FoodDiary(str(tmp_path))
+    assert diary.count == 150
+    assert [diary.rollup(f"user{i}")["calories"] for i in range(3)] == [[500.0]] * 3
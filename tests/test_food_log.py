@@ -0,0 +1,54 @@
+import asyncio
+
+from tools.food_log import FoodLogAnalyzer, match_foods, split_meals
+
+
+def test_compound_foods_are_not_split():
+    assert split_meals("lunch: mac and cheese and a salad; dinner: fish and chips") == [
+        ("lunch", ["mac and cheese", "a salad"]),
+        ("dinner", ["fish and chips"]),
+    ]
+
+
+def test_reordered_group_results_match_by_name():
+    items = ["2 eggs", "1 banana", "200g chicken breast"]
+    foods = [{"name": "chicken breast"}, {"name": "egg"}, {"name": "banana"}]
+    matched = match_foods(items, foods)
+    assert {item: food["name"] for item, food in matched.items()} == {
+        "2 eggs": "egg", "1 banana": "banana", "200g chicken breast": "chicken breast"}
+
+
+def test_ambiguous_names_are_left_unmatched():
+    items = ["chicken breast", "chicken thigh"]
+    foods = [{"name": "chicken"}, {"name": "roast chicken"}]
+    assert match_foods(items, foods) == {}
+
+
+class GroupedNutrition:
+    """Grouped lookups come back reordered with one food renamed; single items resolve by name"""
+
+    def __init__(self):
+        self.cached = {}
+        self.queries = []
+
+    async def analyze_food(self, query):
+        self.queries.append(query)
+        if "\n" in query:
+            return {"success": True, "foods": [{"name": "banana", "calories": 105},
+                                               {"name": "large egg", "calories": 156},
+                                               {"name": "oats", "calories": 150}]}
+        return {"success": True, "foods": [{"name": query, "calories": 1}]}
+
+    def store_cached(self, query, result):
+        self.cached[query] = result
+
+
+def test_group_results_are_cached_under_the_right_items():
+    nutrition = GroupedNutrition()
+    analyzer = FoodLogAnalyzer(nutrition, group_size=8)
+    resolved = asyncio.run(analyzer._resolve_group(["2 eggs", "1 bowl oatmeal", "1 banana"]))
+    assert resolved["2 eggs"]["foods"][0]["name"] == "large egg"
+    assert resolved["1 banana"]["foods"][0]["name"] == "banana"
+    # "oats" shares no word with "oatmeal": looked up on its own, never cached as the group's food
+    assert resolved["1 bowl oatmeal"]["foods"][0]["name"] == "1 bowl oatmeal"
+    assert set(nutrition.cached) == {"2 eggs", "1 banana"}
@@ -0,0 +1,32 @@
+import pytest
+
+from tools.food_parser import MIN_CONFIDENCE, local_food_query, parse_food_query
+
+
+@pytest.mark.parametrize("message, expected", [
+    ("How many calories in 3 eggs?", "3 eggs"),
+    ("a lot of rice", "rice"),
+    ("a bit of cheese", "cheese"),
+    ("a little bit of cheese", "cheese"),
+    ("lots of pasta", "pasta"),
+    ("nutrition info for mac and cheese", "mac and cheese"),
+    ("half a cup of oats", "0.5 cup oats"),
+])
+def test_parsed_locally(message, expected):
+    assert local_food_query(message) == expected
+
+
+@pytest.mark.parametrize("message", ["hello", "my flurbix", "Is rice or pasta better for weight loss?"])
+def test_deferred_to_the_llm(message):
+    assert local_food_query(message) is None
+
+
+def test_vague_amounts_lower_confidence():
+    parsed = parse_food_query("a lot of rice")
+    assert parsed["items"][0]["quantity"] is None
+    assert MIN_CONFIDENCE <= parsed["confidence"] < 1.0
+
+
+def test_caller_vocabulary_decides_unknown_foods():
+    assert local_food_query("2 flurbix") is None
+    assert local_food_query("2 flurbix", is_known=lambda word: word == "flurbix") == "2 flurbix"
@@ -0,0 +1,34 @@
+from tools.fuzzy_index import FuzzyNameIndex
+
+
+def index():
+    return FuzzyNameIndex(["beer", "peas", "rice", "chicken breast", "brown rice", "broccoli", "banana"])
+
+
+def test_valid_foods_are_not_rewritten():
+    fuzzy = index()
+    assert fuzzy.correct_query("200g beef") == "200g beef"
+    assert fuzzy.correct_query("1 pear") == "1 pear"
+    assert fuzzy.correct_query("2 pears and rice") == "2 pears and rice"
+
+
+def test_learned_words_are_not_rewritten():
+    fuzzy = index()
+    fuzzy.add("lamb chop")
+    assert fuzzy.correct_query("lamb chops") == "lamb chops"
+
+
+def test_typos_are_still_corrected():
+    fuzzy = index()
+    assert fuzzy.correct_query("200g chiken brest") == "200g chicken breast"
+    assert fuzzy.correct_query("bananna and brocoli") == "banana and broccoli"
+
+
+def test_ambiguous_match_is_not_corrected():
+    fuzzy = FuzzyNameIndex(["cola", "cole"])
+    assert fuzzy.match("colx") is None
+    assert fuzzy.correct_query("colx") == "colx"
+
+
+def test_exact_match():
+    assert index().match("Brown  Rice") == ("brown rice", 0)
@@ -0,0 +1,31 @@
+import asyncio
+
+import health
+
+
+def test_report_reflects_each_callers_readiness_and_caches():
+    warming = health.report(ready=False)
+    ready = health.report(ready=True, caches={"nutrition": {"hit_rate": 0.5}})
+    assert warming["status"] == "unhealthy" and "warming up" in warming["reasons"]
+    assert "warming up" not in ready["reasons"]
+    assert ready["caches"] == {"nutrition": {"hit_rate": 0.5}}
+    assert health.report(ready=True)["caches"] == {}
+
+
+def test_sentient_health_check_only_reads_state(tmp_path, monkeypatch):
+    monkeypatch.setenv("LOG_DIR", str(tmp_path / "logs"))
+    from sentient_agent import SentientFitnessAgent
+
+    async def probe():
+        sentient = SentientFitnessAgent()
+        before = sentient.health_check()
+        sentient.agent
+        after = sentient.health_check()
+        await asyncio.sleep(0)
+        return sentient, before, after
+
+    sentient, before, after = asyncio.run(probe())
+    assert before["status"] == after["status"] == "unhealthy" and "warming up" in after["reasons"]
+    assert sentient._warm_up_task is None and not sentient.agent.ready
+    assert not {"cache_warmer", "memory", "nutrition", "llm"} & set(sentient.agent.__dict__)
+    assert after["cache_warm"] is None and after["user_store"] is None
@@ -0,0 +1,47 @@
+import json
+
+from history_codec import HistoryTurn, decode_context, encode_context
+
+CONTEXT = {
+    "user_id": "u1",
+    "goals": ["lose weight"],
+    "history": [
+        {"timestamp": "2026-10-01T12:00:00", "query": "chest workout", "response": "Push-ups, 3 x 12", "metadata": {}},
+        {"timestamp": "2026-10-02T12:00:00", "query": "protein in eggs", "response": "About 6 g per egg", "metadata": {}}
+    ]
+}
+
+
+def loaded():
+    return decode_context(encode_context(CONTEXT))
+
+
+def test_json_round_trip_keeps_undecoded_responses():
+    context = loaded()
+    assert not any(turn.is_decoded() for turn in context["history"])
+    assert json.loads(json.dumps(context)) == CONTEXT
+
+
+def test_dict_views_include_the_response():
+    turn = loaded()["history"][0]
+    assert dict(turn) == CONTEXT["history"][0]
+    turn = loaded()["history"][0]
+    assert dict(turn.items()) == CONTEXT["history"][0]
+    turn = loaded()["history"][0]
+    assert "response" in list(turn.keys()) and "Push-ups, 3 x 12" in list(turn.values())
+    turn = loaded()["history"][0]
+    assert turn.copy() == CONTEXT["history"][0] and turn == CONTEXT["history"][0]
+
+
+def test_len_and_membership_do_not_decompress():
+    turn = loaded()["history"][1]
+    assert len(turn) == len(CONTEXT["history"][1])
+    assert "response" in turn
+    assert not turn.is_decoded()
+
+
+def test_untouched_responses_are_copied_compressed():
+    turn = loaded()["history"][0]
+    assert isinstance(turn, HistoryTurn)
+    assert decode_context(encode_context({"history": [turn]}))["history"][0]["response"] == "Push-ups, 3 x 12"
+    assert not turn.is_decoded()
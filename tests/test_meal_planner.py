@@ -0,0 +1,76 @@
+import pytest
+
+from tools.meal_planner import MealPlanner, parse_restrictions, parse_targets
+
+
+@pytest.fixture(scope="module")
+def planner():
+    return MealPlanner()
+
+
+def excluded(planner, restrictions):
+    return {food[0] for food, ok in zip(planner.foods, planner.allowed(restrictions)) if not ok}
+
+
+@pytest.mark.parametrize("message, restriction, food", [
+    ("I am lactose intolerant, give me a meal plan", "no lactose", "greek yogurt"),
+    ("meal plan, I have a dairy allergy", "no dairy", "cottage cheese"),
+    ("peanut allergy meal plan", "no peanut", "peanut butter"),
+    ("shellfish allergy", "no shellfish", "shrimp"),
+    ("gluten intolerance, 2000 calories", "no gluten", "whole wheat bread"),
+    ("I'm allergic to peanuts", "no peanuts", "peanut butter"),
+    ("nut-free meal plan", "no nut", "almonds"),
+    ("meal plan without eggs", "no eggs", "eggs"),
+    ("I'm celiac", "celiac", "oats"),
+])
+def test_allergen_phrasings_exclude_foods(planner, message, restriction, food):
+    restrictions = parse_restrictions(message)
+    assert restriction in restrictions
+    assert food in excluded(planner, restrictions)
+
+
+@pytest.mark.parametrize("message", ["2000 calorie meal plan", "meal plan with eggs", "high protein diet plan"])
+def test_no_restriction_without_allergen_phrasing(message):
+    assert parse_restrictions(message) == []
+
+
+def test_stored_restrictions_are_kept():
+    assert parse_restrictions("meal plan", {"restrictions": ["Vegetarian"]}) == ["vegetarian"]
+
+
+def test_plan_respects_lactose_intolerance(planner):
+    plan = planner.plan_for("I am lactose intolerant, 2000 calorie meal plan")
+    foods = {food["name"] for meal in plan["meals"] for food in meal["foods"]}
+    assert plan["success"]
+    assert not foods & {"greek yogurt", "cottage cheese", "cheddar cheese", "whey protein"}
+
+
+def test_macros_over_the_calorie_target_fall_back(planner):
+    plan = planner.plan_for("meal plan 1000 calories with 300g protein")
+    assert not plan["success"]
+    assert "1200 kcal" in plan["error"]
+
+
+def test_three_stated_macros_set_the_calories(planner):
+    plan = planner.plan_for("150g protein 100g fat 400g carbs meal plan")
+    assert plan["success"]
+    assert plan["targets"] == {"calories": 3100.0, "protein": 150.0, "carbs": 400.0, "fat": 100.0}
+
+
+def test_unstated_macros_keep_a_positive_target():
+    targets = parse_targets("meal plan 1500 calories with 330g protein")["targets"]
+    assert targets["carbs"] > 0 and targets["fat"] > 0
+
+
+def test_zero_targets_do_not_break_the_solver(planner):
+    plan = planner.plan({"calories": 1500, "protein": 120, "carbs": 0, "fat": 0})
+    assert plan["success"]
+
+
+@pytest.mark.parametrize("message", ["no junk and no more than 3 meals", "meal plan, no way I can cook"])
+def test_no_phrases_need_a_food(message):
+    assert parse_restrictions(message) == []
+
+
+def test_no_food_is_a_restriction():
+    assert parse_restrictions("meal plan, no mushrooms") == ["no mushrooms"]
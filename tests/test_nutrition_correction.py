@@ -0,0 +1,50 @@
+import asyncio
+
+from tools.nutrition import NutritionTools
+
+
+class StubNutrition(NutritionTools):
+    """NutritionTools with the local database and Nutritionix replaced by a fixed table"""
+
+    def __init__(self, known):
+        super().__init__()
+        self.local_db = None
+        self.known = known
+        self.lookups = []
+        for name in ("beer", "peas", "chicken breast"):
+            self.fuzzy.add(name)
+
+    async def _lookup(self, query):
+        self.lookups.append(query)
+        if query in self.known:
+            return {"success": True, "foods": [{"name": self.known[query]}]}
+        return {"error": "No food data found"}
+
+
+def test_query_found_upstream_is_never_corrected():
+    tools = StubNutrition({"200g beef": "beef"})
+    result = asyncio.run(tools.analyze_food("200g beef"))
+    assert result["foods"][0]["name"] == "beef"
+    assert tools.lookups == ["200g beef"]
+
+
+def test_typo_is_corrected_only_after_a_miss():
+    tools = StubNutrition({"200g chicken breast": "chicken breast"})
+    result = asyncio.run(tools.analyze_food("200g chiken brest"))
+    assert result["foods"][0]["name"] == "chicken breast"
+    assert tools.lookups == ["200g chiken brest", "200g chicken breast"]
+    # The corrected answer is cached under the original wording
+    asyncio.run(tools.analyze_food("200g chiken brest"))
+    assert len(tools.lookups) == 2
+
+
+def test_seeding_keeps_learned_names():
+    class LocalNames:
+        def names(self):
+            return iter(["brown rice", "oatmeal"])
+
+    tools = StubNutrition({})
+    tools.local_db = LocalNames()
+    asyncio.run(tools.load_fuzzy_names())
+    assert {"brown rice", "oatmeal", "beer", "chicken breast"} <= set(tools.fuzzy)
+    assert tools.correct_query("brwn rice") == "brown rice"
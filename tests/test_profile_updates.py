@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+
+from memory import UserMemory, infer_profile_updates
+
+
+def restrictions(message, context=None):
+    return infer_profile_updates(message, context or {}).get("restrictions", [])
+
+
+@pytest.mark.parametrize("message", [
+    "I can't eat enough protein",
+    "I don't eat breakfast",
+    "I can't eat that much in one sitting",
+    "I don't eat after 8pm so what should dinner be?",
+])
+def test_ordinary_sentences_are_not_restrictions(message):
+    assert restrictions(message) == []
+
+
+@pytest.mark.parametrize("message, expected", [
+    ("I'm allergic to peanuts and shellfish", ["no peanuts", "no shellfish"]),
+    ("I'm allergic to peanuts, eggs and soy.", ["no peanuts", "no eggs", "no soy"]),
+    ("I am allergic to tree nuts", ["no tree nuts"]),
+    ("I can't eat dairy or gluten", ["no dairy", "no gluten"]),
+    ("I don't eat red meat anymore", ["no red meat"]),
+    ("I'm vegan", ["vegan"]),
+    ("I'm lactose intolerant", ["no lactose"]),
+    ("I'm celiac", ["no gluten"]),
+])
+def test_stated_restrictions(message, expected):
+    assert restrictions(message) == expected
+
+
+def test_known_restrictions_are_not_repeated():
+    assert restrictions("I'm vegan", {"restrictions": ["vegan"]}) == []
+    assert restrictions("I'm allergic to peanuts", {"restrictions": ["vegan"]}) == ["no peanuts"]
+
+
+def test_level_and_goals():
+    updates = infer_profile_updates("I'm a beginner and I want to lose weight", {"fitness_level": "advanced"})
+    assert updates == {"fitness_level": "beginner", "goals": ["lose weight"]}
+
+
+def test_updates_from_the_same_snapshot_both_survive(tmp_path):
+    async def scenario():
+        memory = UserMemory(str(tmp_path))
+        snapshot = await memory.get_user_context("u1")
+        first = infer_profile_updates("I'm vegan", snapshot)
+        second = infer_profile_updates("I'm allergic to peanuts", snapshot)
+        await asyncio.gather(memory.update_user_profile("u1", first), memory.update_user_profile("u1", second))
+        return await memory.get_user_context("u1")
+
+    assert asyncio.run(scenario())["restrictions"] == ["vegan", "no peanuts"]
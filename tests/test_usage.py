@@ -0,0 +1,48 @@
+import asyncio
+import json
+
+from usage import OTHER_USERS, UsageLedger
+
+
+def test_flush_async_writes_what_was_pending(tmp_path):
+    ledger = UsageLedger(str(tmp_path / "usage.jsonl"))
+    ledger.record("u1", "nutrition", "answer", 100, 20, 0.0)
+
+    async def flush_while_recording():
+        flushing = asyncio.ensure_future(ledger.flush_async())
+        await asyncio.sleep(0)  # the swap has happened; the write is on a worker thread
+        ledger.record("u2", "general", "answer", 50, 10, 0.0)  # after the swap: next flush
+        return await flushing
+
+    assert asyncio.run(flush_while_recording()) == 1
+    assert ledger.flush() == 1
+    users = [json.loads(line)["user_id"] for line in (tmp_path / "usage.jsonl").read_text().splitlines()]
+    assert users == ["u1", "u2"]
+
+
+def test_totals_are_capped_without_losing_intent_totals():
+    ledger = UsageLedger(None, max_rows=10)
+    for i in range(50):
+        ledger.record(f"user-{i}", "nutrition", "answer", 10, 5, 0.0)
+    assert len(ledger._totals) <= 11
+    report = ledger.report()
+    assert report["totals"]["calls"] == 50
+    assert OTHER_USERS in {row["name"] for row in report["top_users"]}
+
+
+def test_daily_totals_keep_only_today():
+    ledger = UsageLedger(None)
+    ledger._add_daily("old", "2000-01-01", 500, 0.0)
+    ledger.record("new", "general", "answer", 10, 5, 0.0)
+    assert set(ledger._daily) == {"new"}
+    assert ledger.today("new") == (15, 0.0)
+
+
+def test_load_today_restores_budgets(tmp_path):
+    path = str(tmp_path / "usage.jsonl")
+    first = UsageLedger(path)
+    first.record("u1", "general", "answer", 100, 50, 0.01)
+    first.flush()
+    restarted = UsageLedger(path)
+    asyncio.run(restarted.load_today_async())
+    assert restarted.today("u1") == (150, 0.01)
@@ -0,0 +1,31 @@
+import asyncio
+import time
+
+from memory import UserMemory
+from user_locks import StripedUserLocks
+from user_store import user_file_key
+
+
+def test_user_id_and_storage_key_share_a_stripe():
+    locks = StripedUserLocks(stripes=64, io_threads=1)
+    for user_id in ("alice", "bob", "user-12345"):
+        assert locks.lock_for(user_id) is locks.lock_for_key(user_file_key(user_id))
+    locks.shutdown()
+
+
+def test_compactor_never_hides_a_user_from_concurrent_loads(tmp_path):
+    async def scenario():
+        memory = UserMemory(str(tmp_path))
+        users = [f"user-{i}" for i in range(40)]
+        for user_id in users:
+            await memory.update_user_profile(user_id, {"fitness_level": "advanced"})
+        memory.idle_days = -1  # everyone counts as idle
+
+        compacted, *contexts = await asyncio.gather(
+            memory.compact(), *(memory.get_user_context(user_id) for user_id in users)
+        )
+        return compacted, contexts
+
+    compacted, contexts = asyncio.run(scenario())
+    assert all(context["fitness_level"] == "advanced" for context in contexts)
+    assert compacted > 0
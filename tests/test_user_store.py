@@ -0,0 +1,52 @@
+import os
+import time
+
+from user_store import COLD, HOT, ShardedUserStore, user_file_key
+
+
+def make_store(tmp_path):
+    return ShardedUserStore(str(tmp_path / "users"), cold_root=str(tmp_path / "cold"))
+
+
+def context(user_id, note="hi"):
+    return {"user_id": user_id, "fitness_level": "beginner", "goals": [note], "history": []}
+
+
+def test_compacted_user_is_restored_on_load(tmp_path):
+    store = make_store(tmp_path)
+    store.save("alice", context("alice"))
+    assert store.compact(idle_days=1, now=time.time() + 2 * 86400) == 1
+    assert store.manifest.get(user_file_key("alice"))["tier"] == COLD
+    assert store.load("alice")["goals"] == ["hi"]
+    assert store.manifest.get(user_file_key("alice"))["tier"] == HOT
+
+
+def test_load_falls_back_to_cold_file_while_manifest_still_says_hot(tmp_path):
+    # The window between the compactor's move and its manifest update
+    store = make_store(tmp_path)
+    store.save("bob", context("bob"))
+    key = user_file_key("bob")
+    store._move(store.path(key), store.path(key, COLD))
+    assert store.manifest.get(key)["tier"] == HOT
+    assert store.load("bob")["goals"] == ["hi"]
+
+
+def test_save_removes_stale_cold_copy(tmp_path):
+    store = make_store(tmp_path)
+    store.save("carol", context("carol", "old"))
+    key = user_file_key("carol")
+    store._move(store.path(key), store.path(key, COLD))
+    store.save("carol", context("carol", "new"))
+    assert not os.path.exists(store.path(key, COLD))
+    assert store.load("carol")["goals"] == ["new"]
+
+
+def test_archive_skips_users_accessed_since_listing(tmp_path):
+    store = make_store(tmp_path)
+    store.save("dave", context("dave"))
+    key = user_file_key("dave")
+    keys, cutoff = store.idle_keys(idle_days=1, now=time.time() + 2 * 86400)
+    assert keys == [key]
+    store.manifest.put(key, HOT, 1, last_access=cutoff + 1)
+    assert store.archive(key, cutoff) is False
+    assert os.path.exists(store.path(key))
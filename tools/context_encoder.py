@@ -0,0 +1,279 @@
+"""
+Compact encoding of tool data for prompts
+Tool results are rendered as dense pipe tables (one header row with units,
+one row per item) instead of labelled lines, JSON dumps and banners. The
+instructions for using them are stated once, in TOOL_DATA_RULES, which the
+agents append to their system prompt so it stays in the cached prefix.
+
+Token savings against the verbose blocks are measured on every request,
+and answers are checked for numbers that do not come from the tool data.
+TOOL_DATA_VERBOSE_SHARE sends a share of users to the verbose blocks so
+the grounding rate of both encodings can be compared (`/health`, "prompt").
+"""
+
+import hashlib
+import math
+import os
+import re
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from cancellation import estimate_tokens
+
+COMPACT, VERBOSE = "compact", "verbose"
+VERBOSE_SHARE = float(os.getenv("TOOL_DATA_VERBOSE_SHARE", "0"))
+
+DATA_HEADER = "[SYSTEM DATA]"
+TOOL_DATA_RULES = f"""Tool data:
+Messages starting with {DATA_HEADER} hold results from the nutrition API, food diary, meal planner and exercise database, as tables: a "## source" line, a header row naming each column (with units), then one row per item.
+- Use those EXACT numbers in your answer; never estimate, recalculate or use your own knowledge when data is given.
+- Present meal plans and workout plans with the exact portions, sets and reps given.
+- If no data is given for a food, ask for a more specific quantity instead of guessing."""
+
+_MACROS = (("calories", "kcal"), ("protein", "protein g"), ("carbs", "carbs g"), ("fat", "fat g"))
+
+
+def _n(value, digits: int = 1) -> str:
+    """Number without trailing zeros: 143.0 → 143, 12.60 → 12.6"""
+    text = f"{float(value):.{digits}f}"
+    return text.rstrip("0").rstrip(".") if "." in text else text
+
+
+def _cell(value) -> str:
+    return str(value).replace("|", "/").replace("\n", " ")
+
+
+def table(title: str, header: Sequence[str], rows: Iterable[Sequence], notes: Iterable[str] = ()) -> str:
+    """"## title", optional note lines, a header row and pipe-separated rows"""
+    lines = [f"## {title}", *notes, "|".join(header)]
+    lines.extend("|".join(_cell(value) for value in row) for row in rows)
+    return "\n".join(lines)
+
+
+def nutrition_table(foods: List[Dict], source: str = "Nutritionix API") -> str:
+    """Per-food macros; fiber and sugar only when some food has them, a total row for several foods"""
+    extras = [key for key in ("fiber", "sugar") if any(food.get(key) for food in foods)]
+    header = ["food", "serving", *(label for _, label in _MACROS), *(f"{key} g" for key in extras)]
+    rows = [[food["name"], food.get("serving", ""), *(_n(food.get(key, 0)) for key, _ in _MACROS),
+             *(_n(food.get(key, 0)) for key in extras)] for food in foods]
+    if len(foods) > 1:
+        rows.append(["total", "", *(_n(sum(food.get(key, 0) for food in foods)) for key, _ in _MACROS),
+                     *(_n(sum(food.get(key, 0) for food in foods)) for key in extras)])
+    return table(f"nutrition ({source})", header, rows)
+
+
+def food_log_table(log: Dict) -> str:
+    """One row per logged item and per meal, then the day total"""
+    rows = []
+    for meal in log["meals"]:
+        for item in meal["items"]:
+            rows.append([meal["meal"], item["query"], *(_n(item[key]) for key, _ in _MACROS)])
+        rows.append([meal["meal"], "meal total", *(_n(meal["totals"][key]) for key, _ in _MACROS)])
+    totals = log["totals"]
+    rows.append(["day", "total", *(_n(totals[key]) for key, _ in _MACROS)])
+    notes = [f"day fiber {_n(totals['fiber'])} g, sugar {_n(totals['sugar'])} g"]
+    if log.get("unresolved"):
+        notes.append(f"not found: {', '.join(log['unresolved'])}")
+    return table("daily food log (Nutritionix API)", ["meal", "item", *(label for _, label in _MACROS)], rows, notes)
+
+
+def meal_plan_table(plan: Dict) -> str:
+    """Targets and restrictions as notes, one row per food and per meal, then the day total"""
+    if not plan.get("success"):
+        return ""
+    targets, totals = plan["targets"], plan["totals"]
+    notes = [f"targets ({plan.get('basis', 'stated')}): {_n(targets['calories'], 0)} kcal, protein "
+             f"{_n(targets['protein'], 0)} g, carbs {_n(targets['carbs'], 0)} g, fat {_n(targets['fat'], 0)} g"]
+    if plan["restrictions"]:
+        notes.append(f"restrictions respected: {', '.join(plan['restrictions'])}")
+    rows = []
+    for meal in plan["meals"]:
+        for food in meal["foods"]:
+            rows.append([meal["meal"], food["name"], food["serving"], _n(food["calories"], 0),
+                         *(_n(food[key]) for key, _ in _MACROS[1:])])
+        rows.append([meal["meal"], "meal total", "", _n(meal["totals"]["calories"], 0),
+                     *(_n(meal["totals"][key]) for key, _ in _MACROS[1:])])
+    rows.append(["day", "total", "", *(_n(totals[key], 0) for key, _ in _MACROS)])
+    return table("meal plan (meal planner)", ["meal", "food", "serving", *(label for _, label in _MACROS)],
+                 rows, notes)
+
+
+def workout_table(plan: Dict) -> str:
+    """Warm-up and cool-down as notes, one row per main exercise"""
+    notes = [f"{plan['duration']}, {plan['level']}",
+             f"warm-up: {'; '.join(plan.get('warm_up', []))}",
+             f"cool-down: {'; '.join(plan.get('cool_down', []))}"]
+    rows = [[exercise["name"], exercise["equipment"], exercise["reps"], exercise["instructions"]]
+            for exercise in plan.get("main_workout", [])]
+    return table("workout plan (exercise database)", ["exercise", "equipment", "sets x reps", "how"], rows, notes)
+
+
+def data_message(blocks: List[str], encoding: str = COMPACT) -> str:
+    """The user message carrying tool data"""
+    if encoding == VERBOSE:
+        return "[SYSTEM DATA - USE THESE EXACT NUMBERS]\n\n" + "\n\n".join(blocks)
+    return f"{DATA_HEADER}\n" + "\n\n".join(blocks)
+
+
+def encoding_for(user_id: str, verbose_share: float = None) -> str:
+    """A/B arm, stable per user so a conversation never switches encoding"""
+    share = VERBOSE_SHARE if verbose_share is None else verbose_share
+    if share <= 0:
+        return COMPACT
+    bucket = int.from_bytes(hashlib.blake2b(user_id.encode("utf-8"), digest_size=4).digest(), "big") / 2 ** 32
+    return VERBOSE if bucket < share else COMPACT
+
+
+# Numbers the answer states as nutrition or training quantities
+_STATED = re.compile(r"(\d+(?:[.,]\d+)?)\s*(?:k?cal(?:ories)?\b|g\b|grams?\b|sets?\b|reps?\b|seconds?\b)", re.I)
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+
+
+def ungrounded_numbers(answer: str, data: str) -> Tuple[int, List[str]]:
+    """
+    (numbers stated, those not in the data). A stated number is grounded if
+    it matches a data number as given or rounded to a whole number or one decimal.
+    """
+    known = set()
+    for match in _NUMBER.findall(data):
+        value = float(match)
+        known.update({round(value, 1), float(math.floor(value)), float(math.ceil(value))})
+    stated = [match.replace(",", "") for match in _STATED.findall(answer)]
+    return len(stated), [number for number in stated if round(float(number), 1) not in known]
+
+
+class EncodingStats:
+    """Per-arm prompt sizes and answer grounding"""
+
+    def __init__(self):
+        self.arms = {arm: {"requests": 0, "data_tokens": 0, "verbose_tokens": 0, "answers": 0, "numbers": 0,
+                           "ungrounded": 0} for arm in (COMPACT, VERBOSE)}
+
+    def record_prompt(self, encoding: str, sent_tokens: int, verbose_tokens: int):
+        arm = self.arms[encoding]
+        arm["requests"] += 1
+        arm["data_tokens"] += sent_tokens
+        arm["verbose_tokens"] += verbose_tokens
+
+    def record_answer(self, encoding: str, answer: str, data: str) -> List[str]:
+        stated, ungrounded = ungrounded_numbers(answer, data)
+        arm = self.arms[encoding]
+        arm["answers"] += 1
+        arm["numbers"] += stated
+        arm["ungrounded"] += len(ungrounded)
+        return ungrounded
+
+    def snapshot(self) -> Dict:
+        report = {}
+        for name, arm in self.arms.items():
+            report[name] = {
+                **arm,
+                "tokens_saved": arm["verbose_tokens"] - arm["data_tokens"],
+                "saved_share": round(1 - arm["data_tokens"] / arm["verbose_tokens"], 3) if arm["verbose_tokens"] else None,
+                "grounded_rate": round(1 - arm["ungrounded"] / arm["numbers"], 3) if arm["numbers"] else None
+            }
+        return report
+
+
+stats = EncodingStats()
+
+
+def encode(blocks: List[Tuple[str, str]], user_id: str) -> Tuple[str, str, int]:
+    """
+    (encoding, data message, tokens saved) for a request from (verbose,
+    compact) block pairs; token counts of both renderings are recorded.
+    """
+    encoding = encoding_for(user_id)
+    verbose = data_message([pair[0] for pair in blocks], VERBOSE)
+    message = verbose if encoding == VERBOSE else data_message([pair[1] for pair in blocks])
+    sent_tokens, verbose_tokens = estimate_tokens(message), estimate_tokens(verbose)
+    stats.record_prompt(encoding, sent_tokens, verbose_tokens)
+    return encoding, message, verbose_tokens - sent_tokens
+
+
+def snapshot() -> Dict:
+    return stats.snapshot()
+
+
+if __name__ == "__main__":
+    # Token savings per tool block: python -m tools.context_encoder
+    # A/B grounding against the live model (needs OPENROUTER_API_KEY): python -m tools.context_encoder --live
+    import asyncio
+    import sys
+    from tools.exercise import ExerciseTools
+    from tools.food_log import format_food_log_for_llm
+    from tools.meal_planner import MealPlanner, format_meal_plan_for_llm
+    import json
+
+    foods = [
+        {"name": "egg", "serving": "2 large", "calories": 143.0, "protein": 12.6, "carbs": 0.7, "fat": 9.5,
+         "fiber": 0, "sugar": 0.4},
+        {"name": "toast", "serving": "1 slice", "calories": 79.5, "protein": 2.7, "carbs": 14.8, "fat": 1.0,
+         "fiber": 1.2, "sugar": 1.4},
+        {"name": "banana", "serving": "1 medium", "calories": 105.0, "protein": 1.3, "carbs": 27.0, "fat": 0.4,
+         "fiber": 3.1, "sugar": 14.4},
+    ]
+
+    def verbose_nutrition(foods: List[Dict]) -> str:
+        # The labelled per-food block FitnessCoachAgent sent before
+        text = "===== NUTRITION DATA FROM NUTRITIONIX API =====\nYOU MUST USE THESE EXACT NUMBERS IN YOUR RESPONSE.\n" \
+               "DO NOT ESTIMATE OR USE YOUR OWN KNOWLEDGE.\n\n"
+        for food in foods:
+            text += (f"Food: {food['name']}\nServing Size: {food['serving']}\nCalories: {food['calories']} kcal\n"
+                     f"Protein: {food['protein']}g\nCarbohydrates: {food['carbs']}g\nFat: {food['fat']}g\n")
+            text += "".join(f"{key.title()}: {food[key]}g\n" for key in ("fiber", "sugar") if food[key] > 0) + "\n"
+        return text + "===== END OF API DATA =====\nPresent these numbers EXACTLY as shown above in your response to the user.\n"
+
+    def item(query, food):
+        return {"query": query, "foods": [food], **{key: food[key] for key in ("calories", "protein", "carbs", "fat")}}
+
+    def totals(items):
+        return {key: round(sum(i[key] for i in items), 1) for key in ("calories", "protein", "carbs", "fat", "fiber", "sugar")}
+
+    breakfast = [item("2 eggs", foods[0]), item("toast", foods[1])]
+    log = {"meals": [{"meal": "breakfast", "items": breakfast, "totals": totals(foods[:2])},
+                     {"meal": "snack", "items": [item("banana", foods[2])], "totals": totals(foods[2:])}],
+           "totals": totals(foods), "unresolved": []}
+    plan = MealPlanner().plan_for("2000 calorie meal plan, vegetarian")
+    workout = ExerciseTools().create_workout_plan("beginner", 30)
+    workout_verbose = (f"===== WORKOUT PLAN FROM EXERCISE DATABASE =====\n{json.dumps(workout, indent=2)}\n"
+                       "===== END OF WORKOUT DATA =====")
+
+    cases = [("nutrition (3 foods)", verbose_nutrition(foods), nutrition_table(foods)),
+             ("food log", format_food_log_for_llm(log), food_log_table(log)),
+             ("meal plan", format_meal_plan_for_llm(plan), meal_plan_table(plan)),
+             ("workout plan", workout_verbose, workout_table(workout))]
+    for name, verbose, compact in cases:
+        before, after = estimate_tokens(verbose), estimate_tokens(compact)
+        print(f"{name:<20} {before:>5} → {after:>4} tokens ({1 - after / before:.0%} fewer)")
+    print(f"{'rules (once, cached)':<20} {estimate_tokens(TOOL_DATA_RULES):>13} tokens\n")
+    print(nutrition_table(foods), food_log_table(log), meal_plan_table(plan), workout_table(workout), sep="\n\n")
+
+    answer = "Two eggs have 143 kcal and 12.6 g protein; all three foods come to about 328 calories."
+    print(f"\ngrounding check: {ungrounded_numbers(answer, nutrition_table(foods))} "
+          f"(made-up: {ungrounded_numbers('That is 150 kcal', nutrition_table(foods))})")
+
+    if "--live" in sys.argv:
+        from llm_client import OpenRouterClient
+
+        questions = ["How many calories and grams of protein are in 2 eggs, a slice of toast and a banana?",
+                     "How did my eating go today?", "Show me my meal plan for today.",
+                     "Walk me through today's workout."]
+
+        async def live_ab(rounds: int = 3):
+            llm = OpenRouterClient()
+            system = "You are an expert fitness and nutrition coach.\n\n" + TOOL_DATA_RULES
+            for _ in range(rounds):
+                for (name, verbose, compact), question in zip(cases, questions):
+                    for encoding, block in ((VERBOSE, verbose), (COMPACT, compact)):
+                        data = data_message([block], encoding)
+                        messages = [{"role": "system", "content": system}, {"role": "user", "content": data},
+                                    {"role": "user", "content": question}]
+                        answer = "".join([chunk async for chunk in llm.stream_completion(messages, site="ab_check")])
+                        stats.record_prompt(encoding, estimate_tokens(data), estimate_tokens(verbose))
+                        ungrounded = stats.record_answer(encoding, answer, data)
+                        print(f"{name:<20} {encoding:<8} ungrounded: {ungrounded or '-'}")
+            for encoding, arm in stats.snapshot().items():
+                print(f"{encoding}: grounded {arm['grounded_rate']} of {arm['numbers']} stated numbers, "
+                      f"{arm['data_tokens']} data tokens")
+
+        asyncio.run(live_ab())
@@ -0,0 +1,246 @@
+"""
+Local food composition database
+A CSV of per-100g values is compiled once into a compact binary file that
+is memory-mapped at startup; lookups binary-search the sorted name index
+directly in the mapping, so nothing is parsed up front.
+
+Build:  python -m tools.food_db build foods.csv data/foods.fdb
+Query:  python -m tools.food_db lookup data/foods.fdb "100g chicken breast"
+"""
+
+import csv
+import mmap
+import os
+import re
+import struct
+import logging
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"FDB1"
+HEADER = struct.Struct("<4sIQQ")          # magic, count, names offset, records offset
+RECORD = struct.Struct("<IH7f")           # name offset, name length, 6 nutrients per 100g, serving grams (0 = unknown)
+NUTRIENTS = ["calories", "protein", "carbs", "fat", "fiber", "sugar"]
+
+# CSV header aliases (USDA/CoFID style exports use different names)
+COLUMN_ALIASES = {
+    "name": ["name", "food", "food_name", "description", "shrt_desc"],
+    "calories": ["calories", "energy_kcal", "kcal", "energ_kcal", "energy"],
+    "protein": ["protein", "protein_g"],
+    "carbs": ["carbs", "carbohydrate", "carbohydrates", "carbohydrate_g", "carbohydrt", "total_carbohydrate"],
+    "fat": ["fat", "total_fat", "fat_g", "lipid_tot", "total_lipid"],
+    "fiber": ["fiber", "fibre", "dietary_fiber", "fiber_td", "fiber_g"],
+    "sugar": ["sugar", "sugars", "sugar_tot", "total_sugars", "sugars_g"],
+    "serving_g": ["serving_g", "serving_grams", "gmwt_1", "portion_g"]
+}
+
+UNIT_GRAMS = {
+    "g": 1.0, "gram": 1.0, "grams": 1.0, "gr": 1.0,
+    "kg": 1000.0, "oz": 28.3495, "ounce": 28.3495, "ounces": 28.3495,
+    "lb": 453.592, "lbs": 453.592, "pound": 453.592, "pounds": 453.592
+}
+
+_QUANTITY_RE = re.compile(r"^\s*(\d+(?:\.\d+)?)?\s*([a-z]+\b)?\s*(?:of\s+)?(.*)$")
+_SPLIT_RE = re.compile(r",|\band\b|\bplus\b|\bwith\b|\n")
+
+
+def normalize_name(name: str) -> str:
+    return " ".join(re.sub(r"[^a-z0-9 ]", " ", name.lower()).split())
+
+
+def _column_map(header: List[str]) -> Dict[str, int]:
+    lowered = [h.strip().lower() for h in header]
+    mapping = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in lowered:
+                mapping[field] = lowered.index(alias)
+                break
+    missing = {"name", "calories", "protein", "carbs", "fat"} - set(mapping)
+    if missing:
+        raise ValueError(f"CSV is missing columns: {', '.join(sorted(missing))}")
+    return mapping
+
+
+def build_database(csv_path: str, output_path: str) -> int:
+    """Compile a per-100g food CSV into the binary format. Returns the food count."""
+    foods: Dict[str, Tuple[float, ...]] = {}
+    with open(csv_path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.reader(f)
+        columns = _column_map(next(reader))
+        for row in reader:
+            name = normalize_name(row[columns["name"]])
+            if not name:
+                continue
+
+            def number(field: str, default: float = 0.0) -> float:
+                index = columns.get(field)
+                try:
+                    return float(row[index]) if index is not None and row[index].strip() else default
+                except ValueError:
+                    return default
+
+            # First entry wins for duplicate names; no serving weight means
+            # counts ("3 eggs") can't be answered locally
+            foods.setdefault(name, tuple(number(n) for n in NUTRIENTS) + (number("serving_g"),))
+
+    names = sorted(foods)
+    blob = bytearray()
+    records = bytearray()
+    for name in names:
+        encoded = name.encode('utf-8')
+        records += RECORD.pack(len(blob), len(encoded), *foods[name])
+        blob += encoded
+
+    names_offset = HEADER.size
+    records_offset = names_offset + len(blob)
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(names), names_offset, records_offset))
+        f.write(blob)
+        f.write(records)
+    os.replace(tmp_path, output_path)
+
+    logger.info(f"📦 Built food database with {len(names)} foods: {output_path}")
+    return len(names)
+
+
+class FoodDatabase:
+    """Read-only, memory-mapped view of a compiled food database"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, self._names_offset, self._records_offset = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Not a food database: {path}")
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def open_default(cls) -> Optional["FoodDatabase"]:
+        """Open FOOD_DB_PATH (default data/foods.fdb) if it exists"""
+        path = os.getenv("FOOD_DB_PATH", os.path.join("data", "foods.fdb"))
+        if not os.path.exists(path):
+            return None
+        try:
+            database = cls(path)
+            logger.info(f"📦 Local food database mapped: {database.count} foods")
+            return database
+        except Exception as e:
+            logger.error(f"Error opening food database {path}: {str(e)}")
+            return None
+
+    def _record(self, index: int) -> Tuple:
+        return RECORD.unpack_from(self._mm, self._records_offset + index * RECORD.size)
+
+    def _name(self, record: Tuple) -> str:
+        start = self._names_offset + record[0]
+        return self._mm[start:start + record[1]].decode('utf-8')
+
+    def names(self):
+        """Iterate all food names in sorted order"""
+        for index in range(self.count):
+            yield self._name(self._record(index))
+
+    def find(self, name: str) -> Optional[Dict]:
+        """Exact (normalized) lookup, with a plural fallback. Values are per 100g."""
+        key = normalize_name(name)
+        for candidate in (key, key[:-1] if key.endswith("s") else None, key[:-2] if key.endswith("es") else None):
+            if not candidate:
+                continue
+            low, high = 0, self.count
+            while low < high:
+                mid = (low + high) // 2
+                record = self._record(mid)
+                current = self._name(record)
+                if current < candidate:
+                    low = mid + 1
+                elif current > candidate:
+                    high = mid
+                else:
+                    values = dict(zip(NUTRIENTS, record[2:8]))
+                    values["name"] = current
+                    values["serving_g"] = record[8]
+                    return values
+        return None
+
+    def analyze(self, query: str) -> Optional[Dict]:
+        """
+        Resolve a food query entirely from the local database
+        Returns a NutritionTools-style result, or None if any item is unknown
+        """
+        foods = []
+        for part in _SPLIT_RE.split(query.lower()):
+            part = part.strip(" .?!")
+            if not part:
+                continue
+            food = self._analyze_item(part)
+            if food is None:
+                self.misses += 1
+                return None
+            foods.append(food)
+
+        if not foods:
+            return None
+        self.hits += 1
+        return {"success": True, "foods": foods, "source": "local"}
+
+    def _analyze_item(self, item: str) -> Optional[Dict]:
+        match = _QUANTITY_RE.match(item)
+        quantity, unit, rest = match.group(1), match.group(2), match.group(3)
+
+        if unit in UNIT_GRAMS:
+            entry = self.find(rest)
+            grams = float(quantity or 1) * UNIT_GRAMS[unit]
+            serving_qty, serving_unit = float(quantity or 1), unit
+        else:
+            # "3 eggs" / "banana": count of default servings, only with a known
+            # per-serving weight; otherwise Nutritionix answers it
+            entry = self.find(" ".join(filter(None, [unit, rest])))
+            if entry is None or entry["serving_g"] <= 0:
+                return None
+            count = float(quantity or 1)
+            grams = count * entry["serving_g"]
+            serving_qty, serving_unit = count, "serving"
+
+        if entry is None:
+            return None
+
+        factor = grams / 100.0
+        food = {
+            "name": entry["name"],
+            "serving": f"{serving_qty:g} {serving_unit}",
+            "serving_qty": serving_qty,
+            "serving_unit": serving_unit,
+            "serving_weight_grams": round(grams, 1)
+        }
+        for nutrient in NUTRIENTS:
+            food[nutrient] = round(entry[nutrient] * factor, 1)
+        return food
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    if len(sys.argv) >= 4 and sys.argv[1] == "build":
+        count = build_database(sys.argv[2], sys.argv[3])
+        print(f"Built {sys.argv[3]} with {count} foods")
+    elif len(sys.argv) >= 4 and sys.argv[1] == "lookup":
+        started = time.perf_counter()
+        database = FoodDatabase(sys.argv[2])
+        opened = time.perf_counter()
+        result = database.analyze(sys.argv[3])
+        looked_up = time.perf_counter()
+        print(result)
+        print(f"open: {(opened - started) * 1e6:.0f} µs, lookup: {(looked_up - opened) * 1e6:.0f} µs")
+    else:
+        print("Usage: python -m tools.food_db build <foods.csv> <output.fdb>")
+        print("       python -m tools.food_db lookup <foods.fdb> <query>")
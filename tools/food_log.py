@@ -0,0 +1,241 @@
+import asyncio
+import os
+import re
+import logging
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from tools.nutrition import NutritionTools
+from tools.food_parser import join_compounds, unjoin_compounds
+
+logger = logging.getLogger(__name__)
+
+NUTRIENTS = ["calories", "protein", "carbs", "fat", "fiber", "sugar"]
+
+MEAL_LABELS = [
+    "breakfast", "brunch", "lunch", "dinner", "supper", "snack", "snacks",
+    "pre-workout", "post-workout", "dessert", "morning", "afternoon", "evening"
+]
+
+_MEAL_RE = re.compile(r"^\s*(" + "|".join(re.escape(m) for m in MEAL_LABELS) + r")(?:\s*\d+)?\s*:\s*(.*)$", re.S)
+_SEGMENT_SPLIT = re.compile(r"[;\n]+")
+_ITEM_SPLIT = re.compile(r",|\band\b|\bplus\b|\bwith\b|&|\+")
+
+
+def is_food_log(message: str) -> bool:
+    """True when the message looks like a labeled day of meals (2+ meal labels)"""
+    labels = re.findall(r"\b(" + "|".join(re.escape(m) for m in MEAL_LABELS) + r")(?:\s*\d+)?\s*:", message.lower())
+    return len(labels) >= 2
+
+
+def split_meals(text: str) -> List[Tuple[str, List[str]]]:
+    """
+    Split a day of meals into (meal, items)
+    Example: "breakfast: 3 eggs, toast; lunch: 200g chicken and rice"
+          → [("breakfast", ["3 eggs", "toast"]), ("lunch", ["200g chicken", "rice"])]
+    Unlabeled segments are attached to the previous meal (or "other")
+    """
+    meals: List[Tuple[str, List[str]]] = []
+    for segment in _SEGMENT_SPLIT.split(text.lower()):
+        match = _MEAL_RE.match(segment)
+        if match:
+            meal, body = match.group(1), match.group(2)
+        else:
+            meal, body = (meals[-1][0] if meals else "other"), segment
+
+        items = [unjoin_compounds(item).strip(" .!?\t") for item in _ITEM_SPLIT.split(join_compounds(body))]
+        items = [item for item in items if item]
+        if not items:
+            continue
+
+        if meals and meals[-1][0] == meal:
+            meals[-1][1].extend(items)
+        else:
+            meals.append((meal, items))
+    return meals
+
+
+def _stems(text: str) -> set:
+    """Content words of a food name or item, plurals folded ("eggs" → "egg")"""
+    stems = set()
+    for word in re.findall(r"[a-z]+", text.lower()):
+        if word.endswith("es") and len(word) > 4:
+            word = word[:-2]
+        elif word.endswith("s") and len(word) > 3:
+            word = word[:-1]
+        stems.add(word)
+    return stems
+
+
+def match_foods(items: List[str], foods: List[Dict]) -> Dict[str, Dict]:
+    """
+    Pair items with the foods of a grouped lookup by name. An item and a food
+    are paired only when each is the other's single best word overlap; every
+    other item is left out.
+    """
+    item_stems = [_stems(item) for item in items]
+    food_stems = [_stems(food.get("name", "")) for food in foods]
+    overlap = [[len(i & f) for f in food_stems] for i in item_stems]
+
+    def unique_best(scores: List[int]):
+        best = max(scores, default=0)
+        return scores.index(best) if best and scores.count(best) == 1 else None
+
+    matched = {}
+    for i, item in enumerate(items):
+        f = unique_best(overlap[i])
+        if f is not None and unique_best([row[f] for row in overlap]) == i:
+            matched[item] = foods[f]
+    return matched
+
+
+class FoodLogAnalyzer:
+    """Analyzes a whole day of meals with as few upstream calls as possible"""
+
+    def __init__(self, nutrition: NutritionTools, group_size: int = None):
+        self.nutrition = nutrition
+        # Items sent to Nutritionix per natural-language call
+        self.group_size = group_size or int(os.getenv("FOOD_LOG_GROUP_SIZE", "8"))
+
+    async def _resolve_group(self, items: List[str]) -> Dict[str, Dict]:
+        """
+        Resolve a group of items with one upstream call. Nutritionix returns one
+        food per recognised item, possibly reordered or merged, so each food is
+        matched back to its item by name; items without an unambiguous match
+        are retried on their own rather than cached under the wrong food.
+        """
+        if len(items) == 1:
+            return {items[0]: await self.nutrition.analyze_food(items[0])}
+
+        result = await self.nutrition.analyze_food("\n".join(items))
+        foods = result.get("foods", []) if result.get("success") else []
+        matched = match_foods(items, foods) if len(foods) == len(items) else {}
+
+        resolved = {}
+        for item, food in matched.items():
+            item_result = {"success": True, "foods": [food]}
+            self.nutrition.store_cached(item, item_result)
+            resolved[item] = item_result
+
+        unmatched = [item for item in items if item not in resolved]
+        if unmatched:
+            logger.info(f"🔁 Group of {len(items)} returned {len(foods)} foods, "
+                        f"resolving {len(unmatched)} items individually")
+            results = await asyncio.gather(*[self.nutrition.analyze_food(item) for item in unmatched])
+            resolved.update(zip(unmatched, results))
+        return resolved
+
+    async def resolve_items(self, items: List[str]) -> Tuple[Dict[str, Dict], Dict]:
+        """Resolve unique items from cache, then query the misses in parallel groups"""
+        unique = list(dict.fromkeys(NutritionTools.normalize_query(item) for item in items))
+
+        resolved: Dict[str, Dict] = {}
+        misses = []
+        for item in unique:
+            cached = self.nutrition.get_cached(item)
+            if cached is not None:
+                resolved[item] = cached
+            else:
+                misses.append(item)
+
+        groups = [misses[i:i + self.group_size] for i in range(0, len(misses), self.group_size)]
+        for group_result in await asyncio.gather(*[self._resolve_group(group) for group in groups]):
+            resolved.update(group_result)
+
+        stats = {
+            "items": len(items),
+            "unique_items": len(unique),
+            "cache_hits": len(unique) - len(misses),
+            "upstream_groups": len(groups)
+        }
+        return resolved, stats
+
+    async def analyze_day(self, text: str) -> Dict:
+        """Analyze a labeled day of meals, with per-meal and daily totals"""
+        meals = split_meals(text)
+        if not meals:
+            return {"error": "No food items found"}
+
+        # Flatten to occurrences: one row per (meal, item)
+        occurrences = [(meal_index, NutritionTools.normalize_query(item))
+                       for meal_index, (_, items) in enumerate(meals) for item in items]
+        resolved, stats = await self.resolve_items([item for _, item in occurrences])
+
+        unique_items = list(resolved)
+        unique_index = {item: i for i, item in enumerate(unique_items)}
+
+        # Per-item nutrient matrix (items that failed stay zero)
+        item_matrix = np.zeros((len(unique_items), len(NUTRIENTS)))
+        for i, item in enumerate(unique_items):
+            result = resolved[item]
+            if result.get("success"):
+                item_matrix[i] = np.sum([[food.get(n, 0) for n in NUTRIENTS] for food in result["foods"]], axis=0)
+
+        # One vectorized pass: gather occurrence rows, scatter-add into meals
+        rows = item_matrix[[unique_index[item] for _, item in occurrences]]
+        meal_ids = np.array([meal_index for meal_index, _ in occurrences])
+        meal_totals = np.zeros((len(meals), len(NUTRIENTS)))
+        np.add.at(meal_totals, meal_ids, rows)
+        day_totals = meal_totals.sum(axis=0)
+
+        result_meals = []
+        unresolved = []
+        for meal_index, (meal, items) in enumerate(meals):
+            meal_items = []
+            for item in items:
+                key = NutritionTools.normalize_query(item)
+                item_result = resolved.get(key, {})
+                if not item_result.get("success"):
+                    unresolved.append(item)
+                    continue
+                meal_items.append({
+                    "query": item,
+                    "foods": item_result["foods"],
+                    **_round_totals(item_matrix[unique_index[key]])
+                })
+            result_meals.append({"meal": meal, "items": meal_items, "totals": _round_totals(meal_totals[meal_index])})
+
+        logger.info(f"🍽️ Food log: {stats['items']} items, {stats['unique_items']} unique, "
+                    f"{stats['cache_hits']} cached, {stats['upstream_groups']} upstream calls")
+
+        return {
+            "success": any(meal["items"] for meal in result_meals),
+            "meals": result_meals,
+            "totals": _round_totals(day_totals),
+            "unresolved": unresolved,
+            "stats": stats
+        }
+
+
+def _round_totals(values: np.ndarray) -> Dict:
+    return {name: round(float(value), 1) for name, value in zip(NUTRIENTS, values)}
+
+
+def logged_foods(log: Dict) -> List[Dict]:
+    """All resolved foods in a day analysis, flattened"""
+    return [food for meal in log.get("meals", []) for item in meal["items"] for food in item["foods"]]
+
+
+def format_food_log_for_llm(log: Dict) -> str:
+    """Format a day analysis for LLM context"""
+    context = "===== DAILY FOOD LOG FROM NUTRITIONIX API =====\n"
+    context += "YOU MUST USE THESE EXACT NUMBERS.\n\n"
+
+    for meal in log["meals"]:
+        context += f"{meal['meal'].upper()}\n"
+        for item in meal["items"]:
+            context += (f"- {item['query']}: {item['calories']:.1f} kcal | Protein: {item['protein']:.1f}g | "
+                        f"Carbs: {item['carbs']:.1f}g | Fat: {item['fat']:.1f}g\n")
+        totals = meal["totals"]
+        context += (f"Meal total: {totals['calories']:.1f} kcal | Protein: {totals['protein']:.1f}g | "
+                    f"Carbs: {totals['carbs']:.1f}g | Fat: {totals['fat']:.1f}g\n\n")
+
+    totals = log["totals"]
+    context += (f"DAILY TOTAL: {totals['calories']:.1f} kcal | Protein: {totals['protein']:.1f}g | "
+                f"Carbs: {totals['carbs']:.1f}g | Fat: {totals['fat']:.1f}g | "
+                f"Fiber: {totals['fiber']:.1f}g | Sugar: {totals['sugar']:.1f}g\n")
+    if log.get("unresolved"):
+        context += f"Not found: {', '.join(log['unresolved'])}\n"
+    context += "\n===== END OF API DATA =====\n"
+    return context
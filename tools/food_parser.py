@@ -0,0 +1,404 @@
+"""
+Deterministic food quantity parser
+Turns "How many calories in 1 1/2 cups of rice and two eggs?" into
+(quantity, unit, food) items and a lookup query ("1.5 cups rice and 2 eggs")
+without an LLM round-trip. Lead-ins ("how many calories in", "I had") and
+time phrases are stripped, numbers, fractions and number words are read,
+unit synonyms are canonicalized and converted to grams or millilitres where
+possible. Each parse carries a confidence; callers fall back to the LLM
+extractor when it is below FOOD_PARSER_MIN_CONFIDENCE.
+"""
+
+import os
+import re
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+
+from tools.fuzzy_index import is_food_word
+
+logger = logging.getLogger(__name__)
+
+MIN_CONFIDENCE = float(os.getenv("FOOD_PARSER_MIN_CONFIDENCE", "0.75"))
+# No word of the food is a known food ("hello"): the LLM extractor decides
+UNKNOWN_FOOD_CONFIDENCE = 0.6
+
+NUMBER_WORDS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7,
+    "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12, "fifteen": 15, "twenty": 20,
+    "thirty": 30, "forty": 40, "fifty": 50, "half": 0.5, "quarter": 0.25, "couple": 2
+}
+MULTIPLIERS = {"dozen": 12, "hundred": 100}
+VAGUE_QUANTITIES = {"few": 3, "some": 1, "several": 3}
+# "a lot of rice", "a little bit of cheese": no amount at all, the food's default serving is used
+VAGUE_AMOUNTS = {"lot", "lots", "bit", "little", "ton", "tons", "bunch", "plenty"}
+UNICODE_FRACTIONS = {"½": " 1/2", "¼": " 1/4", "¾": " 3/4", "⅓": " 1/3", "⅔": " 2/3", "⅛": " 1/8"}
+
+# Synonym → canonical unit
+UNITS = {
+    **dict.fromkeys(["g", "gm", "gms", "gr", "gram", "grams", "gramme", "grammes"], "g"),
+    **dict.fromkeys(["kg", "kgs", "kilo", "kilos", "kilogram", "kilograms"], "kg"),
+    **dict.fromkeys(["oz", "ounce", "ounces"], "oz"),
+    **dict.fromkeys(["lb", "lbs", "pound", "pounds"], "lb"),
+    **dict.fromkeys(["ml", "milliliter", "milliliters", "millilitre", "millilitres"], "ml"),
+    **dict.fromkeys(["l", "liter", "liters", "litre", "litres"], "l"),
+    **dict.fromkeys(["cup", "cups"], "cup"),
+    **dict.fromkeys(["tbsp", "tbs", "tbl", "tablespoon", "tablespoons"], "tbsp"),
+    **dict.fromkeys(["tsp", "teaspoon", "teaspoons"], "tsp"),
+    **dict.fromkeys(["slice", "slices"], "slice"),
+    **dict.fromkeys(["piece", "pieces", "pc", "pcs"], "piece"),
+    **dict.fromkeys(["serving", "servings", "portion", "portions"], "serving"),
+    **dict.fromkeys(["scoop", "scoops"], "scoop"),
+    **dict.fromkeys(["bowl", "bowls"], "bowl"),
+    **dict.fromkeys(["glass", "glasses"], "glass"),
+    **dict.fromkeys(["can", "cans"], "can"),
+    **dict.fromkeys(["bottle", "bottles"], "bottle"),
+    **dict.fromkeys(["handful", "handfuls"], "handful"),
+    **dict.fromkeys(["clove", "cloves"], "clove"),
+    **dict.fromkeys(["strip", "strips"], "strip"),
+    **dict.fromkeys(["stick", "sticks"], "stick"),
+    **dict.fromkeys(["fillet", "fillets", "filet", "filets"], "fillet")
+}
+PLURAL_UNITS = {"glass": "glasses"}
+# Written the same in the plural
+ABBREVIATED_UNITS = {"g", "kg", "oz", "lb", "ml", "l", "tbsp", "tsp", "fl oz"}
+MASS_GRAMS = {"g": 1.0, "kg": 1000.0, "oz": 28.3495, "lb": 453.592}
+VOLUME_ML = {"ml": 1.0, "l": 1000.0, "cup": 240.0, "tbsp": 14.787, "tsp": 4.929, "fl oz": 29.574}
+# Written without a space before the food: "100g salmon"
+ATTACHED_UNITS = {"g", "kg", "ml", "l"}
+
+# Words that only ever frame a question; a food never starts with them
+FILLER = {
+    "how", "many", "much", "what", "whats", "which", "is", "are", "was", "were", "the", "there",
+    "does", "do", "did", "i", "ive", "im", "just", "also", "me", "my", "tell", "show", "give", "get",
+    "find", "check", "can", "could", "you", "please", "pls", "nutrition", "nutritional", "nutrients",
+    "info", "information", "facts", "value", "values", "calories", "calorie", "cals", "kcal", "macros",
+    "macro", "breakdown", "content", "count", "total", "today", "yesterday", "tonight", "breakfast",
+    "lunch", "dinner", "supper", "brunch", "snack", "meal", "so", "ok", "okay", "hey", "hi", "well"
+}
+# Nutrient names frame questions too, but are also part of foods ("protein bar")
+NUTRIENT_WORDS = {"protein", "carbs", "carb", "carbohydrates", "fat", "fats", "fiber", "fibre", "sugar",
+                  "sugars", "sodium"}
+# The food follows these: "calories in", "I had", "tell me about"
+TRIGGERS = {"in", "of", "for", "about", "ate", "eaten", "eat", "eating", "had", "having", "have",
+            "drank", "drink", "drinking", "log", "logged", "add", "track"}
+TRAILING = {"today", "yesterday", "tonight", "now", "please", "pls", "have", "has", "contain", "contains",
+            "got", "total", "altogether"}
+LEAD_WORDS = FILLER | NUTRIENT_WORDS | TRIGGERS
+# Left in a food name, these mean the sentence was not a plain food query
+RESIDUE = (FILLER | TRIGGERS - {"in", "of"}) | {
+    "should", "would", "better", "worse", "than", "vs", "versus", "or", "healthy", "healthier", "good",
+    "bad", "burn", "lose", "gain", "weight", "workout", "diet", "why", "when", "where", "if", "it",
+    "this", "that", "these", "those", "not", "need", "want", "recommend", "best", "enough"
+}
+
+# "and" inside these is part of the name, not a separator
+COMPOUND_FOODS = ["macaroni and cheese", "mac and cheese", "fish and chips", "peanut butter and jelly",
+                  "salt and vinegar", "sweet and sour", "surf and turf", "rice and beans", "pb and j"]
+_JOINER = "_"  # a word character, so \band\b never matches inside a compound
+
+_SEPARATORS = re.compile(r"\s*(?:,|;|\+|&|\n|\balong with\b|\balongside\b|\band\b|\bplus\b|\bwith\b)\s*")
+_TIME_PHRASES = re.compile(
+    r"\b(?:(?:for|at|with|during) (?:my )?(?:breakfast|lunch|dinner|supper|brunch|a snack|snack)"
+    r"|this (?:morning|afternoon|evening)|last night|in (?:it|them|total))\b"
+)
+_AND_A_HALF = re.compile(r"\b(\d+|" + "|".join(k for k in NUMBER_WORDS if NUMBER_WORDS[k] >= 1) + r") and a half\b")
+_ATTACHED = re.compile(r"(\d)([a-z])")
+_NUMBER = re.compile(r"^\d+(?:\.\d+)?$")
+_FRACTION = re.compile(r"^(\d+)/(\d+)$")
+_RANGE = re.compile(r"^(\d+(?:\.\d+)?)-(\d+(?:\.\d+)?)$")
+
+
+def _normalize(message: str) -> str:
+    text = message.lower().replace("’", "'").replace("'", "")
+    for symbol, fraction in UNICODE_FRACTIONS.items():
+        text = text.replace(symbol, fraction)
+    text = re.sub(r"[?!\"()]|\.(?!\d)", " ", text)
+    text = _ATTACHED.sub(r"\1 \2", text)
+    text = _AND_A_HALF.sub(lambda m: f"{_number_value(m.group(1)) + 0.5:g}", text)
+    text = _TIME_PHRASES.sub(" ", text)
+    return join_compounds(text)
+
+
+def join_compounds(text: str) -> str:
+    """Glue the words of compound foods ("mac and cheese") so item splitting leaves them whole"""
+    for name in COMPOUND_FOODS:
+        text = text.replace(name, name.replace(" ", _JOINER))
+    return text
+
+
+def unjoin_compounds(text: str) -> str:
+    return text.replace(_JOINER, " ")
+
+
+def _number_value(token: str) -> float:
+    return float(token) if _NUMBER.match(token) else float(NUMBER_WORDS[token])
+
+
+def _strip_lead_in(tokens: List[str]) -> List[str]:
+    """Drop "how many calories in" / "for breakfast I had" style openings"""
+    run_end = 0
+    last_trigger = -1
+    while run_end < len(tokens) and tokens[run_end] in LEAD_WORDS:
+        if tokens[run_end] in TRIGGERS:
+            last_trigger = run_end
+        run_end += 1
+    if last_trigger >= 0:
+        return tokens[last_trigger + 1:]
+    if all(token in FILLER for token in tokens[:run_end]):
+        return tokens[run_end:]
+    return tokens
+
+
+def _strip_trailing(tokens: List[str]) -> List[str]:
+    while tokens and tokens[-1] in TRAILING:
+        tokens = tokens[:-1]
+    return tokens
+
+
+def _read_quantity(tokens: List[str]) -> Tuple[Optional[float], int, bool]:
+    """(quantity, tokens consumed, vague) from the start of an item"""
+    if not tokens:
+        return None, 0, False
+    first = tokens[0]
+    vague = False
+    amount = tokens[1:] if first in ("a", "an") else tokens
+    if amount and amount[0] in VAGUE_AMOUNTS:
+        used = len(tokens) - len(amount) + 1
+        while used < len(tokens) and tokens[used] in VAGUE_AMOUNTS | {"of"}:
+            used += 1
+        return None, used, True
+    if _NUMBER.match(first) or first in NUMBER_WORDS:
+        quantity, used = _number_value(first), 1
+    elif _FRACTION.match(first):
+        numerator, denominator = _FRACTION.match(first).groups()
+        quantity, used = int(numerator) / max(int(denominator), 1), 1
+    elif _RANGE.match(first):
+        low, high = _RANGE.match(first).groups()
+        quantity, used, vague = (float(low) + float(high)) / 2, 1, True
+    elif first in MULTIPLIERS:
+        return float(MULTIPLIERS[first]), 1, False
+    elif first in VAGUE_QUANTITIES:
+        quantity, used, vague = float(VAGUE_QUANTITIES[first]), 1, True
+    else:
+        return None, 0, False
+
+    while used < len(tokens):
+        token = tokens[used]
+        if _FRACTION.match(token) and quantity >= 1 and quantity == int(quantity):
+            numerator, denominator = _FRACTION.match(token).groups()
+            quantity += int(numerator) / max(int(denominator), 1)       # "1 1/2"
+        elif token in MULTIPLIERS:
+            quantity *= MULTIPLIERS[token]                              # "two dozen"
+        elif token in ("a", "an") and first in ("half", "quarter"):
+            pass                                                        # "half a cup"
+        elif token in ("half", "quarter") and first in ("a", "an"):
+            quantity = NUMBER_WORDS[token]                              # "a half cup"
+        elif token in ("couple", "few") and first in ("a", "an"):
+            quantity = float(NUMBER_WORDS.get(token) or VAGUE_QUANTITIES[token])   # "a couple of"
+            vague = token == "few"
+        elif token == "of" and tokens[used - 1] in ("couple", "few"):
+            pass
+        else:
+            break
+        used += 1
+    return quantity, used, vague
+
+
+def _read_unit(tokens: List[str]) -> Tuple[Optional[str], int]:
+    if len(tokens) >= 2 and tokens[0] in ("fl", "fluid") and tokens[1] in ("oz", "ounce", "ounces"):
+        return "fl oz", 2
+    if tokens and tokens[0] in UNITS:
+        return UNITS[tokens[0]], 1
+    return None, 0
+
+
+def parse_item(segment: str, is_known: Optional[Callable[[str], bool]] = None) -> Optional[Dict]:
+    """
+    Parse one item ("2 slices of whole wheat toast"); None if nothing is left of it
+    is_known(word) says whether a word is a known food (built-in words by default)
+    """
+    tokens = _strip_trailing(_strip_lead_in(segment.split()))
+    if not tokens:
+        return None
+
+    quantity, used, vague = _read_quantity(tokens)
+    unit, unit_used = _read_unit(tokens[used:])
+    # A bare "l" or "g" token is only a unit after a number
+    if unit in ("l", "g") and quantity is None:
+        unit, unit_used = None, 0
+    used += unit_used
+    if used < len(tokens) and tokens[used] == "of":
+        used += 1
+    food_tokens = tokens[used:]
+    food = unjoin_compounds(" ".join(food_tokens)).strip(" -.'")
+    if unit is not None and quantity is None:
+        quantity = 1.0
+
+    confidence = 1.0
+    if not food:
+        confidence = 0.0
+    elif any(token in RESIDUE for token in food_tokens):
+        confidence = 0.3
+    elif any(char.isdigit() for char in food) or len(food_tokens) > 6:
+        confidence = 0.5
+    elif vague:
+        confidence = 0.8
+    if confidence > UNKNOWN_FOOD_CONFIDENCE and not any(map(is_known or is_food_word, food.split())):
+        confidence = UNKNOWN_FOOD_CONFIDENCE
+
+    item = {"quantity": quantity, "unit": unit, "food": food, "confidence": confidence}
+    if unit in MASS_GRAMS:
+        item["grams"] = round(quantity * MASS_GRAMS[unit], 1)
+    elif unit in VOLUME_ML:
+        item["ml"] = round(quantity * VOLUME_ML[unit], 1)
+    return item
+
+
+def format_item(item: Dict) -> str:
+    """Lookup text for an item: "100g salmon", "2 slices whole wheat toast", "3 eggs" """
+    quantity, unit, food = item["quantity"], item["unit"], item["food"]
+    if quantity is None:
+        return food
+    amount = f"{quantity:g}"
+    if unit is None:
+        return f"{amount} {food}"
+    if unit in ATTACHED_UNITS:
+        return f"{amount}{unit} {food}"
+    if unit not in ABBREVIATED_UNITS and quantity > 1:
+        unit = PLURAL_UNITS.get(unit, unit + "s")
+    return f"{amount} {unit} {food}"
+
+
+def parse_food_query(message: str, is_known: Optional[Callable[[str], bool]] = None) -> Dict:
+    """
+    Parse every food item in a message
+    Returns {"items": [...], "query": "3 eggs and 100g salmon", "confidence": 0..1};
+    confidence is that of the least certain item, 0 when nothing was found
+    """
+    items = []
+    for segment in _SEPARATORS.split(_normalize(message)):
+        item = parse_item(segment, is_known)
+        if item is not None:
+            items.append(item)
+    confidence = min((item["confidence"] for item in items), default=0.0)
+    return {
+        "items": items,
+        "query": " and ".join(format_item(item) for item in items),
+        "confidence": confidence
+    }
+
+
+def local_food_query(message: str, min_confidence: float = MIN_CONFIDENCE,
+                     is_known: Optional[Callable[[str], bool]] = None) -> Optional[str]:
+    """The parsed lookup query, or None when the LLM extractor should decide"""
+    parsed = parse_food_query(message, is_known)
+    if parsed["confidence"] >= min_confidence:
+        return parsed["query"]
+    return None
+
+
+if __name__ == "__main__":
+    # Benchmark: python -m tools.food_parser
+    # Labeled queries → expected lookup text; None means the parser should defer to the LLM
+    import time
+
+    import numpy as np
+
+    labeled = [
+        ("How many calories in 3 eggs?", "3 eggs"),
+        ("What's the nutrition for chicken breast and rice?", "chicken breast and rice"),
+        ("I ate 2 apples today", "2 apples"),
+        ("100g of salmon", "100g salmon"),
+        ("Tell me about 3 eggs and oatmeal", "3 eggs and oatmeal"),
+        ("What's in 3 large eggs with 2 slices of whole wheat toast?", "3 large eggs and 2 slices whole wheat toast"),
+        ("Calories in 100g chicken and rice?", "100g chicken and rice"),
+        ("how much protein in 200 grams of greek yogurt", "200g greek yogurt"),
+        ("1 1/2 cups of brown rice", "1.5 cups brown rice"),
+        ("half a cup of oats", "0.5 cup oats"),
+        ("a half cup of blueberries", "0.5 cup blueberries"),
+        ("one and a half cups of milk", "1.5 cups milk"),
+        ("½ avocado", "0.5 avocado"),
+        ("a banana", "1 banana"),
+        ("an apple and a glass of orange juice", "1 apple and 1 glass orange juice"),
+        ("two dozen eggs", "24 eggs"),
+        ("a dozen almonds", "12 almonds"),
+        ("8 oz steak", "8 oz steak"),
+        ("8oz ribeye steak", "8 oz ribeye steak"),
+        ("1 lb ground beef", "1 lb ground beef"),
+        ("2 tbsp peanut butter", "2 tbsp peanut butter"),
+        ("1 tablespoon olive oil", "1 tbsp olive oil"),
+        ("3 teaspoons of sugar", "3 tsp sugar"),
+        ("500ml of milk", "500ml milk"),
+        ("a can of tuna", "1 can tuna"),
+        ("2 cans of coke", "2 cans coke"),
+        ("12 fl oz orange juice", "12 fl oz orange juice"),
+        ("I had 2 slices of pizza and a coke for lunch", "2 slices pizza and 1 coke"),
+        ("For breakfast I had 2 eggs, toast and coffee", "2 eggs and toast and coffee"),
+        ("calories in a big mac", "1 big mac"),
+        ("macros for 150g tofu", "150g tofu"),
+        ("how many calories does a banana have", "1 banana"),
+        ("nutrition info for mac and cheese", "mac and cheese"),
+        ("fish and chips", "fish and chips"),
+        ("2 scoops of whey protein", "2 scoops whey protein"),
+        ("protein bar", "protein bar"),
+        ("coffee with milk and sugar", "coffee and milk and sugar"),
+        ("3 pieces of sushi + 1 bowl of miso soup", "3 pieces sushi and 1 bowl miso soup"),
+        ("a couple of cookies", "2 cookies"),
+        ("couple of eggs", "2 eggs"),
+        ("2-3 cups of spinach", "2.5 cups spinach"),
+        ("1kg potatoes", "1kg potatoes"),
+        ("4 strips of bacon", "4 strips bacon"),
+        ("a handful of walnuts", "1 handful walnuts"),
+        ("I just drank a bottle of gatorade", "1 bottle gatorade"),
+        ("hey, how many cals in 2 tortillas?", "2 tortillas"),
+        ("log 1 cup of cooked quinoa", "1 cup cooked quinoa"),
+        ("salmon fillet and asparagus", "salmon fillet and asparagus"),
+        ("2 salmon fillets", "2 salmon fillets"),
+        ("what is the calorie count of 1 medium potato", "1 medium potato"),
+        ("i ate 3 chicken wings and a beer last night", "3 chicken wings and 1 beer"),
+        ("Is rice or pasta better for weight loss?", None),
+        ("How many calories should I eat to lose weight?", None),
+        ("what should I have for dinner", None),
+        ("is 2 eggs a day healthy", None),
+        ("compare chicken vs tofu", None),
+        ("how much protein do I need", None),
+        ("a lot of rice", "rice"),
+        ("a little bit of cheese", "cheese"),
+        ("hello", None),
+        ("my flurbix", None),
+    ]
+
+    def score(threshold: float) -> Dict:
+        local = correct_local = deferred = correct_deferrals = 0
+        for message, expected in labeled:
+            query = local_food_query(message, threshold)
+            if query is None:
+                deferred += 1
+                correct_deferrals += expected is None
+            else:
+                local += 1
+                correct_local += query == expected
+        return {"local": local, "correct_local": correct_local, "deferred": deferred,
+                "correct_deferrals": correct_deferrals}
+
+    result = score(MIN_CONFIDENCE)
+    print(f"{len(labeled)} labeled queries, threshold {MIN_CONFIDENCE}")
+    print(f"  parsed locally: {result['local']} ({result['correct_local']} exactly as labeled)")
+    print(f"  sent to LLM:    {result['deferred']} ({result['correct_deferrals']} labeled as needing it)")
+    answerable = sum(expected is not None for _, expected in labeled)
+    print(f"  LLM calls avoided: {result['correct_local']}/{answerable} food queries")
+    for message, expected in labeled:
+        parsed = parse_food_query(message)
+        query = parsed["query"] if parsed["confidence"] >= MIN_CONFIDENCE else None
+        if query != expected:
+            print(f"  ✗ {message!r}: {query!r} (confidence {parsed['confidence']}), expected {expected!r}")
+
+    messages = [message for message, _ in labeled]
+    timings = []
+    for _ in range(200):
+        for message in messages:
+            started = time.perf_counter()
+            parse_food_query(message)
+            timings.append(time.perf_counter() - started)
+    p50, p99 = np.percentile(np.array(timings) * 1e6, [50, 99])
+    print(f"latency: p50 {p50:.0f} µs, p99 {p99:.0f} µs per query ({len(timings)} parses)")
@@ -0,0 +1,205 @@
+"""
+Typo-tolerant food name index
+Trigram inverted index for candidate generation, bounded Levenshtein
+distance for ranking. Names can be added at any time.
+"""
+
+import heapq
+import re
+import logging
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+_ITEM_SPLIT = re.compile(r"(,|\band\b|\bplus\b|\bwith\b|\n)")
+_QUANTITY_PREFIX = re.compile(
+    r"^(\s*(?:\d+(?:[./]\d+)?|(?:a|an|one|two|three|four|five|half)\b)?\s*"
+    r"(?:(?:g|grams?|kg|oz|ounces?|lbs?|pounds?|cups?|slices?|pieces?|tbsp|tsp|servings?|"
+    r"bowls?|glass(?:es)?|large|medium|small)\b)?\s*(?:of\s+)?)(.*?)(\s*[?.!]*\s*)$"
+)
+
+# Ordinary food words that are never typos, whatever names have been learned
+# so far ("beef" must not become "beer" just because only beer is indexed)
+FOOD_WORDS = frozenset("""
+    almond apple apricot asparagus avocado bacon bagel banana bar bean beef beer berry blueberry bread breast
+    broccoli burger burrito butter cabbage cake carrot cashew cereal cheese cherry chicken chip chocolate cod
+    coffee coke cola cookie corn cracker cream date donut duck egg fig fish flour fries garlic gatorade
+    granola grape ham honey hummus jam juice kale lamb leek lemon lentil lettuce lime mac mango meat melon
+    milk miso muffin mushroom noodle nut oat oatmeal oil olive onion orange pancake pasta pea peach peanut
+    pear pepper pie pizza plum popcorn pork potato prawn pretzel protein pudding quinoa ramen raspberry
+    ribeye rice roll salad salmon sandwich sausage shake shrimp smoothie soda soup spinach squash steak
+    strawberry sugar sushi taco tea thigh toast tofu tomato tortilla tuna turkey waffle walnut water whey
+    wine wing wrap yogurt
+""".split())
+
+
+def _singulars(word: str) -> Iterator[str]:
+    """The word and its possible singular forms ("berries" → "berry", "tomatoes" → "tomato")"""
+    yield word
+    if word.endswith("ies"):
+        yield word[:-3] + "y"
+    if word.endswith("es"):
+        yield word[:-2]
+    if word.endswith("s"):
+        yield word[:-1]
+
+
+def is_food_word(word: str) -> bool:
+    """Whether a word is one of the built-in common food words, plurals included"""
+    return any(candidate in FOOD_WORDS for candidate in _singulars(word.lower()))
+
+
+def _trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def bounded_levenshtein(a: str, b: str, limit: int) -> int:
+    """Edit distance between a and b, or limit + 1 once it is known to exceed limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        row_min = i
+        for j, cb in enumerate(b, 1):
+            cost = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+            current.append(cost)
+            if cost < row_min:
+                row_min = cost
+        if row_min > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class FuzzyNameIndex:
+    """Incremental trigram index over canonical food names"""
+
+    def __init__(self, names: Iterable[str] = (), candidates: int = 12):
+        self.candidates = candidates
+        self._names: List[str] = []
+        self._ids: Dict[str, int] = {}
+        self._grams: Dict[str, List[int]] = {}
+        self._words: Set[str] = set()
+        self.corrections = 0
+        for name in names:
+            self.add(name)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __contains__(self, name: str) -> bool:
+        return " ".join(name.lower().split()) in self._ids
+
+    def add(self, name: str) -> bool:
+        """Add a canonical name; returns False if it was already known"""
+        name = " ".join(name.lower().split())
+        if not name or name in self._ids:
+            return False
+        name_id = len(self._names)
+        self._names.append(name)
+        self._ids[name] = name_id
+        self._words.update(name.split())
+        for gram in _trigrams(name):
+            self._grams.setdefault(gram, []).append(name_id)
+        return True
+
+    def is_known_word(self, word: str) -> bool:
+        """Whether a single word is a real food word (learned or built in), plurals included"""
+        return any(candidate in self._words or candidate in FOOD_WORDS for candidate in _singulars(word.lower()))
+
+    def max_distance(self, term: str) -> int:
+        """Allowed edits: roughly one per five characters, at least one"""
+        return max(1, len(term) // 5)
+
+    def match(self, term: str, max_distance: Optional[int] = None) -> Optional[Tuple[str, int]]:
+        """
+        Closest known name within max_distance edits, as (name, distance)
+        None when two names tie for the closest distance: an ambiguous
+        correction is worse than none.
+        """
+        term = " ".join(term.lower().split())
+        if not term:
+            return None
+        if term in self._ids:
+            return term, 0
+
+        limit = self.max_distance(term) if max_distance is None else max_distance
+
+        # Each edit destroys at most 3 trigrams, so a match within `limit`
+        # edits shares at least one of the term's 3*limit+1 rarest trigrams
+        grams = sorted(_trigrams(term), key=lambda gram: len(self._grams.get(gram, ())))
+        candidate_ids = set()
+        for gram in grams[:3 * limit + 1]:
+            candidate_ids.update(self._grams.get(gram, ()))
+
+        term_grams = set(grams)
+        scored = heapq.nlargest(self.candidates, (
+            (len(term_grams & _trigrams(self._names[name_id])), name_id)
+            for name_id in candidate_ids
+            if abs(len(self._names[name_id]) - len(term)) <= limit
+        ))
+
+        ranked = []
+        for overlap, name_id in scored:
+            name = self._names[name_id]
+            distance = bounded_levenshtein(term, name, limit)
+            if distance <= limit:
+                ranked.append((distance, -overlap, name))
+        ranked.sort()
+        if not ranked or (len(ranked) > 1 and ranked[1][0] == ranked[0][0]):
+            return None
+        return ranked[0][2], ranked[0][0]
+
+    def correct_item(self, item: str) -> str:
+        """
+        Correct the food part of "<quantity> <unit> <food>", keeping the prefix
+        Foods made only of real food words are left alone, and short words
+        are corrected by at most one edit.
+        """
+        match = _QUANTITY_PREFIX.match(item)
+        prefix, food, suffix = match.group(1), match.group(2), match.group(3)
+        if len(food) < 4 or food in self or food[:-1] in self:
+            return item
+        if all(self.is_known_word(word) for word in food.split()):
+            return item
+        found = self.match(food)
+        if not found or found[1] == 0:
+            return item
+        self.corrections += 1
+        return f"{prefix}{found[0]}{suffix}"
+
+    def correct_query(self, query: str) -> str:
+        """Correct misspelled food names in a (possibly compound) food query"""
+        if not self._names:
+            return query
+        parts = _ITEM_SPLIT.split(query.lower())
+        corrected = "".join(part if i % 2 else self.correct_item(part) for i, part in enumerate(parts))
+        if corrected != query.lower():
+            logger.info(f"🔤 Corrected food query: '{query}' → '{corrected}'")
+        return corrected
+
+
+if __name__ == "__main__":
+    # Benchmark: python -m tools.fuzzy_index
+    import time
+
+    base = ["chicken breast", "brown rice", "white rice", "banana", "avocado", "salmon", "broccoli",
+            "sweet potato", "greek yogurt", "oatmeal", "almonds", "whole wheat toast", "egg", "spinach"]
+    index = FuzzyNameIndex(base + [f"{food} {i}" for i in range(20000) for food in ("generic food", "brand bar")])
+
+    queries = ["chiken brest", "bananna", "brocoli", "avacado", "200g chiken brest and brwn rice", "salmon"]
+    for query in queries:
+        print(f"{query!r:>36} → {index.correct_query(query)!r}")
+
+    runs = 2000
+    started = time.perf_counter()
+    for _ in range(runs):
+        index.match("chiken brest")
+    print(f"match over {len(index):,} names: {(time.perf_counter() - started) / runs * 1e6:.0f} µs")
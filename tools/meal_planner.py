@@ -0,0 +1,448 @@
+"""
+Macro-target meal planner
+Builds a one-day plan that hits calorie and macro targets with foods the
+user can eat. Foods for each meal are picked by scoring every combination
+of candidates at once (NumPy broadcasting), then portion sizes for the whole
+day are solved as a bounded least-squares problem and rounded to practical
+amounts (whole eggs, slices, 5 g). Plans are deterministic and cached per
+target profile; the LLM only has to narrate them.
+"""
+
+import os
+import re
+import time
+import logging
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from tools.fuzzy_index import is_food_word
+
+logger = logging.getLogger(__name__)
+
+MACROS = ["calories", "protein", "carbs", "fat"]
+
+# name, kcal, protein, carbs, fat (per 100 g), default serving g, role, meals, tags, (unit name, unit g, step)
+FOODS = [
+    ("chicken breast", 165, 31.0, 0.0, 3.6, 150, "protein", "LD", {"meat", "poultry"}, None),
+    ("turkey breast", 135, 30.0, 0.0, 1.0, 150, "protein", "LD", {"meat", "poultry"}, None),
+    ("lean ground beef", 217, 26.0, 0.0, 12.0, 125, "protein", "LD", {"meat", "beef"}, None),
+    ("salmon", 208, 20.0, 0.0, 13.0, 150, "protein", "LD", {"fish"}, None),
+    ("tuna", 116, 26.0, 0.0, 1.0, 120, "protein", "LS", {"fish"}, None),
+    ("cod", 105, 23.0, 0.0, 0.9, 150, "protein", "D", {"fish"}, None),
+    ("shrimp", 99, 24.0, 0.2, 0.3, 150, "protein", "LD", {"fish", "shellfish"}, None),
+    ("eggs", 143, 12.6, 0.7, 9.5, 100, "protein", "BL", {"egg"}, ("egg", 50, 1)),
+    ("egg whites", 52, 11.0, 0.7, 0.2, 150, "protein", "B", {"egg"}, None),
+    ("greek yogurt", 59, 10.0, 3.6, 0.4, 200, "protein", "BS", {"dairy"}, None),
+    ("cottage cheese", 72, 12.4, 2.7, 1.0, 150, "protein", "BS", {"dairy"}, None),
+    ("whey protein", 400, 80.0, 8.0, 6.0, 30, "protein", "BS", {"dairy"}, ("scoop", 30, 0.5)),
+    ("tofu", 144, 17.0, 3.0, 9.0, 150, "protein", "BLD", {"soy"}, None),
+    ("tempeh", 192, 20.0, 8.0, 11.0, 120, "protein", "LD", {"soy"}, None),
+    ("lentils", 116, 9.0, 20.0, 0.4, 200, "protein", "LD", {"legume"}, None),
+    ("oats", 389, 16.9, 66.0, 6.9, 50, "carb", "B", {"oats"}, None),
+    ("whole wheat bread", 247, 13.0, 41.0, 3.4, 60, "carb", "BL", {"gluten"}, ("slice", 30, 1)),
+    ("brown rice", 123, 2.7, 25.6, 1.0, 150, "carb", "LD", set(), None),
+    ("white rice", 130, 2.7, 28.0, 0.3, 150, "carb", "LD", set(), None),
+    ("quinoa", 120, 4.4, 21.0, 1.9, 150, "carb", "LD", set(), None),
+    ("sweet potato", 90, 2.0, 21.0, 0.2, 200, "carb", "LD", set(), None),
+    ("potatoes", 93, 2.5, 21.0, 0.1, 200, "carb", "D", set(), None),
+    ("whole wheat pasta", 124, 5.3, 26.5, 0.5, 180, "carb", "LD", {"gluten"}, None),
+    ("chickpeas", 164, 8.9, 27.4, 2.6, 150, "carb", "L", {"legume"}, None),
+    ("black beans", 132, 8.9, 23.7, 0.5, 150, "carb", "LD", {"legume"}, None),
+    ("banana", 89, 1.1, 23.0, 0.3, 120, "carb", "BS", {"fruit"}, ("banana", 120, 0.5)),
+    ("apple", 52, 0.3, 14.0, 0.2, 180, "carb", "S", {"fruit"}, ("apple", 180, 0.5)),
+    ("blueberries", 57, 0.7, 14.5, 0.3, 100, "carb", "BS", {"fruit"}, None),
+    ("broccoli", 35, 2.4, 7.2, 0.4, 150, "produce", "LD", set(), None),
+    ("spinach", 23, 2.9, 3.6, 0.4, 100, "produce", "LD", set(), None),
+    ("mixed salad greens", 17, 1.4, 3.3, 0.2, 100, "produce", "L", set(), None),
+    ("bell peppers", 31, 1.0, 6.0, 0.3, 120, "produce", "LD", {"nightshade"}, None),
+    ("green beans", 31, 1.8, 7.0, 0.2, 150, "produce", "D", set(), None),
+    ("asparagus", 20, 2.2, 3.9, 0.1, 150, "produce", "D", set(), None),
+    ("avocado", 160, 2.0, 8.5, 14.7, 70, "fat", "BL", set(), None),
+    ("olive oil", 884, 0.0, 0.0, 100.0, 10, "fat", "LD", set(), None),
+    ("almonds", 579, 21.0, 22.0, 50.0, 28, "fat", "S", {"nuts", "tree nuts"}, None),
+    ("walnuts", 654, 15.0, 14.0, 65.0, 28, "fat", "BS", {"nuts", "tree nuts"}, None),
+    ("peanut butter", 588, 25.0, 20.0, 50.0, 32, "fat", "BS", {"nuts", "peanuts"}, None),
+    ("cheddar cheese", 403, 25.0, 1.3, 33.0, 30, "fat", "L", {"dairy"}, None),
+    ("chia seeds", 486, 17.0, 42.0, 31.0, 20, "fat", "B", {"seeds"}, None),
+]
+
+MEALS = {
+    # meal: (code, share of daily calories, roles)
+    "breakfast": ("B", 0.25, ("protein", "carb", "fat")),
+    "lunch": ("L", 0.30, ("protein", "carb", "produce", "fat")),
+    "dinner": ("D", 0.30, ("protein", "carb", "produce", "fat")),
+    "snack": ("S", 0.15, ("protein", "carb"))
+}
+
+# Restriction keywords → excluded tags
+RESTRICTION_TAGS = {
+    "vegan": {"meat", "fish", "dairy", "egg"},
+    "plant based": {"meat", "fish", "dairy", "egg"},
+    "plant-based": {"meat", "fish", "dairy", "egg"},
+    "vegetarian": {"meat", "fish"},
+    "pescatarian": {"meat"},
+    "gluten": {"gluten"},
+    "celiac": {"gluten", "oats"},
+    "coeliac": {"gluten", "oats"},
+    "dairy": {"dairy"},
+    "lactose": {"dairy"},
+    "nut": {"nuts"},
+    "nuts": {"nuts"},
+    "peanut": {"peanuts"},
+    "shellfish": {"shellfish"},
+    "seafood": {"fish"},
+    "fish": {"fish"},
+    "egg": {"egg"},
+    "eggs": {"egg"},
+    "soy": {"soy"},
+    "beef": {"beef"},
+    "red meat": {"beef"},
+    "meat": {"meat"},
+    "legumes": {"legume"},
+    "nightshade": {"nightshade"}
+}
+DIETS = ("vegan", "vegetarian", "pescatarian", "plant based", "plant-based")
+# Named on their own ("I'm celiac"), they are restrictions
+CONDITIONS = ("celiac", "coeliac")
+LOW_CARB = ("keto", "ketogenic", "low carb", "low-carb")
+HIGH_PROTEIN = ("high protein", "high-protein", "muscle", "bulk")
+_PLAN_FOODS = {food[0] for food in FOODS}
+_RESTRICTION_STOPWORDS = {"no", "free", "allergy", "allergic", "to", "intolerant", "intolerance", "avoid",
+                          "without", "diet", "dont", "eat", "i", "a", "an", "the", "and", "or", "-"}
+
+# Daily calories when none are stated (no body measurements are stored)
+GOAL_CALORIES = {"lose": 1800, "maintain": 2200, "gain": 2600}
+# Least grams planned for a macro that was not stated, so every target stays positive
+MIN_MACRO_GRAMS = 20
+# Stated calories and the energy of three stated macros may differ this much
+CALORIE_TOLERANCE = 0.10
+_CALORIES_RE = re.compile(r"(\d{3,4})\s*(?:k?cals?|calories|calorie|kcal)\b")
+_MACRO_RE = re.compile(r"(\d{2,3})\s*g(?:rams?)?\s*(?:of\s+)?(protein|carbs?|carbohydrates|fat)\b")
+
+
+def _goal(text: str) -> str:
+    if re.search(r"\b(?:lose|losing|loss|cut|cutting|lean|shred)\b", text):
+        return "lose"
+    if re.search(r"\b(?:gain|gaining|bulk|bulking|mass)\b", text):
+        return "gain"
+    return "maintain"
+
+
+def parse_targets(message: str, context: Optional[Dict] = None) -> Dict:
+    """
+    Daily targets from the message, falling back to the user's goals
+    Stated calories and macro grams are kept; the rest follow a macro split
+    (protein 30 / carbs 40 / fat 30 % of energy, adjusted for low-carb and
+    high-protein requests). Three stated macros set the calories themselves;
+    macros that cannot fit the stated calories give targets None and an error.
+    """
+    context = context or {}
+    text = " ".join([message, *context.get("goals", []), *context.get("restrictions", [])]).lower()
+    goal = _goal(text)
+
+    stated = {}
+    match = _CALORIES_RE.search(text)
+    if match:
+        stated["calories"] = float(match.group(1))
+    for grams, macro in _MACRO_RE.findall(text):
+        stated["carbs" if macro.startswith("carb") else macro] = float(grams)
+
+    if any(word in text for word in LOW_CARB):
+        split = {"protein": 0.25, "carbs": 0.08, "fat": 0.67}
+    elif any(word in text for word in HIGH_PROTEIN):
+        split = {"protein": 0.35, "carbs": 0.40, "fat": 0.25}
+    else:
+        split = {"protein": 0.30, "carbs": 0.40, "fat": 0.30}
+    per_gram = {"protein": 4, "carbs": 4, "fat": 9}
+
+    # Energy not covered by stated macros is shared among the others by the split
+    fixed = sum(stated[m] * per_gram[m] for m in per_gram if m in stated)
+    free = [m for m in per_gram if m not in stated]
+    floor = sum(MIN_MACRO_GRAMS * per_gram[m] for m in free)
+    profile = {"goal": goal, "basis": "stated" if "calories" in stated else f"default for goal '{goal}'"}
+    if "calories" in stated:
+        calories = stated["calories"]
+        too_much = fixed + floor > calories * (1 + CALORIE_TOLERANCE)
+        too_little = not free and fixed < calories * (1 - CALORIE_TOLERANCE)
+        if too_much or too_little:
+            # The user's numbers disagree; let the LLM sort them out instead of guessing
+            return {**profile, "targets": None,
+                    "error": f"Stated macros add up to {fixed:.0f} kcal against {calories:.0f} kcal"}
+        calories = max(calories, fixed + floor)
+    elif not free:
+        # All three macros stated: they fix the calories
+        calories = fixed
+        profile["basis"] = "stated macros"
+    else:
+        calories = max(GOAL_CALORIES[goal], fixed + floor)
+        if calories > GOAL_CALORIES[goal]:
+            profile["basis"] = "stated macros"
+
+    free_share = sum(split[m] for m in free) or 1.0
+    targets = {"calories": calories}
+    for macro in per_gram:
+        if macro in stated:
+            targets[macro] = stated[macro]
+        else:
+            targets[macro] = max(round((calories - fixed) * split[macro] / free_share / per_gram[macro]),
+                                 MIN_MACRO_GRAMS)
+    return {**profile, "targets": targets}
+
+
+def parse_restrictions(message: str, context: Optional[Dict] = None) -> List[str]:
+    """The user's stored restrictions plus any named in the message"""
+    restrictions = [r.lower().strip() for r in (context or {}).get("restrictions", []) if r.strip()]
+    lower = message.lower()
+    for keyword in list(RESTRICTION_TAGS) + list(LOW_CARB):
+        match = re.search(rf"\b{re.escape(keyword)}s?\b", lower)
+        if not match:
+            continue
+        # "peanuts" is labelled as written, so "peanut" and "peanuts" agree
+        word = re.escape(match.group(0))
+        if keyword in DIETS or keyword in LOW_CARB or keyword in CONDITIONS:
+            restrictions.append(keyword)
+        elif re.search(rf"\b(?:no|without|allerg\w*|intoleran\w*|avoid)\b[^.]*\b{word}"
+                       rf"|\b{word}[- ]free\b"
+                       rf"|\b{word}[- ](?:allerg\w*|intoleran\w*|sensitiv\w*)", lower):
+            restrictions.append(f"no {match.group(0)}")
+    # Other "no X" only for foods: "no mushrooms" but not "no junk" or "no more than 3 meals"
+    for food in re.findall(r"\bno ([a-z]+)", lower):
+        if food not in RESTRICTION_TAGS and (food in _PLAN_FOODS or is_food_word(food)):
+            restrictions.append(f"no {food}")
+    return sorted(set(restrictions))
+
+
+class MealPlanner:
+    """Solves daily meal plans against a food table; plans are cached per target profile"""
+
+    def __init__(self, foods: Iterable[Tuple] = FOODS, cache_size: Optional[int] = None):
+        self.foods = list(foods)
+        self.names = [food[0] for food in self.foods]
+        # Nutrients per 100 g (n × 4) and per default serving
+        self.per_100g = np.array([food[1:5] for food in self.foods], dtype=np.float64)
+        self.serving_g = np.array([food[5] for food in self.foods], dtype=np.float64)
+        self.per_serving = self.per_100g * self.serving_g[:, None] / 100.0
+        self.roles = np.array([food[6] for food in self.foods])
+        self.meal_masks = {meal: np.array([code in food[7] for food in self.foods])
+                           for meal, (code, _, _) in MEALS.items()}
+        self.cache_size = cache_size or int(os.getenv("MEAL_PLAN_CACHE_SIZE", "256"))
+        self._plans: "OrderedDict[Tuple, Dict]" = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def allowed(self, restrictions: Iterable[str]) -> np.ndarray:
+        """Boolean mask of foods compatible with every restriction"""
+        mask = np.ones(len(self.foods), dtype=bool)
+        for restriction in restrictions:
+            restriction = restriction.lower()
+            excluded = set()
+            for keyword, tags in RESTRICTION_TAGS.items():
+                if re.search(rf"\b{re.escape(keyword)}s?\b", restriction):
+                    excluded |= tags
+            # "no mushrooms", "allergic to salmon": exclude foods by name
+            words = {w.rstrip("s") for w in re.findall(r"[a-z]+", restriction)} - _RESTRICTION_STOPWORDS
+            for index, food in enumerate(self.foods):
+                if food[8] & excluded or any(word and word in food[0] for word in words - set(RESTRICTION_TAGS)):
+                    mask[index] = False
+        return mask
+
+    def _choose(self, meal: str, roles: Tuple[str, ...], mask: np.ndarray, used: np.ndarray,
+                fractions: np.ndarray) -> List[int]:
+        """Pick one food per role: every combination is scored in one vectorized pass"""
+        candidates = []
+        for role in roles:
+            indices = np.flatnonzero(mask & (self.roles == role) & self.meal_masks[meal])
+            if len(indices):
+                candidates.append(indices)
+        if not candidates:
+            return []
+        combos = np.stack(np.meshgrid(*candidates, indexing="ij"), axis=-1).reshape(-1, len(candidates))
+        totals = self.per_serving[combos].sum(axis=1)                     # (combos, 4)
+        energy = np.maximum(totals[:, 0], 1.0)
+        combo_fractions = totals[:, 1:] * np.array([4, 4, 9]) / energy[:, None]
+        score = np.abs(combo_fractions - fractions).sum(axis=1) + 0.5 * used[combos].sum(axis=1)
+        return [int(i) for i in combos[int(np.argmin(score))]]
+
+    def _solve(self, chosen: List[Tuple[str, int]], targets: np.ndarray, shares: Dict[str, float]) -> np.ndarray:
+        """
+        Grams for each chosen food: bounded least squares on relative daily macro
+        error, each meal's share of calories and closeness to usual servings
+        """
+        indices = np.array([index for _, index in chosen])
+        nutrients = self.per_100g[indices].T / 100.0                       # (4, n), per gram
+        default = self.serving_g[indices]
+        scale = targets[0] / max(float(nutrients[0] @ default), 1.0)
+        guess = default * np.clip(scale, 0.5, 2.0)
+
+        rows = [nutrients / targets[:, None] * np.array([1.0, 1.0, 0.7, 0.7])[:, None]]
+        rhs = [np.array([1.0, 1.0, 0.7, 0.7])]
+        for meal, share in shares.items():
+            in_meal = np.array([name == meal for name, _ in chosen], dtype=np.float64)
+            rows.append(0.5 * (nutrients[0] * in_meal / targets[0])[None, :])
+            rhs.append(np.array([0.5 * share]))
+        rows.append(0.15 * np.diag(1.0 / guess))
+        rhs.append(np.full(len(indices), 0.15))
+        matrix, vector = np.vstack(rows), np.concatenate(rhs)
+
+        low, high = default * 0.25, default * 3.0
+        hessian, linear = matrix.T @ matrix, matrix.T @ vector
+        step = 1.0 / np.linalg.eigvalsh(hessian)[-1]
+        grams = np.minimum(np.maximum(guess, low), high)
+        momentum, t = grams.copy(), 1.0
+        # FISTA: projected gradient with momentum onto the portion bounds
+        for _ in range(400):
+            previous = grams
+            grams = np.minimum(np.maximum(momentum - step * (hessian @ momentum - linear), low), high)
+            if np.abs(grams - previous).max() < 0.05:
+                break
+            t_next = (1 + np.sqrt(1 + 4 * t * t)) / 2
+            momentum = grams + (t - 1) / t_next * (grams - previous)
+            t = t_next
+        return grams
+
+    def _round(self, index: int, grams: float) -> Tuple[float, str]:
+        unit = self.foods[index][9]
+        if unit is None:
+            step = 5.0
+            grams = max(step, round(grams / step) * step)
+            return grams, f"{grams:g} g"
+        name, unit_g, fraction = unit
+        step = unit_g * fraction
+        grams = max(step, round(grams / step) * step)
+        count = grams / unit_g
+        label = name if count == 1 else ("slices" if name == "slice" else f"{name}s")
+        return grams, f"{count:g} {label} ({grams:g} g)"
+
+    def plan(self, targets: Dict, restrictions: Iterable[str] = ()) -> Dict:
+        """Daily plan for calorie/macro targets, reusing a cached plan for the same profile"""
+        restrictions = sorted({r.lower() for r in restrictions})
+        key = tuple(round(float(targets[m])) for m in MACROS) + tuple(restrictions)
+        cached = self._plans.get(key)
+        if cached is not None:
+            self._plans.move_to_end(key)
+            self.cache_hits += 1
+            return cached
+        self.cache_misses += 1
+
+        plan = self._build(targets, restrictions)
+        self._plans[key] = plan
+        while len(self._plans) > self.cache_size:
+            self._plans.popitem(last=False)
+        return plan
+
+    def _build(self, targets: Dict, restrictions: List[str]) -> Dict:
+        started = time.perf_counter()
+        # Floored so the solver's relative errors never divide by zero
+        target = np.maximum(np.array([float(targets[m]) for m in MACROS]), 1.0)
+        fractions = target[1:] * np.array([4, 4, 9]) / target[0]
+        mask = self.allowed(restrictions)
+        low_carb = fractions[1] < 0.15
+
+        used = np.zeros(len(self.foods))
+        chosen: List[Tuple[str, int]] = []
+        for meal, (_, _, roles) in MEALS.items():
+            if low_carb:
+                roles = tuple(role for role in roles if role != "carb")
+            for index in self._choose(meal, roles, mask, used, fractions):
+                chosen.append((meal, index))
+                used[index] += 1
+        if not chosen:
+            return {"success": False, "error": "No foods fit these restrictions", "restrictions": restrictions}
+
+        meals_in_plan = {meal for meal, _ in chosen}
+        total_share = sum(MEALS[meal][1] for meal in meals_in_plan)
+        shares = {meal: MEALS[meal][1] / total_share for meal in meals_in_plan}
+        grams = self._solve(chosen, target, shares)
+
+        meals: Dict[str, List[Dict]] = {}
+        totals = np.zeros(4)
+        for (meal, index), amount in zip(chosen, grams):
+            amount, serving = self._round(index, float(amount))
+            values = self.per_100g[index] * amount / 100.0
+            totals += values
+            meals.setdefault(meal, []).append({
+                "name": self.names[index],
+                "grams": amount,
+                "serving": serving,
+                **{m: round(float(v), 1) for m, v in zip(MACROS, values)}
+            })
+
+        plan_meals = []
+        for meal, foods in meals.items():
+            plan_meals.append({
+                "meal": meal,
+                "foods": foods,
+                "totals": {m: round(sum(food[m] for food in foods), 1) for m in MACROS}
+            })
+        return {
+            "success": True,
+            "targets": {m: round(float(v), 1) for m, v in zip(MACROS, target)},
+            "restrictions": restrictions,
+            "meals": plan_meals,
+            "totals": {m: round(float(v), 1) for m, v in zip(MACROS, totals)},
+            "deviation_pct": {m: round(float((v - t) / t * 100), 1) if t else 0.0
+                              for m, v, t in zip(MACROS, totals, target)},
+            "solve_ms": round((time.perf_counter() - started) * 1000, 2)
+        }
+
+    def plan_for(self, message: str, context: Optional[Dict] = None) -> Dict:
+        """Plan for a diet_plan request, using targets and restrictions from the message and profile"""
+        profile = parse_targets(message, context)
+        if profile["targets"] is None:
+            return {"success": False, "error": profile["error"], "goal": profile["goal"], "basis": profile["basis"]}
+        plan = self.plan(profile["targets"], parse_restrictions(message, context))
+        return {**plan, "goal": profile["goal"], "basis": profile["basis"]}
+
+
+def format_meal_plan_for_llm(plan: Dict) -> str:
+    """Plan block for the LLM, which presents it without changing the numbers"""
+    if not plan.get("success"):
+        return ""
+    targets, totals = plan["targets"], plan["totals"]
+    text = "===== MEAL PLAN FROM MEAL PLANNER =====\n"
+    text += "Present this plan with these EXACT portions and numbers; describe and motivate, do not recalculate.\n"
+    text += (f"Daily targets ({plan.get('basis', 'stated')}): {targets['calories']:.0f} kcal | "
+             f"Protein: {targets['protein']:.0f}g | Carbs: {targets['carbs']:.0f}g | Fat: {targets['fat']:.0f}g\n")
+    if plan["restrictions"]:
+        text += f"Restrictions respected: {', '.join(plan['restrictions'])}\n"
+    text += "\n"
+    for meal in plan["meals"]:
+        text += f"{meal['meal'].title()}: {meal['totals']['calories']:.0f} kcal\n"
+        for food in meal["foods"]:
+            text += (f"- {food['name']}: {food['serving']} | {food['calories']:.0f} kcal | P {food['protein']:.1f}g | "
+                     f"C {food['carbs']:.1f}g | F {food['fat']:.1f}g\n")
+        text += "\n"
+    text += (f"DAY TOTAL: {totals['calories']:.0f} kcal | Protein: {totals['protein']:.0f}g | "
+             f"Carbs: {totals['carbs']:.0f}g | Fat: {totals['fat']:.0f}g\n")
+    text += "===== END OF MEAL PLAN ====="
+    return text
+
+
+if __name__ == "__main__":
+    # Benchmark: python -m tools.meal_planner
+    planner = MealPlanner()
+    profiles = [
+        ("Give me a 2000 calorie meal plan", {}),
+        ("meal plan to lose weight", {"restrictions": ["vegetarian"]}),
+        ("diet plan for bulking with 180g protein", {"restrictions": ["dairy-free"]}),
+        ("keto meal plan 1800 calories", {}),
+        ("vegan meal plan 2400 calories, no nuts", {}),
+        ("gluten-free meal plan", {"goals": ["gain muscle"], "restrictions": ["no salmon"]}),
+    ]
+    for message, context in profiles:
+        plan = planner.plan_for(message, context)
+        print(f"\n{message!r} {context or ''}")
+        print(format_meal_plan_for_llm(plan))
+        print(f"deviation %: {plan['deviation_pct']}  solve: {plan['solve_ms']} ms")
+
+    runs = 200
+    started = time.perf_counter()
+    for i in range(runs):
+        planner._build({"calories": 1600 + i * 5, "protein": 120, "carbs": 160, "fat": 55}, ["vegetarian"])
+    print(f"\nuncached solve: {(time.perf_counter() - started) / runs * 1000:.2f} ms per plan")
+    started = time.perf_counter()
+    for _ in range(10000):
+        planner.plan_for("Give me a 2000 calorie meal plan")
+    print(f"cached plan_for: {(time.perf_counter() - started) / 10000 * 1e6:.0f} µs per request")
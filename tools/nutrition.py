@@ -1,32 +1,153 @@
+import asyncio
 import httpx
 import os
-from typing import Dict
-from dotenv import load_dotenv
+from collections import OrderedDict
+from functools import cached_property
+from typing import Dict, Optional
 import logging
 
-load_dotenv()
+from tools.food_db import FoodDatabase
+from tools.fuzzy_index import FuzzyNameIndex
+from admission import get_governor, remaining_time, OverloadedError
+from health import upstream_hooks
+
 logger = logging.getLogger(__name__)
 
+# Results that mean "no such food" rather than a failed call: only these are
+# worth retrying with a typo-corrected query
+NOT_FOUND_ERRORS = {"No food data found", "Food not found", "Nutritionix API keys not configured"}
+
 class NutritionTools:
     """Handles nutrition API calls via Nutritionix"""
     
     def __init__(self):
         self.nutritionix_id = os.getenv('NUTRITIONIX_APP_ID')
         self.nutritionix_key = os.getenv('NUTRITIONIX_API_KEY')
+        self.governor = get_governor("nutritionix")
+        
+        # LRU cache of successful lookups keyed by normalized query
+        self.cache_size = int(os.getenv("NUTRITION_CACHE_SIZE", "4096"))
+        self._cache: "OrderedDict[str, Dict]" = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        
+        # Offline first tier: memory-mapped local food database (optional)
+        self.local_db = FoodDatabase.open_default()
+        
+        # Typo-tolerant index of known food names, learned from results
+        self.fuzzy = FuzzyNameIndex()
+        self._fuzzy_seeded = False
+    
+    @cached_property
+    def client(self) -> httpx.AsyncClient:
+        """Shared connection pool, created on first use"""
+        return httpx.AsyncClient(timeout=15.0, event_hooks=upstream_hooks())
+    
+    async def warm_up(self):
+        """Open a pooled connection to Nutritionix ahead of the first request"""
+        if not self.nutritionix_id or not self.nutritionix_key:
+            return
+        try:
+            await self.client.get("https://trackapi.nutritionix.com/v2/utils/nutrients", headers={
+                "x-app-id": self.nutritionix_id,
+                "x-app-key": self.nutritionix_key
+            }, timeout=10.0)
+        except Exception as e:
+            logger.warning(f"Nutritionix warm-up failed: {e}")
+    
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        """Cache key for a food query: lowercase, single-spaced"""
+        return " ".join(query.lower().split())
     
-    async def analyze_food(self, query: str) -> Dict:
+    def get_cached(self, query: str) -> Optional[Dict]:
+        """Return a cached result for the query, if any"""
+        key = self.normalize_query(query)
+        result = self._cache.get(key)
+        if result is not None:
+            self._cache.move_to_end(key)
+            self.cache_hits += 1
+        return result
+    
+    def store_cached(self, query: str, result: Dict):
+        """Remember a successful result for the query"""
+        if not result.get("success"):
+            return
+        key = self.normalize_query(query)
+        self._cache[key] = result
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        for food in result.get("foods", []):
+            self.fuzzy.add(food.get("name", ""))
+    
+    async def load_fuzzy_names(self):
+        """
+        Seed the fuzzy index with every local database name (once, at startup)
+        The index is built on a worker thread and swapped in, keeping names
+        learned from results in the meantime.
+        """
+        if self._fuzzy_seeded:
+            return
+        self._fuzzy_seeded = True
+        if not self.local_db:
+            return
+        seeded = await asyncio.to_thread(FuzzyNameIndex, self.local_db.names())
+        for name in self.fuzzy:
+            seeded.add(name)
+        self.fuzzy = seeded
+        logger.info(f"🔤 Fuzzy food index: {len(self.fuzzy)} names")
+    
+    def is_known_food(self, word: str) -> bool:
+        """Whether a word names a food the fuzzy index or local database knows"""
+        return self.fuzzy.is_known_word(word) or bool(self.local_db and self.local_db.find(word))
+    
+    def correct_query(self, query: str) -> str:
+        """Replace misspelled food names with known ones ("chiken brest" → "chicken breast")"""
+        return self.fuzzy.correct_query(query)
+    
+    async def analyze_food(self, query: str, correct_typos: bool = True) -> Dict:
         """
         Analyze nutrition for natural language food queries
         Uses Nutritionix API (200 free requests/day)
+        The query is tried as written first (cache, local database, then
+        Nutritionix); typo correction only runs once all of them miss.
         """
+        cached = self.get_cached(query)
+        if cached is not None:
+            return cached
+        
+        self.cache_misses += 1
+        result = await self._lookup(query)
+        if result.get("success") or not correct_typos or result.get("error") not in NOT_FOUND_ERRORS:
+            return result
+        
+        corrected = self.correct_query(query)
+        if corrected == self.normalize_query(query):
+            return result
+        retry = await self.analyze_food(corrected, correct_typos=False)
+        if not retry.get("success"):
+            return result
+        self.store_cached(query, retry)
+        return retry
+    
+    async def _lookup(self, query: str) -> Dict:
+        """Local food database, then Nutritionix, for the query exactly as given"""
+        if self.local_db:
+            local = self.local_db.analyze(query)
+            if local:
+                logger.info(f"📦 Local food database: '{query}'")
+                self.store_cached(query, local)
+                return local
+        
         if not self.nutritionix_id or not self.nutritionix_key:
             return {"error": "Nutritionix API keys not configured"}
         
         try:
-            async with httpx.AsyncClient() as client:
+            async with self.governor.slot():
                 logger.info(f"🔍 Nutritionix API: '{query}'")
                 
-                response = await client.post(
+                response = await self.client.post(
                     "https://trackapi.nutritionix.com/v2/natural/nutrients",
                     headers={
                         "x-app-id": self.nutritionix_id,
@@ -34,7 +155,7 @@ class NutritionTools:
                         "Content-Type": "application/json"
                     },
                     json={"query": query},
-                    timeout=10.0
+                    timeout=remaining_time(10.0)
                 )
                 
                 if response.status_code == 200:
@@ -49,6 +170,9 @@ class NutritionTools:
                         food_data = {
                             "name": food.get("food_name", "Unknown"),
                             "serving": f"{food.get('serving_qty', 1)} {food.get('serving_unit', '')}".strip(),
+                            "serving_qty": food.get("serving_qty", 1),
+                            "serving_unit": food.get("serving_unit", ""),
+                            "serving_weight_grams": food.get("serving_weight_grams") or 0,
                             "calories": round(float(food.get("nf_calories", 0)), 1),
                             "protein": round(float(food.get("nf_protein", 0)), 1),
                             "carbs": round(float(food.get("nf_total_carbohydrate", 0)), 1),
@@ -60,7 +184,9 @@ class NutritionTools:
                         logger.info(f"✅ {food_data['name']}: {food_data['calories']} kcal")
                         result_foods.append(food_data)
                     
-                    return {"success": True, "foods": result_foods}
+                    result = {"success": True, "foods": result_foods}
+                    self.store_cached(query, result)
+                    return result
                     
                 elif response.status_code == 404:
                     return {"error": "Food not found"}
@@ -68,6 +194,8 @@ class NutritionTools:
                     logger.error(f"Nutritionix error: {response.status_code}")
                     return {"error": f"API error {response.status_code}"}
                     
+        except OverloadedError:
+            raise
         except Exception as e:
             logger.error(f"Nutritionix exception: {str(e)}", exc_info=True)
             return {"error": str(e)}
@@ -0,0 +1,340 @@
+"""
+Token and cost accounting
+Every OpenRouter response's `usage` block (streamed answers report it in
+their last chunk) is attributed to the user, intent and call site of the
+request that caused it. Counters aggregate in memory and are flushed to a
+JSONL log every USAGE_FLUSH_INTERVAL seconds; `python usage.py` reports
+from that log which paths cost the most. Per-user daily budgets are
+enforced before a request makes any LLM call.
+"""
+
+import asyncio
+import contextvars
+import json
+import os
+import time
+import logging
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+USAGE_LOG = os.getenv("USAGE_LOG", os.path.join("logs", "usage.jsonl"))
+FLUSH_INTERVAL = float(os.getenv("USAGE_FLUSH_INTERVAL", "60"))
+# USD per million tokens, for when OpenRouter does not report a cost
+PROMPT_PRICE = float(os.getenv("LLM_PROMPT_PRICE", "0"))
+COMPLETION_PRICE = float(os.getenv("LLM_COMPLETION_PRICE", "0"))
+# Per user per day; 0 disables
+DAILY_TOKEN_BUDGET = int(os.getenv("USER_DAILY_TOKEN_BUDGET", "0"))
+DAILY_COST_BUDGET = float(os.getenv("USER_DAILY_COST_BUDGET", "0"))
+# (user, intent, site) rows kept for the since-startup report; older users fold into OTHER_USERS
+MAX_TOTAL_ROWS = int(os.getenv("USAGE_MAX_ROWS", "10000"))
+OTHER_USERS = "(other users)"
+
+BUDGET_MESSAGE = "⏳ You've reached today's usage limit for the coach. It resets at midnight; see you tomorrow!"
+
+CALLS, PROMPT, COMPLETION, COST, ESTIMATED = range(5)
+
+
+class BudgetExceededError(Exception):
+    """The user has used up today's token or cost budget"""
+
+
+class UsageScope:
+    """Who the LLM calls made inside the current request are billed to"""
+
+    def __init__(self, user_id: str, intent: str = "general"):
+        self.user_id = user_id
+        self.intent = intent
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost = 0.0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+
+_scope: contextvars.ContextVar[Optional[UsageScope]] = contextvars.ContextVar("usage_scope", default=None)
+
+
+def price(prompt_tokens: int, completion_tokens: int) -> float:
+    return (prompt_tokens * PROMPT_PRICE + completion_tokens * COMPLETION_PRICE) / 1_000_000
+
+
+class UsageLedger:
+    """In-memory usage counters keyed by (user, intent, site), plus per-user daily totals"""
+
+    def __init__(self, path: Optional[str] = USAGE_LOG, max_rows: int = MAX_TOTAL_ROWS):
+        self.path = path
+        self.max_rows = max_rows
+        # (user, intent, site) → [calls, prompt, completion, cost, estimated calls]
+        self._pending: Dict[Tuple[str, str, str], List] = defaultdict(lambda: [0, 0, 0, 0.0, 0])
+        self._totals: Dict[Tuple[str, str, str], List] = defaultdict(lambda: [0, 0, 0, 0.0, 0])
+        # user → (day, tokens, cost), today's users only; survives restarts through load_today()
+        self._daily: Dict[str, List] = {}
+        self._daily_day: Optional[str] = None
+        self.flushed_at: Optional[float] = None
+
+    def record(self, user_id: str, intent: str, site: str, prompt_tokens: int, completion_tokens: int,
+               cost: float, estimated: bool = False):
+        for table in (self._pending, self._totals):
+            row = table[(user_id, intent, site)]
+            row[CALLS] += 1
+            row[PROMPT] += prompt_tokens
+            row[COMPLETION] += completion_tokens
+            row[COST] += cost
+            row[ESTIMATED] += estimated
+        if len(self._totals) > self.max_rows:
+            self._fold_oldest()
+        self._add_daily(user_id, date.today().isoformat(), prompt_tokens + completion_tokens, cost)
+
+    def _fold_oldest(self):
+        """Merge the oldest user's row into OTHER_USERS, keeping intent and site totals exact"""
+        for key in self._totals:
+            if key[0] != OTHER_USERS:
+                break
+        else:
+            return
+        row = self._totals.pop(key)
+        other = self._totals[(OTHER_USERS, key[1], key[2])]
+        for column, value in enumerate(row):
+            other[column] += value
+
+    def _add_daily(self, user_id: str, day: str, tokens: int, cost: float):
+        if self._daily_day is not None and day < self._daily_day:
+            return
+        if day != self._daily_day:
+            # New day: yesterday's totals no longer count against any budget
+            self._daily = {user: daily for user, daily in self._daily.items() if daily[0] == day}
+            self._daily_day = day
+        daily = self._daily.get(user_id)
+        if daily is None or daily[0] != day:
+            daily = self._daily[user_id] = [day, 0, 0.0]
+        daily[1] += tokens
+        daily[2] += cost
+
+    def today(self, user_id: str) -> Tuple[int, float]:
+        """(tokens, cost) the user has used today"""
+        daily = self._daily.get(user_id)
+        if daily is None or daily[0] != date.today().isoformat():
+            return 0, 0.0
+        return daily[1], daily[2]
+
+    def check_budget(self, user_id: str, token_budget: int = None, cost_budget: float = None):
+        """Raise BudgetExceededError if the user has used up today's budget"""
+        token_budget = DAILY_TOKEN_BUDGET if token_budget is None else token_budget
+        cost_budget = DAILY_COST_BUDGET if cost_budget is None else cost_budget
+        tokens, cost = self.today(user_id)
+        if token_budget and tokens >= token_budget:
+            raise BudgetExceededError(f"{user_id} used {tokens} of {token_budget} tokens today")
+        if cost_budget and cost >= cost_budget:
+            raise BudgetExceededError(f"{user_id} spent ${cost:.4f} of ${cost_budget:.4f} today")
+
+    def flush(self) -> int:
+        """Append pending counters to the usage log; returns rows written"""
+        return self._write(self._take_pending())
+
+    async def flush_async(self) -> int:
+        """
+        flush() for the event loop: pending counters are swapped out here, on
+        the loop thread that record() runs on, and only the file write runs
+        in a worker thread
+        """
+        return await asyncio.to_thread(self._write, self._take_pending())
+
+    def _take_pending(self) -> List[str]:
+        if not self._pending:
+            return []
+        pending, self._pending = self._pending, defaultdict(lambda: [0, 0, 0, 0.0, 0])
+        self.flushed_at = time.time()
+        if not self.path:
+            return []
+        now = time.time()
+        day = date.today().isoformat()
+        return [
+            json.dumps({"timestamp": now, "day": day, "user_id": user, "intent": intent, "site": site,
+                        "calls": row[CALLS], "prompt_tokens": row[PROMPT], "completion_tokens": row[COMPLETION],
+                        "cost": round(row[COST], 6), "estimated_calls": row[ESTIMATED]})
+            for (user, intent, site), row in pending.items()
+        ]
+
+    def _write(self, lines: List[str]) -> int:
+        if not lines:
+            return 0
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, 'a') as f:
+                f.write("\n".join(lines) + "\n")
+        except OSError as e:
+            logger.warning(f"Could not flush usage: {e}")
+        return len(lines)
+
+    def load_today(self):
+        """Rebuild today's per-user totals from the log, so budgets survive restarts"""
+        self._apply_today(self._read_today())
+
+    async def load_today_async(self):
+        """load_today() for the event loop: the log is read in a worker thread"""
+        self._apply_today(await asyncio.to_thread(self._read_today))
+
+    def _read_today(self) -> List[Tuple[str, str, int, float]]:
+        day = date.today().isoformat()
+        return [(entry["user_id"], day, entry["prompt_tokens"] + entry["completion_tokens"], entry.get("cost", 0.0))
+                for entry in read_log(self.path) if entry.get("day") == day]
+
+    def _apply_today(self, entries: List[Tuple[str, str, int, float]]):
+        for user_id, day, tokens, cost in entries:
+            self._add_daily(user_id, day, tokens, cost)
+
+    async def run_flusher(self, interval: float = FLUSH_INTERVAL):
+        """Flush every `interval` seconds"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush_async()
+            except Exception as e:
+                logger.error(f"Usage flush failed: {str(e)}")
+
+    def report(self, top: int = 10) -> Dict:
+        """Usage since startup, grouped to show which paths to optimize"""
+        return build_report((
+            {"user_id": user, "intent": intent, "site": site, "calls": row[CALLS], "prompt_tokens": row[PROMPT],
+             "completion_tokens": row[COMPLETION], "cost": row[COST], "estimated_calls": row[ESTIMATED]}
+            for (user, intent, site), row in list(self._totals.items())
+        ), top)
+
+
+def build_report(entries: Iterable[Dict], top: int = 10) -> Dict:
+    """Totals by intent, call site, intent × site and user (heaviest first)"""
+    groups = {"by_intent": defaultdict(lambda: [0, 0, 0, 0.0, 0]), "by_site": defaultdict(lambda: [0, 0, 0, 0.0, 0]),
+              "by_path": defaultdict(lambda: [0, 0, 0, 0.0, 0]), "by_user": defaultdict(lambda: [0, 0, 0, 0.0, 0])}
+    total = [0, 0, 0, 0.0, 0]
+    for entry in entries:
+        values = (entry["calls"], entry["prompt_tokens"], entry["completion_tokens"], entry.get("cost", 0.0),
+                  entry.get("estimated_calls", 0))
+        keys = {"by_intent": entry["intent"], "by_site": entry["site"],
+                "by_path": f"{entry['intent']} → {entry['site']}", "by_user": entry["user_id"]}
+        for group, key in keys.items():
+            row = groups[group][key]
+            for i, value in enumerate(values):
+                row[i] += value
+        for i, value in enumerate(values):
+            total[i] += value
+
+    all_tokens = (total[PROMPT] + total[COMPLETION]) or 1
+
+    def rows(table, limit=None):
+        ranked = sorted(table.items(), key=lambda item: item[1][PROMPT] + item[1][COMPLETION], reverse=True)
+        return [{
+            "name": name,
+            "calls": row[CALLS],
+            "prompt_tokens": row[PROMPT],
+            "completion_tokens": row[COMPLETION],
+            "tokens_per_call": round((row[PROMPT] + row[COMPLETION]) / row[CALLS]) if row[CALLS] else 0,
+            "share": round((row[PROMPT] + row[COMPLETION]) / all_tokens, 3),
+            "cost": round(row[COST], 6)
+        } for name, row in ranked[:limit]]
+
+    return {
+        "totals": {"calls": total[CALLS], "prompt_tokens": total[PROMPT], "completion_tokens": total[COMPLETION],
+                   "cost": round(total[COST], 6), "estimated_calls": total[ESTIMATED]},
+        "by_path": rows(groups["by_path"]),
+        "by_intent": rows(groups["by_intent"]),
+        "by_site": rows(groups["by_site"]),
+        "top_users": rows(groups["by_user"], top)
+    }
+
+
+def read_log(path: Optional[str]) -> Iterable[Dict]:
+    if not path or not os.path.exists(path):
+        return
+    with open(path) as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+ledger = UsageLedger()
+
+
+def current_scope() -> Optional[UsageScope]:
+    return _scope.get()
+
+
+@contextmanager
+def usage_scope(user_id: str, intent: str = "general"):
+    """Attribute every LLM call made inside this block to user_id (the intent can be set later)"""
+    scope = UsageScope(user_id, intent)
+    token = _scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _scope.reset(token)
+
+
+def set_intent(intent: str):
+    scope = _scope.get()
+    if scope is not None:
+        scope.intent = intent
+
+
+def record(site: str, usage: Optional[Dict], estimate: Tuple[int, int] = (0, 0)):
+    """
+    Record one upstream call from its `usage` block. Without one (stream cut
+    short, upstream omitted it) the estimated (prompt, completion) tokens
+    are recorded and flagged as estimated.
+    """
+    scope = _scope.get()
+    user_id, intent = (scope.user_id, scope.intent) if scope else ("-", "background")
+    if usage:
+        prompt_tokens = int(usage.get("prompt_tokens") or 0)
+        completion_tokens = int(usage.get("completion_tokens") or 0)
+        cost = usage.get("cost")
+        cost = float(cost) if cost is not None else price(prompt_tokens, completion_tokens)
+        estimated = False
+    else:
+        prompt_tokens, completion_tokens = estimate
+        cost = price(prompt_tokens, completion_tokens)
+        estimated = True
+    ledger.record(user_id, intent, site, prompt_tokens, completion_tokens, cost, estimated)
+    if scope is not None:
+        scope.prompt_tokens += prompt_tokens
+        scope.completion_tokens += completion_tokens
+        scope.cost += cost
+
+
+def check_budget(user_id: str):
+    ledger.check_budget(user_id)
+
+
+def snapshot() -> Dict:
+    """Totals since startup for health checks"""
+    report = ledger.report(top=0)
+    return {**report["totals"], "flushed_at": ledger.flushed_at}
+
+
+if __name__ == "__main__":
+    # Report: python usage.py [usage.jsonl] [--day YYYY-MM-DD]
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Summarize LLM token usage by path, intent, call site and user")
+    parser.add_argument("log", nargs="?", default=USAGE_LOG)
+    parser.add_argument("--day", help="only this day (YYYY-MM-DD)")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    entries = [entry for entry in read_log(args.log) if not args.day or entry.get("day") == args.day]
+    report = build_report(entries, args.top)
+    totals = report["totals"]
+    print(f"{totals['calls']} calls, {totals['prompt_tokens']:,} prompt + {totals['completion_tokens']:,} "
+          f"completion tokens, ${totals['cost']:.4f} ({totals['estimated_calls']} estimated)")
+    for section in ("by_path", "by_intent", "by_site", "top_users"):
+        print(f"\n{section.replace('_', ' ')}:")
+        for row in report[section]:
+            print(f"  {row['name']:<40} {row['calls']:>6} calls  {row['prompt_tokens'] + row['completion_tokens']:>10,} tok"
+                  f"  {row['tokens_per_call']:>6}/call  {row['share']:>6.1%}  ${row['cost']:.4f}")
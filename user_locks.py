@@ -0,0 +1,154 @@
+"""
+Per-user ordering for user memory I/O
+Operations on one user run one at a time, in arrival order; different users
+proceed in parallel. Users hash onto a fixed set of asyncio locks (stripes),
+so memory stays bounded however many users there are, and the blocking file
+work itself runs on a thread pool instead of the event loop.
+"""
+
+import asyncio
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+
+from user_store import user_file_key
+
+logger = logging.getLogger(__name__)
+
+
+class StripedUserLocks:
+    """Fixed pool of FIFO asyncio locks, selected by a hash of the user id"""
+
+    def __init__(self, stripes: int = None, io_threads: int = None):
+        self.stripes = stripes or int(os.getenv("USER_LOCK_STRIPES", "1024"))
+        self._locks: List[asyncio.Lock] = [asyncio.Lock() for _ in range(self.stripes)]
+        self.executor = ThreadPoolExecutor(
+            max_workers=io_threads or int(os.getenv("USER_IO_THREADS", "8")),
+            thread_name_prefix="user-io"
+        )
+        self.operations = 0
+        self.contended = 0
+
+    def lock_for(self, user_id: str) -> asyncio.Lock:
+        return self.lock_for_key(user_file_key(user_id))
+
+    def lock_for_key(self, key: str) -> asyncio.Lock:
+        """Stripe for a user's storage key, so jobs that only know the key share the user's lock"""
+        return self._locks[int(key[:16], 16) % self.stripes]
+
+    async def run(self, user_id: str, func: Callable, *args) -> Any:
+        """
+        Run func(*args) on the I/O pool once the user's earlier operations are
+        done. If the caller is cancelled the work still completes, and the
+        lock is held until it does, so later operations never overtake it.
+        """
+        return await self._run(self.lock_for(user_id), func, *args)
+
+    async def run_key(self, key: str, func: Callable, *args) -> Any:
+        """run() for a user known only by storage key (the compactor)"""
+        return await self._run(self.lock_for_key(key), func, *args)
+
+    async def _run(self, lock: asyncio.Lock, func: Callable, *args) -> Any:
+        if lock.locked():
+            self.contended += 1
+        await lock.acquire()
+        try:
+            future = asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        except BaseException:
+            lock.release()
+            raise
+        future.add_done_callback(lambda _: lock.release())
+        self.operations += 1
+        return await asyncio.shield(future)
+
+    def stats(self) -> Dict:
+        return {
+            "stripes": self.stripes,
+            "io_threads": self.executor._max_workers,
+            "operations": self.operations,
+            "contended": self.contended
+        }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+
+
+if __name__ == "__main__":
+    # Stress test: python user_locks.py [storage latency ms]
+    # Storage latency is simulated with a sleep around every load and save
+    # (like a network volume's round trip); pass 0 to measure the bare disk
+    import shutil
+    import sys
+    import tempfile
+    import time
+
+    from memory import UserMemory
+
+    logging.basicConfig(level=logging.WARNING)
+    latency = (float(sys.argv[1]) if len(sys.argv) > 1 else 2.0) / 1000
+    saves_per_user = 20
+
+    def open_memory(path: str) -> UserMemory:
+        memory = UserMemory(path)
+        store = memory.store
+        load, save = store.load, store.save
+
+        def slow_load(user_id):
+            time.sleep(latency)
+            return load(user_id)
+
+        def slow_save(user_id, context):
+            time.sleep(latency)
+            save(user_id, context)
+
+        store.load, store.save = slow_load, slow_save
+        return memory
+
+    async def hammer(memory: UserMemory, users: int, locked: bool = True) -> float:
+        """Every user submits `saves_per_user` messages at once, plus a profile update"""
+        async def save(user: str, i: int):
+            if locked:
+                await memory.save_interaction(user, f"message {i}", f"reply {i}")
+            else:
+                await asyncio.to_thread(memory._append_interaction, user, f"message {i}", f"reply {i}", None)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            save(f"user-{u}", i) for i in range(saves_per_user) for u in range(users)
+        ), *(memory.update_user_profile(f"user-{u}", {"fitness_level": "intermediate"}) for u in range(users)))
+        return time.perf_counter() - started
+
+    async def lost_updates(memory: UserMemory, users: int) -> int:
+        lost = 0
+        for u in range(users):
+            context = await memory.get_user_context(f"user-{u}")
+            lost += saves_per_user - len({turn["query"] for turn in context["history"]})
+            lost += context["fitness_level"] != "intermediate"
+        return lost
+
+    async def main():
+        root = tempfile.mkdtemp(prefix="user_locks_")
+        total = 20 * (saves_per_user + 1)
+        try:
+            memory = open_memory(os.path.join(root, "unlocked"))
+            await hammer(memory, 20, locked=False)
+            print(f"thread pool, no locks: {await lost_updates(memory, 20)} of {total} updates lost")
+
+            memory = open_memory(os.path.join(root, "locked"))
+            await hammer(memory, 20)
+            print(f"striped user locks:    {await lost_updates(memory, 20)} of {total} updates lost")
+
+            print(f"\nstorage latency {latency * 1000:g} ms, {memory.locks.executor._max_workers} I/O threads, "
+                  f"{saves_per_user + 1} concurrent operations per user")
+            print("users  ops/s  per-user ops/s")
+            for users in (1, 2, 4, 8, 16, 32):
+                memory = open_memory(os.path.join(root, f"scale{users}"))
+                seconds = await hammer(memory, users)
+                assert await lost_updates(memory, users) == 0
+                ops = users * (saves_per_user + 1) / seconds
+                print(f"{users:>5}  {ops:>5.0f}  {ops / users:>14.0f}")
+        finally:
+            shutil.rmtree(root)
+
+    asyncio.run(main())
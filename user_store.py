@@ -0,0 +1,280 @@
+"""
+Sharded on-disk layout for user memory
+Users are keyed by a hash of their id, never the raw id, and spread over a
+two-level hash-prefix tree (data/users/ab/cd/<key>.mem) so no directory
+grows past a few dozen entries. A SQLite manifest indexes every user's
+tier, size and last access; a compactor moves users idle for N days to a
+cold archive directory, and they are restored on their next access.
+"""
+
+import hashlib
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+import logging
+from typing import Dict, Iterator, Optional
+
+from history_codec import load_context_file, write_context_file
+
+logger = logging.getLogger(__name__)
+
+HOT, COLD = 0, 1
+SUFFIX = ".mem"
+# Ids that were safe to use in the old flat user_<id> filenames
+_LEGACY_SAFE_ID = re.compile(r"^[A-Za-z0-9_.@-]{1,128}$")
+
+
+def user_file_key(user_id: str) -> str:
+    """Filesystem key for a user: hex BLAKE2b of the id"""
+    return hashlib.blake2b(user_id.encode("utf-8"), digest_size=16, person=b"user-memory").hexdigest()
+
+
+class Manifest:
+    """SQLite index of stored users: key → tier, bytes, last access"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS users ("
+            "key TEXT PRIMARY KEY, tier INTEGER NOT NULL, bytes INTEGER NOT NULL, last_access INTEGER NOT NULL"
+            ") WITHOUT ROWID"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS users_idle ON users (tier, last_access)")
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._db.execute("SELECT tier, bytes, last_access FROM users WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        return {"tier": row[0], "bytes": row[1], "last_access": row[2]}
+
+    def put(self, key: str, tier: int, size: int, last_access: Optional[float] = None):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO users (key, tier, bytes, last_access) VALUES (?, ?, ?, ?)",
+                (key, tier, size, int(last_access or time.time()))
+            )
+
+    def touch(self, key: str):
+        """Record an access; accessed users are always hot"""
+        with self._lock:
+            self._db.execute("UPDATE users SET last_access = ?, tier = ? WHERE key = ?", (int(time.time()), HOT, key))
+
+    def set_tier(self, keys, tier: int):
+        """Move many keys to a tier in one transaction"""
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.executemany("UPDATE users SET tier = ? WHERE key = ?", [(tier, key) for key in keys])
+            self._db.execute("COMMIT")
+
+    def idle(self, before: float, limit: int = 1000):
+        """Keys of hot users not accessed since `before`"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT key FROM users WHERE tier = ? AND last_access < ? LIMIT ?", (HOT, int(before), limit)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def counts(self) -> Dict:
+        with self._lock:
+            rows = self._db.execute("SELECT tier, COUNT(*), SUM(bytes) FROM users GROUP BY tier").fetchall()
+        stats = {"hot_users": 0, "cold_users": 0, "hot_bytes": 0, "cold_bytes": 0}
+        for tier, count, size in rows:
+            name = "hot" if tier == HOT else "cold"
+            stats[f"{name}_users"] = count
+            stats[f"{name}_bytes"] = size or 0
+        return stats
+
+    def bulk_put(self, rows):
+        """Insert many (key, tier, bytes, last_access) rows in one transaction"""
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.executemany("INSERT OR REPLACE INTO users VALUES (?, ?, ?, ?)", rows)
+            self._db.execute("COMMIT")
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class ShardedUserStore:
+    """Hash-prefix tree of compact user files, with a cold tier"""
+
+    def __init__(self, root: str, cold_root: Optional[str] = None, legacy_dir: Optional[str] = None):
+        self.root = root
+        self.cold_root = cold_root or os.path.join(os.path.dirname(root.rstrip(os.sep)) or ".", "cold")
+        self.legacy_dir = legacy_dir
+        os.makedirs(self.root, exist_ok=True)
+        self.manifest = Manifest(os.path.join(self.root, "manifest.db"))
+        self.restored = 0
+        self.archived = 0
+        self.migrated = 0
+
+    def path(self, key: str, tier: int = HOT) -> str:
+        base = self.root if tier == HOT else self.cold_root
+        return os.path.join(base, key[:2], key[2:4], key + SUFFIX)
+
+    def _legacy_paths(self, user_id: str):
+        if not self.legacy_dir or not _LEGACY_SAFE_ID.match(user_id):
+            return []
+        return [os.path.join(self.legacy_dir, f"user_{user_id}{ext}") for ext in (".mem", ".json")]
+
+    def _move(self, source: str, target: str):
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.move(source, target)
+
+    def load(self, user_id: str) -> Optional[Dict]:
+        """Load a user's context, restoring it from the cold tier if needed"""
+        key = user_file_key(user_id)
+        hot_path = self.path(key)
+        entry = self.manifest.get(key)
+
+        # A missing hot file is restored from the cold tier whatever the
+        # manifest says: the compactor may have moved it a moment ago
+        cold_path = self.path(key, COLD)
+        if not os.path.exists(hot_path) and os.path.exists(cold_path):
+            self._move(cold_path, hot_path)
+            self.restored += 1
+            logger.info(f"♨️ Restored user {key[:8]} from cold archive")
+
+        if os.path.exists(hot_path):
+            context = load_context_file(hot_path)
+            if entry is None:
+                self.manifest.put(key, HOT, os.path.getsize(hot_path))
+            else:
+                self.manifest.touch(key)
+            return context
+
+        # Flat data/user_<id> files from before sharding: migrated on next save
+        for legacy_path in self._legacy_paths(user_id):
+            if os.path.exists(legacy_path):
+                return load_context_file(legacy_path)
+        return None
+
+    def save(self, user_id: str, context: Dict):
+        key = user_file_key(user_id)
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_context_file(path, context)
+        self.manifest.put(key, HOT, os.path.getsize(path))
+        # A newer hot file supersedes any archived copy
+        cold_path = self.path(key, COLD)
+        if os.path.exists(cold_path):
+            os.remove(cold_path)
+        for legacy_path in self._legacy_paths(user_id):
+            if os.path.exists(legacy_path):
+                os.remove(legacy_path)
+                self.migrated += 1
+
+    def idle_keys(self, idle_days: float, now: Optional[float] = None):
+        """Batch of keys of hot users idle for `idle_days`, with the cutoff used"""
+        cutoff = (now or time.time()) - idle_days * 86400
+        return self.manifest.idle(cutoff), cutoff
+
+    def archive(self, key: str, cutoff: float) -> bool:
+        """
+        Move one idle user to the cold tier. Run under the user's lock; the
+        manifest is re-checked so a user accessed since listing stays hot.
+        """
+        entry = self.manifest.get(key)
+        if entry is None or entry["tier"] != HOT or entry["last_access"] >= cutoff:
+            return False
+        hot_path = self.path(key)
+        if os.path.exists(hot_path):
+            self._move(hot_path, self.path(key, COLD))
+        self.manifest.set_tier([key], COLD)
+        self.archived += 1
+        return True
+
+    def compact(self, idle_days: float, now: Optional[float] = None) -> int:
+        """
+        Move users idle for `idle_days` to the cold tier; returns how many moved
+        Not locked: only for offline use, UserMemory.compact is the live path.
+        """
+        moved = 0
+        while True:
+            keys, cutoff = self.idle_keys(idle_days, now)
+            if not keys:
+                break
+            moved += sum(self.archive(key, cutoff) for key in keys)
+        if moved:
+            logger.info(f"🧊 Archived {moved} idle users (> {idle_days} days)")
+        return moved
+
+    def iter_contexts(self) -> Iterator[Dict]:
+        """Every stored user context (hot, cold and not-yet-migrated legacy files)"""
+        roots = [self.root, self.cold_root]
+        for root in roots:
+            for directory, _, files in os.walk(root):
+                for name in sorted(files):
+                    if name.endswith(SUFFIX):
+                        yield self._read(os.path.join(directory, name))
+        if self.legacy_dir and os.path.isdir(self.legacy_dir):
+            for name in sorted(os.listdir(self.legacy_dir)):
+                if name.startswith("user_") and name.endswith((".mem", ".json")):
+                    yield self._read(os.path.join(self.legacy_dir, name))
+
+    def _read(self, path: str) -> Dict:
+        try:
+            return load_context_file(path)
+        except Exception as e:
+            logger.warning(f"Skipping unreadable user file {path}: {e}")
+            return {}
+
+    def stats(self) -> Dict:
+        return {**self.manifest.counts(), "restored": self.restored, "archived": self.archived,
+                "migrated": self.migrated}
+
+
+if __name__ == "__main__":
+    # Benchmark: python user_store.py [users] [files]
+    # Indexes `users` users in the manifest and writes `files` of them to disk,
+    # then times lookups (hash + manifest + open/decode) of stored users
+    import random
+    import sys
+    import tempfile
+
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    files = int(sys.argv[2]) if len(sys.argv) > 2 else 50_000
+    root = tempfile.mkdtemp(prefix="user_store_bench_")
+    store = ShardedUserStore(os.path.join(root, "users"))
+    context = {"user_id": "", "fitness_level": "beginner", "goals": [], "history": [
+        {"timestamp": "2026-10-01T12:00:00", "query": "calories in 2 eggs", "response": "About 156 kcal.", "metadata": {}}
+    ]}
+
+    started = time.perf_counter()
+    now = time.time()
+    batch = []
+    for i in range(users):
+        batch.append((user_file_key(f"user-{i}"), HOT, 0, int(now - random.random() * 90 * 86400)))
+        if len(batch) == 50_000:
+            store.manifest.bulk_put(batch)
+            batch = []
+    store.manifest.bulk_put(batch)
+    for i in range(files):
+        store.save(f"user-{i}", {**context, "user_id": f"user-{i}"})
+    print(f"indexed {users:,} users, wrote {files:,} files in {time.perf_counter() - started:.1f}s ({root})")
+
+    runs = 5000
+    sample = [f"user-{random.randrange(files)}" for _ in range(runs)]
+    started = time.perf_counter()
+    for user_id in sample:
+        store.load(user_id)
+    print(f"lookup of a stored user: {(time.perf_counter() - started) / runs * 1e6:.0f} µs")
+
+    started = time.perf_counter()
+    for i in range(runs):
+        store.manifest.get(user_file_key(f"user-{random.randrange(users)}"))
+    print(f"manifest lookup at {users:,} users: {(time.perf_counter() - started) / runs * 1e6:.0f} µs")
+
+    started = time.perf_counter()
+    moved = store.compact(idle_days=60)
+    print(f"compacted {moved:,} idle users in {time.perf_counter() - started:.1f}s; {store.stats()}")
+    shutil.rmtree(root)